@@ -0,0 +1,8 @@
+"""
+Application for ASGI servers with the read endpoints, see `core.asgi`
+
+    uvicorn asgi:app --port 8001
+"""
+from core.asgi import create_asgi_app
+
+app = create_asgi_app()
@@ -0,0 +1,3 @@
+"""
+Benchmarks, run each module with `python -m benchmarks.<name>` from the project root
+"""
@@ -0,0 +1,110 @@
+"""
+Read throughput and latency at high concurrency: WSGI app under gunicorn
+threads against the async app under uvicorn, both with one worker on the same
+seeded SQLite file (aiosqlite for the async app)
+
+Every connection is a keep-alive client of an asyncio load driver, so
+hundreds of them cost the client little.
+
+    python -m benchmarks.async_reads [--clients 64 256] [--duration 5]
+"""
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import tempfile
+import time
+
+from .workers import ACTORS, seed
+
+PORT = 8766
+ROUTES = ['/api/actors?limit=100', '/api/actor?id={}']
+
+SERVERS = {
+    'gunicorn gthread': ['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+    'uvicorn asyncio': ['uvicorn', 'asgi:app', '--port', str(PORT), '--no-access-log', '--log-level', 'warning'],
+}
+
+
+async def fetch(reader, writer, path):
+    writer.write('GET {} HTTP/1.1\r\nHost: localhost\r\n\r\n'.format(path).encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def wait_ready():
+    for _ in range(100):
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+            status = await fetch(reader, writer, ROUTES[0])
+            writer.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+async def load(clients, duration):
+    """
+    return: tuple (requests per second, list of latencies in ms)
+    """
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(i):
+        reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+        n = i
+        while time.perf_counter() < deadline:
+            path = ROUTES[n % 2].format(n % ACTORS + 1)
+            start = time.perf_counter()
+            status = await fetch(reader, writer, path)
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert status == 200, status
+            n += clients
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(clients)])
+    return len(latencies) / (time.perf_counter() - start), latencies
+
+
+def run(command, db_url, clients, duration):
+    env = dict(os.environ, DB_URL=db_url, WEB_WORKERS='1', WEB_BIND='127.0.0.1:{}'.format(PORT))
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_ready())
+        return asyncio.run(load(clients, duration))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[64, 256])
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = 'sqlite:///{}/load.db'.format(tmp)
+        seed(db_url)
+        print('cpus: {}, routes: {}'.format(os.cpu_count(), ', '.join(ROUTES)))
+        print('{:>18} {:>8} {:>10} {:>9} {:>9}'.format('server', 'clients', 'req/s', 'p50 ms', 'p99 ms'))
+        for clients in args.clients:
+            for name, command in SERVERS.items():
+                rate, latencies = run(command, db_url, clients, args.duration)
+                cuts = statistics.quantiles(latencies, n=100)
+                print('{:>18} {:>8} {:>10.1f} {:>9.1f} {:>9.1f}'.format(name, clients, rate, cuts[49], cuts[98]))
+
+
+if __name__ == '__main__':
+    main()
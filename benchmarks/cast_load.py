@@ -0,0 +1,78 @@
+"""
+Latency of loading a movie's cast against size of the association table,
+with and without the (movie_id, actor_id) index
+
+    python -m benchmarks.cast_load [links ...]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from sqlalchemy import create_engine, insert, select  # noqa: E402
+from sqlalchemy.orm import Session, configure_mappers, selectinload  # noqa: E402
+
+from core import db  # noqa: E402
+from models.actor import Actor  # noqa: E402
+from models.movie import Movie  # noqa: E402
+from models.relations import association  # noqa: E402
+
+CAST_SIZE = 20
+LOOKUPS = 200
+
+
+def build(links):
+    """
+    In-memory database with `links` rows in association, CAST_SIZE actors per movie
+    """
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    movies = links // CAST_SIZE
+    actors = max(links // 10, CAST_SIZE)
+    rnd = random.Random(links)
+    with engine.begin() as conn:
+        conn.execute(insert(Movie.__table__), [
+            dict(id=i, name='Movie {}'.format(i), year=1950 + i % 70, genre='drama', version=1) for i in range(movies)
+        ])
+        conn.execute(insert(Actor.__table__), [
+            dict(id=i, name='Actor {}'.format(i), gender='male', date_of_birth=date(1970, 1, 1), version=1)
+            for i in range(actors)
+        ])
+        conn.execute(insert(association), [
+            dict(movie_id=movie_id, actor_id=actor_id)
+            for movie_id in range(movies)
+            for actor_id in rnd.sample(range(actors), CAST_SIZE)
+        ])
+    return engine, movies
+
+
+def time_cast_loads(engine, movies):
+    rnd = random.Random(0)
+    ids = [rnd.randrange(movies) for _ in range(LOOKUPS)]
+    with Session(engine) as session:
+        start = time.perf_counter()
+        for movie_id in ids:
+            movie = session.scalars(select(Movie).options(selectinload(Movie.cast)).where(Movie.id == movie_id)).one()
+            assert len(movie.cast) == CAST_SIZE
+            session.expunge_all()
+        return (time.perf_counter() - start) / LOOKUPS * 1000
+
+
+def main(*sizes):
+    sizes = sizes or (10000, 100000, 1000000)
+    configure_mappers()  # creates Movie.cast backref
+    print('{:>10} {:>16} {:>16}'.format('links', 'no index, ms', 'index, ms'))
+    for links in sizes:
+        engine, movies = build(links)
+        with_index = time_cast_loads(engine, movies)
+        with engine.begin() as conn:
+            conn.exec_driver_sql('DROP INDEX ix_association_movie_id_actor_id')
+        without_index = time_cast_loads(engine, movies)
+        print('{:>10} {:>16.3f} {:>16.3f}'.format(links, without_index, with_index))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
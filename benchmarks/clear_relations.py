@@ -0,0 +1,105 @@
+"""
+Latency of clearing an actor's filmography and of deleting the actor against
+the number of movies, set-based `Model.clear_relations` / `Model.delete`
+against clearing the loaded ORM collection as before
+
+    python -m benchmarks.clear_relations [sizes ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from sqlalchemy import event, insert  # noqa: E402
+
+REPEATS = 5
+
+
+def orm_clear(actor_id):
+    """
+    Old `clear_relations`: load the actor and its whole filmography, empty the collection
+    """
+    from core import db
+    from models.actor import Actor
+    from models.base import flush_stats, update_sizes, update_stats
+    from models.stats import link_deltas
+
+    actor = db.session.query(Actor).filter_by(id=actor_id).first()
+    rel_ids = [movie.id for movie in actor.movies]
+    actor.movies.clear()
+    update_sizes(Actor, actor_id, rel_ids, -1)
+    update_stats(link_deltas(-len(rel_ids)))
+    flush_stats()
+    db.session.commit()
+
+
+def link(actor_id, size):
+    from core import db
+    from models.actor import Actor
+    from models.base import update_sizes
+    from models.relations import association
+
+    db.session.execute(insert(association), [dict(actor_id=actor_id, movie_id=i + 1) for i in range(size)])
+    update_sizes(Actor, actor_id, list(range(1, size + 1)), 1)
+    db.session.commit()
+
+
+def measure(app, size, func):
+    """
+    return: tuple (median ms, SQL statements) of func(actor_id) on an actor with size movies
+    """
+    from core import db
+    from models.actor import Actor
+
+    timings, statements = [], []
+    for i in range(REPEATS):
+        with app.app_context():
+            actor_id = Actor.create(name='Clear {} {} {}'.format(func.__name__, size, i), gender='male',
+                                    date_of_birth=date(1970, 1, 1)).id
+            link(actor_id, size)
+        with app.app_context():
+            count = []
+
+            def record(*args):
+                count.append(args[2])
+
+            event.listen(db.engine, 'before_cursor_execute', record)
+            start = time.perf_counter()
+            func(actor_id)
+            timings.append(time.perf_counter() - start)
+            event.remove(db.engine, 'before_cursor_execute', record)
+            statements.append(len(count))
+    return sorted(timings)[len(timings) // 2] * 1000, max(statements)
+
+
+def main(*sizes):
+    sizes = sizes or (10, 100, 1000, 10000)
+    from core import create_app, db
+    from models.actor import Actor
+    from models.movie import Movie
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app('sqlite:///{}/clear.db'.format(tmp))
+        with app.app_context():
+            db.session.execute(insert(Movie.__table__), [
+                dict(id=i + 1, name='Movie {}'.format(i + 1), year=2000, genre='drama') for i in range(max(sizes))
+            ])
+            db.session.commit()
+
+        cases = {
+            'ORM collection clear': orm_clear,
+            'clear_relations': Actor.clear_relations,
+            'delete': Actor.delete,
+        }
+        print('{:>8} {:>28} {:>10} {:>10}'.format('movies', 'case', 'ms', 'queries'))
+        for size in sizes:
+            for name, func in cases.items():
+                ms, queries = measure(app, size, func)
+                print('{:>8} {:>28} {:>10.2f} {:>10}'.format(size, name, ms, queries))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
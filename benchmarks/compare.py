@@ -0,0 +1,66 @@
+"""
+Compare two JSON reports of `benchmarks.micro` or `benchmarks.load`, e.g. of
+runs before and after a change
+
+    python -m benchmarks.compare before.json after.json [--metric p95_ms]
+"""
+import argparse
+import json
+
+METRICS = ['p50_ms', 'p95_ms', 'p99_ms', 'mean_ms', 'per_second']
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(before, after):
+    """
+    return: relative change in percent, None without a base value
+    """
+    return round((after - before) / before * 100, 1) if before else None
+
+
+def compare(before, after, metric):
+    """
+    before, after: reports
+    return: list of tuples (name, before value, after value, change in %) of results in both reports
+    """
+    rows = []
+    for name, row in before['results'].items():
+        if name in after['results']:
+            old, new = row[metric], after['results'][name][metric]
+            rows.append((name, old, new, change(old, new)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--metric', choices=METRICS, default='p50_ms')
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    if before['benchmark'] != after['benchmark']:
+        parser.error('reports are of different benchmarks: {} and {}'.format(before['benchmark'], after['benchmark']))
+    for key in ('commit', 'database', 'cpus'):
+        print('{:<10} {} -> {}'.format(key, before['environment'].get(key), after['environment'].get(key)))
+    changed = {key for key in ('size', 'actors', 'movies', 'links', 'clients', 'iterations')
+               if before['params'].get(key) != after['params'].get(key)}
+    if changed:
+        print('warning: runs differ in {}'.format(', '.join(sorted(changed))))
+
+    # lower is better for latencies, higher for throughput
+    print('{:<52} {:>10} {:>10} {:>8}'.format(args.metric, 'before', 'after', 'change'))
+    for name, old, new, percent in compare(before, after, args.metric):
+        percent = '' if percent is None else '{:+.1f}%'.format(percent)
+        print('{:<52} {:>10} {:>10} {:>8}'.format(name, old, new, percent))
+    missing = set(before['results']) ^ set(after['results'])
+    if missing:
+        print('only in one report: {}'.format(', '.join(sorted(missing))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Degrees of separation queries on a synthetic graph: in-memory co-star graph
+against a recursive CTE over the association table
+
+    python -m benchmarks.costar_graph [links]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+from models.graph import CoStarGraph  # noqa: E402
+
+CAST_SIZE = 10
+QUERIES = 100
+SQL_QUERIES = 5
+
+# actors within 2 hops of :source, the way it would be done without the graph
+TWO_HOPS = text('''
+WITH RECURSIVE reach(actor_id, hops) AS (
+    SELECT :source, 0
+    UNION
+    SELECT b.actor_id, reach.hops + 1
+    FROM reach
+    JOIN association a ON a.actor_id = reach.actor_id
+    JOIN association b ON b.movie_id = a.movie_id
+    WHERE reach.hops < 2
+)
+SELECT actor_id, min(hops) FROM reach WHERE actor_id != :source GROUP BY actor_id
+''')
+
+
+def generate(links, seed=0):
+    """
+    Links with CAST_SIZE actors per movie, actors picked with power-law popularity
+
+    return: tuple of int32 arrays (actor ids, movie ids)
+    """
+    rng = np.random.default_rng(seed)
+    movies = links // CAST_SIZE
+    actors = links // 10
+    weights = 1.0 / np.arange(1, actors + 1) ** 0.8
+    actor_ids = rng.choice(actors, size=movies * CAST_SIZE, p=weights / weights.sum()).astype(np.int32)
+    movie_ids = np.repeat(np.arange(movies, dtype=np.int32), CAST_SIZE)
+    pairs = np.unique(np.stack([actor_ids, movie_ids], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def timed(func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(*arg)
+    return (time.perf_counter() - start) / len(args) * 1000
+
+
+def main(links=1000000):
+    actor_ids, movie_ids = generate(links)
+    actors = int(actor_ids.max()) + 1
+    rnd = random.Random(1)
+    print('links: {}, actors: {}, movies: {}'.format(len(actor_ids), actors, int(movie_ids.max()) + 1))
+
+    graph = CoStarGraph()
+    start = time.perf_counter()
+    graph.load(actor_ids, movie_ids)
+    print('build: {:.1f} ms'.format((time.perf_counter() - start) * 1000))
+
+    pairs = [(rnd.randrange(actors), rnd.randrange(actors)) for _ in range(QUERIES)]
+    print('shortest path: {:.3f} ms'.format(timed(graph.shortest_path, pairs)))
+    sources = [(rnd.randrange(actors),) for _ in range(QUERIES)]
+    print('2 hops, graph: {:.3f} ms'.format(timed(lambda source: graph.neighborhood(source, 2), sources)))
+
+    changes = [(rnd.randrange(actors), [rnd.randrange(len(movie_ids) // CAST_SIZE)]) for _ in range(QUERIES)]
+    print('add link: {:.3f} ms'.format(timed(lambda actor_id, movies: graph.add('Actor', actor_id, movies), changes)))
+    print('shortest path after changes: {:.3f} ms'.format(timed(graph.shortest_path, pairs)))
+
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE association (actor_id INTEGER, movie_id INTEGER, PRIMARY KEY (actor_id, movie_id))')
+        conn.exec_driver_sql('CREATE INDEX ix_association_movie_id_actor_id ON association (movie_id, actor_id)')
+        conn.exec_driver_sql('INSERT INTO association VALUES (?, ?)', list(zip(actor_ids.tolist(), movie_ids.tolist())))
+    with engine.connect() as conn:
+        query = lambda source: conn.execute(TWO_HOPS, dict(source=source)).all()
+        print('2 hops, recursive SQL: {:.3f} ms'.format(timed(query, sources[:SQL_QUERIES])))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,138 @@
+"""
+Synthetic catalog for benchmarks: N actors, M movies and a power-law
+distributed `association`, a few actors play in many movies and a few movies
+have big casts like in real data. Same seed gives the same data.
+
+    python -m benchmarks.data --db-url sqlite:///bench.db --size medium
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+import numpy as np
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from sqlalchemy import insert, text  # noqa: E402
+
+# name -> (actors, movies, links)
+SIZES = {
+    'small': (1000, 200, 5000),
+    'medium': (20000, 4000, 100000),
+    'large': (200000, 40000, 1000000),
+}
+GENRES = ['drama', 'comedy', 'action', 'thriller', 'sci-fi', 'horror', 'romance', 'western']
+GENDERS = ['female', 'male']
+# exponents of popularity, weight of the k-th most popular record is 1 / k ** alpha;
+# filmographies are more skewed than casts
+ACTOR_ALPHA = 0.8
+MOVIE_ALPHA = 0.3
+CHUNK = 10000
+
+
+def popularity(size, rng, alpha):
+    """
+    Power-law weights given to records in random order, so popularity does not follow ids
+    """
+    weights = 1.0 / np.arange(1, size + 1) ** alpha
+    return rng.permutation(weights / weights.sum())
+
+
+def generate_links(actors, movies, links, seed=0):
+    """
+    Distinct (actor, movie) pairs, both sides picked with power-law popularity
+
+    return: tuple of int64 arrays (actor ids, movie ids), ids start at 1
+    """
+    links = min(links, actors * movies)
+    rng = np.random.default_rng(seed)
+    actor_p, movie_p = popularity(actors, rng, ACTOR_ALPHA), popularity(movies, rng, MOVIE_ALPHA)
+    pairs = np.zeros((0, 2), dtype=np.int64)
+    while len(pairs) < links:
+        size = (links - len(pairs)) * 2
+        batch = np.stack([rng.choice(actors, size=size, p=actor_p), rng.choice(movies, size=size, p=movie_p)], axis=1)
+        pairs = np.unique(np.concatenate([pairs, batch]), axis=0)
+    pairs = pairs[np.sort(rng.choice(len(pairs), size=links, replace=False))] + 1
+    return pairs[:, 0], pairs[:, 1]
+
+
+def generate_records(actors, movies, seed=0):
+    """
+    return: tuple (list of actor dicts, list of movie dicts) with ids from 1
+    """
+    rng = np.random.default_rng(seed + 1)
+    genres = rng.choice(len(GENRES), size=movies, p=popularity(len(GENRES), rng, 1))
+    years = rng.integers(1950, 2025, size=movies)
+    days = rng.integers(0, 365 * 60, size=actors)
+    born = date(1940, 1, 1).toordinal()
+    actor_rows = [dict(id=i + 1, name='Actor {}'.format(i + 1), gender=GENDERS[i % 2],
+                       date_of_birth=date.fromordinal(born + int(days[i]))) for i in range(actors)]
+    movie_rows = [dict(id=i + 1, name='Movie {}'.format(i + 1), year=int(years[i]), genre=GENRES[genres[i]])
+                  for i in range(movies)]
+    return actor_rows, movie_rows
+
+
+def populate(app, actors, movies, links, seed=0):
+    """
+    Fill empty database of app, then count sizes and stats like migration does
+
+    return: dict with numbers of records and seconds taken
+    """
+    from core import db
+    from models.actor import Actor
+    from models.base import backfill_sizes
+    from models.movie import Movie
+    from models.relations import association
+    from models.stats import rebuild
+
+    start = time.perf_counter()
+    actor_rows, movie_rows = generate_records(actors, movies, seed)
+    actor_ids, movie_ids = generate_links(actors, movies, links, seed)
+    link_rows = [dict(actor_id=a, movie_id=m) for a, m in zip(actor_ids.tolist(), movie_ids.tolist())]
+    with app.app_context():
+        for table, rows in ((Actor.__table__, actor_rows), (Movie.__table__, movie_rows), (association, link_rows)):
+            for i in range(0, len(rows), CHUNK):
+                db.session.execute(insert(table), rows[i:i + CHUNK])
+        if db.engine.dialect.name == 'postgresql':
+            # ids were given explicitly, move sequences past them for records created later
+            for table in (Actor.__table__, Movie.__table__):
+                db.session.execute(text("SELECT setval(pg_get_serial_sequence('{0}', 'id'), max(id)) FROM {0}"
+                                        .format(table.name)))
+        db.session.commit()
+        backfill_sizes()
+        rebuild()
+    return dict(actors=actors, movies=movies, links=len(link_rows), seconds=round(time.perf_counter() - start, 2))
+
+
+def add_arguments(parser):
+    """
+    Data size arguments shared by the benchmarks
+    """
+    parser.add_argument('--size', choices=SIZES, default='small')
+    parser.add_argument('--actors', type=int, help='override actors of --size')
+    parser.add_argument('--movies', type=int, help='override movies of --size')
+    parser.add_argument('--links', type=int, help='override links of --size')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def data_size(args):
+    """
+    return: tuple (actors, movies, links) from parsed arguments
+    """
+    actors, movies, links = SIZES[args.size]
+    return args.actors or actors, args.movies or movies, args.links or links
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill empty database with synthetic data')
+    parser.add_argument('--db-url', required=True)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from core import create_app
+    print(populate(create_app(args.db_url), *data_size(args), seed=args.seed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+HTTP load on a weighted mix of routes, with latency percentiles and
+throughput per route
+
+By default the app is served in this process by werkzeug's threaded server on
+synthetic data from `benchmarks.data`. Client threads keep their connections
+alive and pick routes by weight. With --url an already running server (e.g.
+gunicorn on a database filled by `python -m benchmarks.data`) is loaded
+instead, --size must then match its data.
+
+    python -m benchmarks.load [--size medium] [--clients 8] [--duration 10] [--json out.json]
+"""
+import argparse
+import http.client
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from werkzeug.serving import WSGIRequestHandler, make_server  # noqa: E402
+
+from benchmarks.data import add_arguments, data_size, populate  # noqa: E402
+from benchmarks.report import print_table, summarize, write_report  # noqa: E402
+
+# (name, weight, method, path template, form body template), {actor} and {movie} are random ids
+MIX = [
+    ('GET /api/actors', 20, 'GET', '/api/actors?limit=100', None),
+    ('GET /api/movies include=cast', 10, 'GET', '/api/movies?limit=20&include=cast', None),
+    ('GET /api/actor', 25, 'GET', '/api/actor?id={actor}', None),
+    ('GET /api/movie', 15, 'GET', '/api/movie?id={movie}', None),
+    ('GET /api/search', 10, 'GET', '/api/search?q=Actor+{actor}', None),
+    ('GET /api/actor/costars', 5, 'GET', '/api/actor/costars?id={actor}', None),
+    ('GET /api/actor/similar', 5, 'GET', '/api/actor/similar?id={actor}', None),
+    ('GET /api/stats', 2, 'GET', '/api/stats', None),
+    ('PUT /api/movie', 5, 'PUT', '/api/movie', {'id': '{movie}', 'year': '2000'}),
+    # keeps existing links, so random pairs do not fail like with `PUT /api/actor-relations`
+    ('PUT /api/actor-relations/bulk', 3, 'PUT', '/api/actor-relations/bulk',
+     {'id': '{actor}', 'relation_ids': '{movie}'}),
+]
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve(app):
+    """
+    Start threaded server for app on a free port
+
+    return: tuple (server, base url)
+    """
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_port)
+
+
+def requests(actors, movies, rnd):
+    """
+    Endless random requests of the mix
+
+    return: generator of tuples (name, method, path, body, headers)
+    """
+    names = [name for name, *_ in MIX]
+    weights = [weight for _, weight, *_ in MIX]
+    entries = {name: entry for name, *entry in MIX}
+    while True:
+        name = rnd.choices(names, weights)[0]
+        _, method, path, body = entries[name]
+        ids = dict(actor=rnd.randint(1, actors), movie=rnd.randint(1, movies))
+        headers = {}
+        if body is not None:
+            body = urlencode({key: value.format(**ids) for key, value in body.items()})
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        yield name, method, path.format(**ids), body, headers
+
+
+def client(url, actors, movies, seed, deadline, timings, errors):
+    """
+    Send requests over one keep-alive connection until deadline
+
+    timings: dict name -> list of seconds, filled by this client
+    errors: dict name -> number of responses with status >= 400
+    """
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port)
+    for name, method, path, body, headers in requests(actors, movies, random.Random(seed)):
+        if time.perf_counter() >= deadline:
+            break
+        start = time.perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+        if response.status >= 400:
+            errors[name] = errors.get(name, 0) + 1
+    connection.close()
+
+
+def run(url, actors, movies, clients, duration, seed):
+    """
+    return: dict name -> summary with errors, 'all' for the whole mix
+    """
+    timings = [{} for _ in range(clients)]
+    errors = [{} for _ in range(clients)]
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client, args=(url, actors, movies, seed + i, deadline, timings[i], errors[i]))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    results = {}
+    for name, *_ in MIX:
+        latencies = [t for client_timings in timings for t in client_timings.get(name, [])]
+        results[name] = dict(summarize(latencies, seconds), errors=sum(e.get(name, 0) for e in errors))
+    latencies = [t for client_timings in timings for values in client_timings.values() for t in values]
+    results['all'] = dict(summarize(latencies, seconds), errors=sum(sum(e.values()) for e in errors))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db-url', help='empty database to fill, temporary SQLite file by default')
+    parser.add_argument('--url', help='load this running server instead, its data is not filled; '
+                                      '--db-url then only names its database in the report')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--json', help='write report to this file')
+    add_arguments(parser)
+    args = parser.parse_args()
+    actors, movies, links = data_size(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or 'sqlite:///{}/bench.db'.format(tmp)
+        server = None
+        url = args.url
+        if not url:
+            from core import create_app
+
+            app = create_app(db_url)
+            print('data: {}'.format(populate(app, actors, movies, links, seed=args.seed)))
+            server, url = serve(app)
+        try:
+            if args.warmup:
+                run(url, actors, movies, args.clients, args.warmup, args.seed)
+            results = run(url, actors, movies, args.clients, args.duration, args.seed)
+        finally:
+            if server:
+                server.shutdown()
+    print_table(results)
+    print('errors: {}'.format({name: row['errors'] for name, row in results.items() if row['errors']}))
+
+    if args.json:
+        params = dict(vars(args), actors=actors, movies=movies, links=links)
+        del params['db_url']  # in environment, without password
+        write_report(args.json, 'load', db_url if not args.url else args.db_url, params, results)
+
+
+if __name__ == '__main__':
+    main()
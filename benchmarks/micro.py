@@ -0,0 +1,142 @@
+"""
+Micro-benchmarks of serialization, `Model` writes and the list endpoints on
+synthetic data from `benchmarks.data`
+
+Every case is called --iterations times after a short warm-up, each call in
+its own app context like a request. List endpoints go through Flask's test
+client, so routing, metrics and response building are included but no HTTP.
+
+    python -m benchmarks.micro [--size medium] [--db-url postgresql://...] [--json out.json]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from sqlalchemy import select  # noqa: E402
+
+from benchmarks.data import add_arguments, data_size, populate  # noqa: E402
+from benchmarks.report import print_table, summarize, write_report  # noqa: E402
+
+WARMUP = 10
+# operations of one /api/batch request, compared with as many single requests
+BATCH_SIZE = 20
+LIST_ROUTES = [
+    '/api/actors?limit=100',
+    '/api/actors?limit=100&order_by=-filmography_size',
+    '/api/movies?limit=100&genre=drama',
+    '/api/movies?limit=20&include=cast',
+]
+
+
+def measure(app, func, args):
+    """
+    Call func once per item of args, every call in a fresh app context
+
+    return: list of seconds taken by every call
+    """
+    timings = []
+    for arg in args:
+        with app.app_context():
+            start = time.perf_counter()
+            func(*arg)
+            timings.append(time.perf_counter() - start)
+    return timings[WARMUP:]
+
+
+def cases(app, actors, movies, iterations, rnd):
+    """
+    return: dict name -> tuple (function, list of argument tuples)
+    """
+    from controllers.serializers import actor_serializer, dumps, movie_serializer
+    from core import db
+    from models.actor import Actor
+    from models.movie import Movie
+    from models.relations import association
+
+    calls = iterations + WARMUP
+    client = app.test_client()
+
+    with app.app_context():
+        page = Actor.page(limit=100)
+        movie_page = Movie.page(limit=20, options=movie_serializer.load_options(['cast']))
+        db.session.expunge_all()
+        linked = set(db.session.execute(select(association.c.actor_id, association.c.movie_id)).all())
+    new_links = set()
+    while len(new_links) < calls:
+        pair = (rnd.randint(1, actors), rnd.randint(1, movies))
+        if pair not in linked:
+            new_links.add(pair)
+
+    def create(i):
+        Actor.create(name='Bench actor {}'.format(i), gender='male', date_of_birth=date(1980, 1, 1))
+
+    def add_relation(actor_id, movie_id):
+        Actor.add_relation(actor_id, db.session.get(Movie, movie_id))
+
+    def post_actors(i, batch):
+        data = [dict(name='Batch actor {} {}'.format(i, j), gender='female', date_of_birth='01.01.1980')
+                for j in range(BATCH_SIZE)]
+        if batch:
+            response = client.post('/api/batch', json=[dict(method='POST', path='/api/actor', data=d) for d in data])
+            assert response.status_code == 200
+        for d in data if not batch else []:
+            assert client.post('/api/actor', data=d).status_code == 200
+
+    def get(route):
+        response = client.get(route)
+        assert response.status_code == 200, route
+
+    genres = ['drama', 'comedy']
+    found = {
+        'serialize 100 actors': (lambda: dumps(actor_serializer.to_list(page)), [()] * calls),
+        'serialize 20 movies with cast': (lambda: dumps(movie_serializer.to_list(movie_page, ['cast'])), [()] * calls),
+        'Actor.create': (create, [(i,) for i in range(calls)]),
+        'Movie.update': (lambda row_id, genre: Movie.update(row_id, genre=genre),
+                         [(rnd.randint(1, movies), genres[i % 2]) for i in range(calls)]),
+        'Actor.add_relation': (add_relation, sorted(new_links)),
+        'POST /api/actor x {}'.format(BATCH_SIZE): (post_actors, [(i, False) for i in range(calls)]),
+        'POST /api/batch of {} creates'.format(BATCH_SIZE): (post_actors, [(i, True) for i in range(calls)]),
+        'GET /api/actor?id=': (get, [('/api/actor?id={}'.format(rnd.randint(1, actors)),) for _ in range(calls)]),
+    }
+    for route in LIST_ROUTES:
+        found['GET ' + route] = (get, [(route,)] * calls)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--db-url', help='empty database to fill, temporary SQLite file by default')
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--only', help='run cases whose name contains this')
+    parser.add_argument('--json', help='write report to this file')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    from core import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = args.db_url or 'sqlite:///{}/bench.db'.format(tmp)
+        app = create_app(db_url)
+        actors, movies, links = data_size(args)
+        print('data: {}'.format(populate(app, actors, movies, links, seed=args.seed)))
+
+        results = {}
+        for name, (func, call_args) in cases(app, actors, movies, args.iterations, random.Random(args.seed)).items():
+            if args.only and args.only not in name:
+                continue
+            results[name] = summarize(measure(app, func, call_args))
+        print_table(results)
+
+    if args.json:
+        params = dict(vars(args), actors=actors, movies=movies, links=links)
+        del params['db_url']  # in environment, without password
+        write_report(args.json, 'micro', db_url, params, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Summaries and JSON reports shared by `benchmarks.micro` and `benchmarks.load`
+
+Every report has the commit and environment it was measured on, so files
+of two runs can be put side by side with `benchmarks.compare`.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+
+def summarize(latencies, seconds=None):
+    """
+    latencies: seconds taken by every call
+    seconds: wall time of all calls, by default their sum
+    return: dict with count, throughput and latency percentiles in ms
+    """
+    ms = np.asarray(latencies) * 1000
+    seconds = seconds if seconds is not None else float(ms.sum()) / 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if len(ms) else (0, 0, 0)
+    return {
+        'count': len(ms),
+        'per_second': round(len(ms) / seconds, 1) if seconds else 0,
+        'mean_ms': round(float(ms.mean()), 3) if len(ms) else 0,
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+    }
+
+
+def git_commit():
+    """
+    return: commit hash with '+dirty' for uncommitted changes, None outside of git
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('+dirty' if dirty else '')
+
+
+def environment(db_url):
+    """
+    db_url: database the results were measured on, None if not known
+    """
+    from sqlalchemy import __version__ as sqlalchemy_version
+    from sqlalchemy.engine import make_url
+
+    url = make_url(db_url) if db_url else None
+    return {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy_version,
+        'database': url.get_backend_name() if url else None,
+        'db_url': url.render_as_string(hide_password=True) if url else None,
+        'cpus': os.cpu_count(),
+    }
+
+
+def print_table(results):
+    """
+    results: dict name -> summary
+    """
+    print('{:<52} {:>8} {:>10} {:>9} {:>9} {:>9}'.format('', 'count', 'per s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for name, row in results.items():
+        print('{:<52} {:>8} {:>10.1f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+            name, row['count'], row['per_second'], row['p50_ms'], row['p95_ms'], row['p99_ms']))
+
+
+def write_report(path, benchmark, db_url, params, results):
+    """
+    Save results with parameters and environment as JSON
+    """
+    report = {'benchmark': benchmark, 'environment': environment(db_url), 'params': params, 'results': results}
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
@@ -0,0 +1,57 @@
+"""
+Compare list response serialization before and after controllers.serializers
+
+    python -m benchmarks.serialization [rows]
+"""
+import os
+import sys
+import time
+from datetime import date
+
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+from flask import jsonify  # noqa: E402
+
+from core import create_app  # noqa: E402
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows=100000):
+    app = create_app('sqlite://')
+    with app.test_request_context():
+        from controllers.actor import actor_serializer
+        from controllers.serializers import dumps
+        from models.actor import Actor
+        from settings.constants import ACTOR_FIELDS
+
+        actors = [
+            Actor(id=i, name='Actor {}'.format(i), gender='female',
+                  date_of_birth=date(1950 + i % 50, 1 + i % 12, 1 + i % 28))
+            for i in range(rows)
+        ]
+
+        def dict_filtering():
+            data = [{k: v for k, v in actor.__dict__.items() if k in ACTOR_FIELDS} for actor in actors]
+            return jsonify(data).get_data()
+
+        def serializer():
+            return dumps(actor_serializer.to_list(actors))
+
+        old = best_of(dict_filtering)
+        new = best_of(serializer)
+        print('rows: {}'.format(rows))
+        print('__dict__ filtering + jsonify: {:.3f} s'.format(old))
+        print('Serializer + dumps:           {:.3f} s'.format(new))
+        print('speedup: {:.1f}x'.format(old / new))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
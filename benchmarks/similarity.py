@@ -0,0 +1,66 @@
+"""
+Top-k similar actors and movies on a synthetic graph with 100k actors:
+co-star graph arrays against a self-join over the association table
+
+    python -m benchmarks.similarity [links]
+"""
+import random
+import sys
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.costar_graph import generate, timed
+from models.graph import CoStarGraph
+
+QUERIES = 200
+SQL_QUERIES = 20
+LIMIT = 10
+
+# shared movies with every other actor, the way it would be done without the graph
+SHARED = text('''
+SELECT b.actor_id, count(*) AS shared
+FROM association a JOIN association b ON b.movie_id = a.movie_id
+WHERE a.actor_id = :actor_id AND b.actor_id != :actor_id
+GROUP BY b.actor_id ORDER BY shared DESC LIMIT :limit
+''')
+
+
+def main(links=1000000):
+    actor_ids, movie_ids = generate(links)
+    actors, movies = int(actor_ids.max()) + 1, int(movie_ids.max()) + 1
+    rnd = random.Random(2)
+    print('links: {}, actors: {}, movies: {}'.format(len(actor_ids), actors, movies))
+
+    graph = CoStarGraph()
+    graph.load(actor_ids, movie_ids)
+    sample = [(rnd.randrange(actors),) for _ in range(QUERIES)]
+    # actors picked by number of movies, as popular ones are asked about more
+    popular = [(int(actor_ids[rnd.randrange(len(actor_ids))]),) for _ in range(QUERIES)]
+    cases = [
+        ('Actor', 'any', sample),
+        ('Actor', 'popular', popular),
+        ('Movie', 'any', [(rnd.randrange(movies),) for _ in range(QUERIES)]),
+    ]
+    for kind, label, ids in cases:
+        for metric in ['jaccard', 'cosine']:
+            ms = timed(lambda row_id: graph.similar(kind, row_id, LIMIT, metric), ids)
+            print('{} ({}) {}: {:.3f} ms'.format(kind, label, metric, ms))
+
+    for row_id, in sample[:QUERIES // 2]:
+        graph.add('Actor', row_id, [rnd.randrange(movies)])
+    ms = timed(lambda row_id: graph.similar('Actor', row_id, LIMIT, 'jaccard'), sample)
+    print('Actor jaccard after {} changes: {:.3f} ms'.format(QUERIES // 2, ms))
+
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE association (actor_id INTEGER, movie_id INTEGER, PRIMARY KEY (actor_id, movie_id))')
+        conn.exec_driver_sql('CREATE INDEX ix_association_movie_id_actor_id ON association (movie_id, actor_id)')
+        conn.exec_driver_sql('INSERT INTO association VALUES (?, ?)', list(zip(actor_ids.tolist(), movie_ids.tolist())))
+    with engine.connect() as conn:
+        query = lambda row_id: conn.execute(SHARED, dict(actor_id=row_id, limit=LIMIT)).all()
+        print('Actor (any) shared count, SQL: {:.3f} ms'.format(timed(query, sample[:SQL_QUERIES])))
+        print('Actor (popular) shared count, SQL: {:.3f} ms'.format(timed(query, popular[:SQL_QUERIES])))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,68 @@
+"""
+Wall time of `create_app()` in a fresh process: full startup (migration DDL
+checks and all controllers imported, as every boot did before the schema
+stamp) against the stamp check with lazy controllers
+
+Database round trips are slowed down by --latency milliseconds to stand for
+a database over the network.
+
+    python -m benchmarks.startup [--latency 2] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CHILD = '''
+import os, time
+start = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+queries = []
+latency = float(os.environ['LATENCY_MS']) / 1000
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def round_trip(conn, cursor, statement, parameters, context, executemany):
+    queries.append(statement)
+    time.sleep(latency)
+
+from core import create_app
+if os.environ['MODE'] == 'full':
+    app = create_app(schema_check='off')
+    with app.app_context():
+        from core.schema import migrate
+        migrate()
+        from controllers import actor, graph, movie, search, stats
+else:
+    create_app(schema_check='strict')
+print(time.perf_counter() - start, len(queries))
+'''
+
+
+def run(mode, db_url, latency):
+    env = dict(os.environ, DB_URL=db_url, MODE=mode, LATENCY_MS=str(latency))
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', CHILD], env=env, check=True,
+                         capture_output=True, text=True).stdout.split()
+    return float(out[0]) * 1000, int(out[1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=2.0)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = 'sqlite:///{}/startup.db'.format(tmp)
+        run('full', db_url, 0)  # create and stamp the database
+        print('{:>8} {:>12} {:>8}'.format('mode', 'median, ms', 'queries'))
+        for mode in ('full', 'stamp'):
+            results = [run(mode, db_url, args.latency) for _ in range(args.runs)]
+            print('{:>8} {:>12.1f} {:>8}'.format(mode, statistics.median(ms for ms, _ in results), results[0][1]))
+
+
+if __name__ == '__main__':
+    main()
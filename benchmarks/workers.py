@@ -0,0 +1,92 @@
+"""
+Throughput of the production server against number of gunicorn workers
+
+Starts `gunicorn -c gunicorn.conf.py wsgi:app` on a seeded SQLite file for
+every worker count, loads it from client threads for a few seconds, then
+stops it with SIGTERM and checks it shut down cleanly.
+
+    python -m benchmarks.workers [workers ...]
+"""
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PORT = 8765
+CLIENTS = 16
+DURATION = 5
+ACTORS = 1000
+ROUTE = '/api/actors?limit=100'
+
+
+def seed(db_url):
+    env = dict(os.environ, DB_URL=db_url)
+    code = '''
+from core import create_app
+client = create_app().test_client()
+actors = [dict(name='Actor {}'.format(i), gender='male', date_of_birth='01.01.1970') for i in range(%d)]
+assert client.post('/api/actors/bulk', json=actors).status_code == 200
+''' % ACTORS
+    subprocess.run([sys.executable, '-c', code], env=env, check=True)
+
+
+def start(db_url, workers):
+    env = dict(os.environ, DB_URL=db_url, WEB_WORKERS=str(workers), WEB_BIND='127.0.0.1:{}'.format(PORT))
+    server = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', PORT)
+            conn.request('GET', ROUTE)
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError('server did not start')
+
+
+def load():
+    """
+    return: requests per second done by CLIENTS keep-alive connections in DURATION seconds
+    """
+    counts = [0] * CLIENTS
+    deadline = time.perf_counter() + DURATION
+
+    def client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', PORT)
+        while time.perf_counter() < deadline:
+            conn.request('GET', ROUTE)
+            response = conn.getresponse()
+            response.read()
+            assert response.status == 200
+            counts[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / DURATION
+
+
+def main(*worker_counts):
+    worker_counts = worker_counts or (1, 2, 4)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = 'sqlite:///{}/load.db'.format(tmp)
+        seed(db_url)
+        print('cpus: {}'.format(os.cpu_count()))
+        print('{:>8} {:>10} {:>10}'.format('workers', 'req/s', 'exit code'))
+        for workers in worker_counts:
+            server = start(db_url, workers)
+            rate = load()
+            server.send_signal(signal.SIGTERM)
+            print('{:>8} {:>10.1f} {:>10}'.format(workers, rate, server.wait(timeout=60)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
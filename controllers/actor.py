@@ -1,25 +1,77 @@
-from flask import jsonify, make_response
+from flask import jsonify, make_response, request
 
 from datetime import datetime
-from ast import literal_eval
 
 from models.actor import Actor
 from models.movie import Movie
-from settings.constants import ACTOR_FIELDS  # to make response pretty
-from .parse_request import get_request_data
-from core import db
+from settings.constants import ACTOR_SORT_FIELDS
+from .parse_request import check_strings, get_request_data
+from .pagination import get_page_params, next_cursor
+from .streaming import stream_rows
+from .bulk import bulk_create, bulk_add_relations
+from .conditional import entity_response, not_modified, page_etag
+from .serializers import actor_serializer, movie_serializer, json_response
+
+
+def get_actor_filters(data):
+    """
+    Translate filter parameters into SQL predicates
+
+    data: dict with request data (`gender`, `born_after`, `born_before`)
+    return: list of SQL expressions
+    raise: ValueError with message for the client
+    """
+    filters = []
+    if 'gender' in data:
+        filters.append(Actor.gender == data['gender'])
+    try:
+        if 'born_after' in data:
+            filters.append(Actor.date_of_birth > datetime.strptime(data['born_after'], DATE_FORMAT).date())
+        if 'born_before' in data:
+            filters.append(Actor.date_of_birth < datetime.strptime(data['born_before'], DATE_FORMAT).date())
+    except ValueError:
+        raise ValueError('Invalid date format. Use dd.mm.yyyy')
+    return filters
 
 
 def get_all_actors():
     """
-    Get list of all records
+    Get one page of records, cursor of the next page is sent in `X-Next-Cursor` header,
+    or all of them with `?stream=ndjson|json`, see `stream_all_actors`
+
+    Records can be filtered, see `get_actor_filters`
+    """
+    if 'stream' in request.args:
+        return stream_all_actors()
+    data = get_request_data()
+    try:
+        order_by, after, limit = get_page_params(data, ACTOR_SORT_FIELDS)
+        include = actor_serializer.parse_include(data.get('include'))
+        filters = get_actor_filters(data)
+    except ValueError as e:
+        return make_response(jsonify(error=str(e)), 400)
+
+    all_actors = Actor.page(order_by, after, limit + 1, actor_serializer.load_options(include), filters)
+    # pages with relations are not tagged, versions do not follow relations
+    etag = None if include else page_etag(all_actors, data)
+    if etag and request.if_none_match.contains(etag):
+        return not_modified(etag)
+    actors = actor_serializer.to_list(all_actors[:limit], include)
+    response = json_response(actors)
+    if etag:
+        response.set_etag(etag)
+    cursor = next_cursor(all_actors, order_by, limit)
+    if cursor:
+        response.headers['X-Next-Cursor'] = cursor
+    return response
+
+
+def stream_all_actors():
     """
-    all_actors = Actor.query.all()
-    actors = []
-    for actor in all_actors:
-        act = {k: v for k, v in actor.__dict__.items() if k in ACTOR_FIELDS}
-        actors.append(act)
-    return make_response(jsonify(actors), 200)
+    Stream all records, `stream` parameter selects 'ndjson' or 'json' format
+    """
+    data = get_request_data()
+    return stream_rows(actor_serializer, data.get('stream'))
 
 
 def get_actor_by_id():
@@ -34,14 +86,17 @@ def get_actor_by_id():
             err = 'Id must be integer'
             return make_response(jsonify(error=err), 400)
 
-        obj = Actor.query.filter_by(id=row_id).first()
         try:
-            actor = {k: v for k, v in obj.__dict__.items() if k in ACTOR_FIELDS}
-        except:
+            include = actor_serializer.parse_include(data.get('include'))
+        except ValueError as e:
+            return make_response(jsonify(error=str(e)), 400)
+
+        response = entity_response(Actor, row_id, actor_serializer, include)
+        if response is None:
             err = 'Record with such id does not exist'
             return make_response(jsonify(error=err), 400)
 
-        return make_response(jsonify(actor), 200)
+        return response
 
     else:
         err = 'No id specified'
@@ -68,31 +123,56 @@ DATE_FORMAT = "%d.%m.%Y"
 REQUIRED_FIELDS = {"name", "gender", "date_of_birth"}
 ALLOWED_FIELDS = REQUIRED_FIELDS  # актор не повинен мати інших полів
 
-def add_actor():
-    data = get_request_data()
+def validate_actor(data):
+    """
+    Check fields of new actor
 
+    data: dict with actor parameters
+    return: tuple (record ready to be saved or None, error message or None)
+    """
     # 1. Перевірка, що всі потрібні поля присутні
     if not REQUIRED_FIELDS.issubset(data):
-        return make_response(jsonify({"error": "Missing required fields"}), 400)
+        return None, "Missing required fields"
 
     # 2. Перевірка, що **немає зайвих полів**
     if not set(data).issubset(ALLOWED_FIELDS):
-        return make_response(jsonify({"error": "Invalid fields present"}), 400)
+        return None, "Invalid fields present"
+
+    err = check_strings(Actor, data, ['name', 'gender'])
+    if err:
+        return None, err
 
     # 3. Перевірка формату дати
     try:
-        datetime.strptime(data["date_of_birth"], DATE_FORMAT)
-    except ValueError:
-        return make_response(jsonify({"error": "Invalid date format. Use dd.mm.yyyy"}), 400)
+        date_of_birth = datetime.strptime(data["date_of_birth"], DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return None, "Invalid date format. Use dd.mm.yyyy"
+
+    return {**data, "date_of_birth": date_of_birth}, None
+
+
+def add_actor():
+    data = get_request_data()
+
+    record, err = validate_actor(data)
+    if err:
+        return make_response(jsonify({"error": err}), 400)
 
     # 4. Створення запису
     try:
-        new_record = Actor.create(**data)
+        new_record = Actor.create(**record)
     except AssertionError as e:
         return make_response(jsonify({"error": str(e)}), 500)
 
-    new_actor = {k: v for k, v in new_record.__dict__.items() if k in ACTOR_FIELDS}
-    return make_response(jsonify(new_actor), 200)
+    new_actor = actor_serializer.to_dict(new_record)
+    return json_response(new_actor)
+
+
+def add_actors_bulk():
+    """
+    Add list of actors sent as JSON array
+    """
+    return bulk_create(Actor, validate_actor)
 
 
 def update_actor():
@@ -108,27 +188,26 @@ def update_actor():
 
     data.pop('id')
 
-    # Перевіримо, чи існує запис з таким id
-    if not db.session.query(Actor).filter_by(id=row_id).first():
-        return make_response(jsonify(error="Actor not found"), 400)
-
     # Перевіримо, що передані лише валідні поля
     for key in data:
-        if key not in ACTOR_FIELDS:
+        if key not in ALLOWED_FIELDS:
             return make_response(jsonify(error=f"Invalid field '{key}'"), 400)
 
     # Перевіримо формат дати
     if 'date_of_birth' in data:
         try:
-            datetime.strptime(data['date_of_birth'], "%d.%m.%Y")
+            data['date_of_birth'] = datetime.strptime(data['date_of_birth'], DATE_FORMAT).date()
         except ValueError:
             return make_response(jsonify(error="Invalid date format, expected dd.mm.yyyy"), 400)
 
     try:
         # Використовуємо твій метод update
         upd_record = Actor.update(row_id, **data)
-        upd_actor = {k: v for k, v in upd_record.__dict__.items() if k in ACTOR_FIELDS}
-        return make_response(jsonify(upd_actor), 200)
+        # Запис з таким id не існує
+        if upd_record is None:
+            return make_response(jsonify(error="Actor not found"), 400)
+        upd_actor = actor_serializer.to_dict(upd_record)
+        return json_response(upd_actor)
 
     except Exception as e:
         import traceback
@@ -146,12 +225,8 @@ def delete_actor():
         row_id = int(data['id'])
     except (KeyError, ValueError):
         return make_response(jsonify(error="Invalid or missing 'id'"), 400)
-    if not db.session.query(Actor).filter_by(id=row_id).first():
+    if not Actor.delete(row_id):
         return make_response(jsonify(error="Such actor shold exist "), 400)
-    try:
-        Actor.delete(row_id)
-    except (KeyError, ValueError):
-        return make_response(jsonify(error="There is no such an object to delete"), 400)
     # use this for 200 response code
     msg = 'Record successfully deleted'
     return make_response(jsonify(message=msg), 200)
@@ -188,14 +263,21 @@ def actor_add_relation():
         return make_response(jsonify(error=err), 400)
 
     # use this for 200 response code
-    rel_actor = {k: v for k, v in actor.__dict__.items() if k in ACTOR_FIELDS}
-    rel_actor['filmography'] = str(actor.filmography)
-    return make_response(jsonify(rel_actor), 200)
+    rel_actor = actor_serializer.to_dict(actor)
+    rel_actor['filmography'] = movie_serializer.to_list(actor.filmography)
+    return json_response(rel_actor)
 
     ### END CODE HERE ###
 
 
 
+def actor_add_relations_bulk():
+    """
+    Add list of movies to actor's filmography
+    """
+    return bulk_add_relations(Actor)
+
+
 def actor_clear_relations():
     """
     Clear all relations by id
@@ -207,12 +289,10 @@ def actor_clear_relations():
     except (KeyError, ValueError):
         return make_response(jsonify(error="Invalid or missing 'id'"), 400)
 
-    actor_obj = Actor.query.get(actor_id)
-    if not actor_obj:
-        return make_response(jsonify(error="Actor not found"), 400)
-
     actor = Actor.clear_relations(actor_id)
+    if actor is None:
+        return make_response(jsonify(error="Actor not found"), 400)
 
-    rel_actor = {k: v for k, v in actor.__dict__.items() if k in ACTOR_FIELDS}
+    rel_actor = actor_serializer.to_dict(actor)
     rel_actor['filmography'] = []  # після очищення – порожній список
-    return make_response(jsonify(rel_actor), 200)
+    return json_response(rel_actor)
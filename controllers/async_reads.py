@@ -0,0 +1,129 @@
+"""
+Read endpoints of the async app, see `core.asgi`
+
+Same parameters, bodies and headers as `get_all_*` and `get_*_by_id` of the
+Flask app. Handlers take the request data, headers and the entity cache of the
+app (None when it is not shared) and return a tuple (status, body, headers)
+instead of a Flask response.
+"""
+import asyncio
+
+from sqlalchemy import select
+from werkzeug.http import parse_etags, quote_etag
+
+from models.actor import Actor
+from models.movie import Movie
+from settings.constants import ACTOR_SORT_FIELDS, MOVIE_SORT_FIELDS
+from .actor import get_actor_filters
+from .conditional import entity_etag, page_etag
+from .movie import get_movie_filters
+from .pagination import get_page_params, next_cursor
+from .serializers import actor_serializer, dumps, movie_serializer
+
+JSON = {'Content-Type': 'application/json'}
+
+
+def json_result(data, status=200):
+    return status, dumps(data), dict(JSON)
+
+
+def error_result(err, status=400):
+    return json_result({'error': err}, status)
+
+
+def not_modified_result(etag):
+    return 304, b'', {'ETag': quote_etag(etag)}
+
+
+async def get_page(session, data, headers, model, serializer, sort_fields, get_filters):
+    """
+    One page of records, cursor of the next page is sent in `X-Next-Cursor` header
+    """
+    try:
+        order_by, after, limit = get_page_params(data, sort_fields)
+        include = serializer.parse_include(data.get('include'))
+        filters = get_filters(data)
+    except ValueError as e:
+        return error_result(str(e))
+
+    query = model.page_query(order_by, after, limit + 1, serializer.load_options(include), filters)
+    records = (await session.scalars(query)).all()
+    # pages with relations are not tagged, versions do not follow relations
+    etag = None if include else page_etag(records, data)
+    if etag and parse_etags(headers.get('if-none-match')).contains(etag):
+        return not_modified_result(etag)
+    status, body, result_headers = json_result(serializer.to_list(records[:limit], include))
+    if etag:
+        result_headers['ETag'] = quote_etag(etag)
+    cursor = next_cursor(records, order_by, limit)
+    if cursor:
+        result_headers['X-Next-Cursor'] = cursor
+    return status, body, result_headers
+
+
+async def get_entity(session, data, headers, cache, model, serializer, not_found):
+    """
+    Record by id, served from entity cache when possible, see `entity_response`
+
+    cache: EntityCache or None to always read the record
+    not_found: error of the Flask app for missing record
+    """
+    if 'id' not in data:
+        return error_result('No id specified')
+    try:
+        row_id = int(data['id'])
+    except ValueError:
+        return error_result('Id must be integer')
+    try:
+        include = serializer.parse_include(data.get('include'))
+    except ValueError as e:
+        return error_result(str(e))
+
+    missing = error_result(not_found)
+    if include:
+        obj = await session.scalar(select(model).options(*serializer.load_options(include)).where(model.id == row_id))
+        if obj is None:
+            return missing
+        return json_result(serializer.to_dict(obj, include))
+
+    if_none_match = parse_etags(headers.get('if-none-match'))
+    # the cache is shared through redis, its blocking client runs in a thread not to stall the loop
+    cached = await asyncio.to_thread(cache.get, model.__name__, row_id) if cache else None
+    if cached is None and if_none_match:
+        version = await session.scalar(select(model.version).where(model.id == row_id))
+        if version is None:
+            return missing
+        if if_none_match.contains(entity_etag(model, row_id, version)):
+            return not_modified_result(entity_etag(model, row_id, version))
+
+    if cached is None:
+        obj = await session.scalar(select(model).where(model.id == row_id))
+        if obj is None:
+            return missing
+        etag = entity_etag(model, row_id, obj.version)
+        body = serializer.to_json(obj)
+        if cache:
+            await asyncio.to_thread(cache.set, model.__name__, row_id, body, etag, obj.version)
+    else:
+        etag, body = cached
+
+    if if_none_match.contains(etag):
+        return not_modified_result(etag)
+    return 200, body, dict(JSON, ETag=quote_etag(etag))
+
+
+async def get_all_actors(session, data, headers, cache):
+    return await get_page(session, data, headers, Actor, actor_serializer, ACTOR_SORT_FIELDS, get_actor_filters)
+
+
+async def get_all_movies(session, data, headers, cache):
+    return await get_page(session, data, headers, Movie, movie_serializer, MOVIE_SORT_FIELDS, get_movie_filters)
+
+
+async def get_actor_by_id(session, data, headers, cache):
+    return await get_entity(session, data, headers, cache, Actor, actor_serializer,
+                            'Record with such id does not exist')
+
+
+async def get_movie_by_id(session, data, headers, cache):
+    return await get_entity(session, data, headers, cache, Movie, movie_serializer, 'Movie not found')
@@ -0,0 +1,115 @@
+import json
+import re
+from urllib.parse import parse_qsl
+
+from flask import current_app, jsonify, make_response, request
+from werkzeug.exceptions import HTTPException
+
+from models.base import transaction
+from settings.constants import BATCH_ENDPOINTS, MAX_BATCH_SIZE
+from .parse_request import operation_data
+from .serializers import json_response
+
+# `$<index>.<field>`: field of the result of an earlier operation, e.g. `$0.id`
+REFERENCE = re.compile(r'\$(\d+)\.(\w+)')
+METHODS = ['POST', 'PUT', 'DELETE']
+
+
+class OperationFailed(Exception):
+    """
+    Operation of batch got an error response, the whole batch is rolled back
+    """
+
+
+def resolve(value, results):
+    """
+    Replace reference to result of an earlier operation with its value
+
+    results: list of results of earlier operations
+    raise: ValueError with message for the client
+    """
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError('Values must be strings or numbers')
+    match = REFERENCE.fullmatch(value) if isinstance(value, str) else None
+    if not match:
+        return str(value)
+    index, field = int(match.group(1)), match.group(2)
+    if index >= len(results):
+        raise ValueError('{} refers to a later operation'.format(value))
+    body = results[index]['body']
+    if not isinstance(body, dict) or field not in body:
+        raise ValueError('{} refers to a missing field'.format(value))
+    return str(body[field])
+
+
+def parse_operation(operation, results):
+    """
+    return: tuple (method, path, form data) of operation
+    raise: ValueError with message for the client
+    """
+    if not isinstance(operation, dict):
+        raise ValueError('Operation must be an object')
+    method, path, data = operation.get('method'), operation.get('path'), operation.get('data', {})
+    if method not in METHODS:
+        raise ValueError('Method must be one of {}'.format(', '.join(METHODS)))
+    if not isinstance(path, str) or not path.startswith('/'):
+        raise ValueError('Path must be a string starting with /')
+    if not isinstance(data, dict):
+        raise ValueError('Data must be an object')
+    return method, path, {key: resolve(value, results) for key, value in data.items()}
+
+
+def run_operation(method, path, data):
+    """
+    Call view of path with form data, in the current request and so in the
+    current transaction; its SQL statements and time count for the batch
+
+    return: tuple (status code, decoded JSON body)
+    raise: ValueError if path is not an endpoint allowed in batch
+    """
+    app = current_app._get_current_object()
+    path, _, query = path.partition('?')
+    # form values take precedence over query string ones, like in `get_request_data`
+    data = dict(parse_qsl(query), **data)
+    try:
+        endpoint, view_args = app.url_map.bind('localhost').match(path, method)
+    except HTTPException:
+        endpoint = None
+    if endpoint not in BATCH_ENDPOINTS:
+        raise ValueError('{} {} is not allowed in batch'.format(method, path))
+    with operation_data(data):
+        response = app.make_response(app.view_functions[endpoint](**view_args))
+    return response.status_code, json.loads(response.get_data())
+
+
+def run_batch():
+    """
+    Run list of operations sent as JSON array in one transaction with one commit
+
+    Every operation is an object with `method`, `path` and form `data` of one
+    call of the actor, movie or relation endpoints. Values may refer to
+    results of earlier operations, e.g. `"$0.id"`. If an operation fails,
+    nothing is saved and the response is 400 with results up to the failed one.
+    """
+    operations = request.get_json(silent=True)
+    if not isinstance(operations, list) or not operations:
+        return make_response(jsonify(error='Body must be a non-empty JSON array'), 400)
+    if len(operations) > MAX_BATCH_SIZE:
+        err = 'Too many operations, max {}'.format(MAX_BATCH_SIZE)
+        return make_response(jsonify(error=err), 400)
+
+    results = []
+    try:
+        with transaction():
+            for index, operation in enumerate(operations):
+                try:
+                    status, body = run_operation(*parse_operation(operation, results))
+                except ValueError as e:
+                    status, body = 400, dict(error=str(e))
+                results.append(dict(status=status, body=body))
+                if status != 200:
+                    raise OperationFailed
+    except OperationFailed:
+        err = 'Operation {} failed, nothing was saved'.format(len(results) - 1)
+        return json_response(dict(error=err, index=len(results) - 1, results=results), 400)
+    return json_response(dict(results=results))
@@ -0,0 +1,92 @@
+from flask import jsonify, make_response, request
+
+from settings.constants import MAX_BULK_SIZE
+from .parse_request import get_request_data
+
+
+def bulk_create(model, validate):
+    """
+    Validate and insert records sent as JSON array in one pass
+
+    model: model class with `bulk_create` method
+    validate: function returning (record, error) for one record
+    return: response with result for every record in the same order
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return make_response(jsonify(error='Body must be a JSON array'), 400)
+    if len(data) > MAX_BULK_SIZE:
+        err = 'Too many records, max {}'.format(MAX_BULK_SIZE)
+        return make_response(jsonify(error=err), 400)
+
+    results = []
+    records = {}
+    for item in data:
+        record, err = validate(item) if isinstance(item, dict) else (None, 'Record must be an object')
+        if err:
+            results.append({'status': 'invalid', 'error': err})
+        elif record['name'] in records:
+            results.append({'status': 'duplicate', 'name': record['name']})
+        else:
+            records[record['name']] = record
+            results.append({'status': None, 'name': record['name']})
+
+    created, existing = model.bulk_create(list(records.values()))
+
+    for result in results:
+        if result['status'] is None:
+            name = result['name']
+            if name in created:
+                result.update(status='created', id=created[name])
+            else:
+                result.update(status='exists', id=existing.get(name))
+    counts = {status: 0 for status in ('created', 'exists', 'duplicate', 'invalid')}
+    for result in results:
+        counts[result['status']] += 1
+    return make_response(jsonify(results=results, **counts), 200)
+
+
+def parse_id_list(value):
+    """
+    Get list of unique integer ids from JSON list or comma separated string
+
+    raise: ValueError if some id is not integer
+    """
+    if isinstance(value, str):
+        value = [item for item in value.split(',') if item.strip()]
+    if not isinstance(value, list):
+        raise ValueError
+    ids = []
+    for item in value:
+        if isinstance(item, bool):
+            raise ValueError
+        ids.append(int(item))
+    return list(dict.fromkeys(ids))
+
+
+def bulk_add_relations(model):
+    """
+    Link one record with list of related records
+
+    model: model class with `add_relations` method
+    return: response with related ids split into added, existing and missing
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = get_request_data()
+    if 'id' not in data or 'relation_ids' not in data:
+        return make_response(jsonify(error='No id specified'), 400)
+    try:
+        row_id = int(data['id'])
+        rel_ids = parse_id_list(data['relation_ids'])
+    except (TypeError, ValueError):
+        return make_response(jsonify(error='Id must be integer'), 400)
+    if len(rel_ids) > MAX_BULK_SIZE:
+        err = 'Too many relations, max {}'.format(MAX_BULK_SIZE)
+        return make_response(jsonify(error=err), 400)
+
+    result = model.add_relations(row_id, rel_ids)
+    if result is None:
+        return make_response(jsonify(error='Record with such id does not exist'), 400)
+    added, existing, missing = result
+    return make_response(jsonify(id=row_id, added=added, existing=existing, missing=missing), 200)
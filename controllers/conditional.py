@@ -0,0 +1,77 @@
+import hashlib
+
+from flask import make_response, request
+
+from core.cache import entity_cache
+from .serializers import json_response
+
+
+def entity_etag(model, row_id, version):
+    """
+    Strong ETag of record, changes with every update of it
+    """
+    return '{}-{}-{}'.format(model.__name__, row_id, version)
+
+
+def page_etag(records, params):
+    """
+    Strong ETag of list page built from ids and versions of its records
+
+    records: records of the page
+    params: request parameters which select the page
+    """
+    digest = hashlib.sha1(repr(sorted(params.items())).encode())
+    for record in records:
+        digest.update(b'%d:%d;' % (record.id, record.version))
+    return digest.hexdigest()
+
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    return response
+
+
+def entity_response(model, row_id, serializer, include=()):
+    """
+    Response with serialized record, served from entity cache when possible
+
+    With `If-None-Match` header only version of record is queried and 304 is
+    returned if it matches. Records with included relationships are neither
+    cached nor tagged, version of record does not follow its relations.
+
+    model: model class
+    row_id: record id
+    serializer: Serializer of model
+    include: names of relationships to embed
+    return: response or None if record does not exist
+    """
+    if include:
+        obj = model.query.options(*serializer.load_options(include)).filter_by(id=row_id).first()
+        if obj is None:
+            return None
+        return json_response(serializer.to_dict(obj, include))
+
+    cached = entity_cache.get(model.__name__, row_id)
+    if cached is None and request.if_none_match:
+        version = model.get_version(row_id)
+        if version is None:
+            return None
+        if request.if_none_match.contains(entity_etag(model, row_id, version)):
+            return not_modified(entity_etag(model, row_id, version))
+
+    if cached is None:
+        obj = model.query.filter_by(id=row_id).first()
+        if obj is None:
+            return None
+        etag = entity_etag(model, row_id, obj.version)
+        body = serializer.to_json(obj)
+        entity_cache.set(model.__name__, row_id, body, etag, obj.version)
+    else:
+        etag, body = cached
+
+    if request.if_none_match.contains(etag):
+        return not_modified(etag)
+    response = make_response(body, 200, {'Content-Type': 'application/json'})
+    response.set_etag(etag)
+    return response
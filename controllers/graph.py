@@ -0,0 +1,164 @@
+from flask import jsonify, make_response
+from sqlalchemy import select
+
+from core import db
+from models.actor import Actor
+from models.graph import costar_graph
+from models.movie import Movie
+from settings.constants import (DEFAULT_PAGE_SIZE, DEFAULT_SIMILAR_LIMIT, GRAPH_MAX_HOPS, MAX_PAGE_SIZE,
+                                MAX_SIMILAR_LIMIT, SIMILARITY_METRICS)
+from .pagination import decode_cursor, encode_cursor, is_int
+from .parse_request import get_request_data
+from .serializers import json_response
+
+MODELS = {'Actor': Actor, 'Movie': Movie}
+
+
+def get_ids(model, data, *keys):
+    """
+    Get ids of existing records of model from request parameters
+
+    return: tuple (list of ids, error message or None)
+    """
+    ids = []
+    for key in keys:
+        if key not in data:
+            return None, 'No {} specified'.format(key)
+        try:
+            ids.append(int(data[key]))
+        except ValueError:
+            return None, '{} must be integer'.format(key.capitalize())
+    # one query for all of them
+    existing = set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+    for row_id in ids:
+        if row_id not in existing:
+            return None, '{} with id {} does not exist'.format(model.__name__, row_id)
+    return ids, None
+
+
+def get_int(data, key, default, high):
+    """
+    Get integer parameter in range 1..high
+
+    return: tuple (value, error message or None)
+    """
+    try:
+        value = int(data.get(key, default))
+    except ValueError:
+        return None, '{} must be integer'.format(key.capitalize())
+    if not 0 < value <= high:
+        return None, '{} must be between 1 and {}'.format(key.capitalize(), high)
+    return value, None
+
+
+def get_names(kind, row_ids):
+    """
+    return: dict id -> name of records of kind
+    """
+    table = MODELS[kind].__table__
+    if not row_ids:
+        return {}
+    return dict(db.session.execute(db.select(table.c.id, table.c.name).where(table.c.id.in_(row_ids))).all())
+
+
+def actor_path():
+    """
+    Shortest chain of movies and co-stars from actor `from` to actor `to`
+    """
+    data = get_request_data()
+    ids, err = get_ids(Actor, data, 'from', 'to')
+    if err:
+        return make_response(jsonify(error=err), 400)
+
+    costar_graph.build()
+    path = costar_graph.shortest_path(*ids)
+
+    names = {kind: get_names(kind, [row_id for step_kind, row_id in path if step_kind == kind]) for kind in MODELS}
+    return json_response([dict(type=kind.lower(), id=row_id, name=names[kind].get(row_id))
+                          for kind, row_id in path])
+
+
+def get_after(data):
+    """
+    Get (hops, id) of the last actor of the previous page from `cursor` parameter
+
+    return: tuple or None for the first page
+    raise: ValueError if cursor is malformed
+    """
+    if not data.get('cursor'):
+        return None
+    order_by, distance, row_id = decode_cursor(data['cursor'])
+    if order_by != 'hops' or not is_int(distance):
+        raise ValueError('Invalid cursor')
+    return distance, row_id
+
+
+def actor_costars():
+    """
+    Actors within `hops` co-starring steps of actor `id`
+
+    A page of `limit` actors ordered by distance and id, cursor of the next page
+    is sent in `X-Next-Cursor` header.
+    """
+    data = get_request_data()
+    ids, err = get_ids(Actor, data, 'id')
+    if err:
+        return make_response(jsonify(error=err), 400)
+    hops, err = get_int(data, 'hops', 1, GRAPH_MAX_HOPS)
+    if err:
+        return make_response(jsonify(error=err), 400)
+    limit, err = get_int(data, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    if err:
+        return make_response(jsonify(error=err), 400)
+    try:
+        after = get_after(data)
+    except ValueError as e:
+        return make_response(jsonify(error=str(e)), 400)
+
+    costar_graph.build()
+    actor_ids, distances = costar_graph.neighborhood(ids[0], hops)
+    if after:
+        later = (distances > after[0]) | ((distances == after[0]) & (actor_ids > after[1]))
+        actor_ids, distances = actor_ids[later], distances[later]
+    response = json_response([dict(id=actor_id, hops=distance)
+                              for actor_id, distance in zip(actor_ids[:limit].tolist(), distances[:limit].tolist())])
+    if len(actor_ids) > limit:
+        response.headers['X-Next-Cursor'] = encode_cursor('hops', int(distances[limit - 1]), int(actor_ids[limit - 1]))
+    return response
+
+
+def get_similar(model):
+    """
+    Records of model ranked by similarity of their related records to the ones of record `id`
+    """
+    data = get_request_data()
+    ids, err = get_ids(model, data, 'id')
+    if err:
+        return make_response(jsonify(error=err), 400)
+    limit, err = get_int(data, 'limit', DEFAULT_SIMILAR_LIMIT, MAX_SIMILAR_LIMIT)
+    if err:
+        return make_response(jsonify(error=err), 400)
+    metric = data.get('metric', SIMILARITY_METRICS[0])
+    if metric not in SIMILARITY_METRICS:
+        err = 'Metric must be one of {}'.format(', '.join(SIMILARITY_METRICS))
+        return make_response(jsonify(error=err), 400)
+
+    costar_graph.build()
+    row_ids, scores, shared = costar_graph.similar(model.__name__, ids[0], limit, metric)
+    names = get_names(model.__name__, row_ids.tolist())
+    return json_response([dict(id=row_id, name=names.get(row_id), score=round(score, 4), shared=count)
+                          for row_id, score, count in zip(row_ids.tolist(), scores.tolist(), shared.tolist())])
+
+
+def actor_similar():
+    """
+    Actors sharing most movies with actor `id`
+    """
+    return get_similar(Actor)
+
+
+def movie_similar():
+    """
+    Movies sharing most cast with movie `id`
+    """
+    return get_similar(Movie)
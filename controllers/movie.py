@@ -1,23 +1,78 @@
-from flask import jsonify, make_response
-from datetime import datetime
+from flask import jsonify, make_response, request
 
 from models.actor import Actor
 from models.movie import Movie
-from settings.constants import MOVIE_FIELDS
-from .parse_request import get_request_data
-from core import db
+from settings.constants import MOVIE_SORT_FIELDS
+from .parse_request import check_strings, get_request_data
+from .pagination import get_page_params, next_cursor
+from .streaming import stream_rows
+from .bulk import bulk_create, bulk_add_relations
+from .conditional import entity_response, not_modified, page_etag
+from .serializers import actor_serializer, movie_serializer, json_response
 
 REQUIRED_FIELDS = {"name", "genre", "year"}
 ALLOWED_FIELDS = REQUIRED_FIELDS
 
 
+def get_movie_filters(data):
+    """
+    Translate filter parameters into SQL predicates
+
+    data: dict with request data (`year`, `year_from`, `year_to`, `genre`)
+    return: list of SQL expressions
+    raise: ValueError with message for the client
+    """
+    filters = []
+    try:
+        if 'year' in data:
+            filters.append(Movie.year == int(data['year']))
+        if 'year_from' in data:
+            filters.append(Movie.year >= int(data['year_from']))
+        if 'year_to' in data:
+            filters.append(Movie.year <= int(data['year_to']))
+    except ValueError:
+        raise ValueError('Year must be an integer')
+    if 'genre' in data:
+        filters.append(Movie.genre == data['genre'])
+    return filters
+
+
 def get_all_movies():
-    all_movies = Movie.query.all()
-    movies = []
-    for movie in all_movies:
-        mv = {k: v for k, v in movie.__dict__.items() if k in MOVIE_FIELDS}
-        movies.append(mv)
-    return make_response(jsonify(movies), 200)
+    """
+    Get one page of records, cursor of the next page is sent in `X-Next-Cursor` header,
+    or all of them with `?stream=ndjson|json`, see `stream_all_movies`
+    """
+    if 'stream' in request.args:
+        return stream_all_movies()
+    data = get_request_data()
+    try:
+        order_by, after, limit = get_page_params(data, MOVIE_SORT_FIELDS)
+        include = movie_serializer.parse_include(data.get('include'))
+        filters = get_movie_filters(data)
+    except ValueError as e:
+        return make_response(jsonify(error=str(e)), 400)
+
+    all_movies = Movie.page(order_by, after, limit + 1, movie_serializer.load_options(include), filters)
+    # pages with relations are not tagged, versions do not follow relations
+    etag = None if include else page_etag(all_movies, data)
+    if etag and request.if_none_match.contains(etag):
+        return not_modified(etag)
+    movies = movie_serializer.to_list(all_movies[:limit], include)
+    response = json_response(movies)
+    if etag:
+        response.set_etag(etag)
+    cursor = next_cursor(all_movies, order_by, limit)
+    if cursor:
+        response.headers['X-Next-Cursor'] = cursor
+    return response
+
+
+def stream_all_movies():
+    """
+    Stream all records, `stream` parameter selects 'ndjson' or 'json' format
+    """
+    data = get_request_data()
+    return stream_rows(movie_serializer, data.get('stream'))
 
 
 def get_movie_by_id():
@@ -29,39 +84,69 @@ def get_movie_by_id():
     except:
         return make_response(jsonify(error='Id must be integer'), 400)
 
-    obj = Movie.query.filter_by(id=row_id).first()
-    if not obj:
-        return make_response(jsonify(error='Movie not found'), 400)
+    try:
+        include = movie_serializer.parse_include(data.get('include'))
+    except ValueError as e:
+        return make_response(jsonify(error=str(e)), 400)
 
-    movie = {k: v for k, v in obj.__dict__.items() if k in MOVIE_FIELDS}
-    return make_response(jsonify(movie), 200)
+    response = entity_response(Movie, row_id, movie_serializer, include)
+    if response is None:
+        return make_response(jsonify(error='Movie not found'), 400)
+    return response
 
 
-def add_movie():
-    data = get_request_data()
+def validate_movie(data):
+    """
+    Check fields of new movie
 
+    data: dict with movie parameters
+    return: tuple (record ready to be saved or None, error message or None)
+    """
     # 1. check required fields
     if not REQUIRED_FIELDS.issubset(data):
-        return make_response(jsonify(error='Missing required fields'), 400)
+        return None, 'Missing required fields'
 
     # 2. check if there are any unexpected fields
     if not set(data).issubset(ALLOWED_FIELDS):
-        return make_response(jsonify(error='Invalid fields present'), 400)
+        return None, 'Invalid fields present'
 
-    # 3. check year is integer
+    err = check_strings(Movie, data, ['name', 'genre'])
+    if err:
+        return None, err
+
+    # 3. check year is integer, a whole number in JSON or digits in form data
     try:
-        data['year'] = int(data['year'])
-    except:
-        return make_response(jsonify(error='Year must be an integer'), 400)
+        if not isinstance(data['year'], (int, str)) or isinstance(data['year'], bool):
+            raise TypeError
+        year = int(data['year'])
+    except (TypeError, ValueError):
+        return None, 'Year must be an integer'
+
+    return {**data, 'year': year}, None
+
+
+def add_movie():
+    data = get_request_data()
+
+    record, err = validate_movie(data)
+    if err:
+        return make_response(jsonify(error=err), 400)
 
     try:
-        new_record = Movie.create(**data)
-        new_movie = {k: v for k, v in new_record.__dict__.items() if k in MOVIE_FIELDS}
-        return make_response(jsonify(new_movie), 200)
+        new_record = Movie.create(**record)
+        new_movie = movie_serializer.to_dict(new_record)
+        return json_response(new_movie)
     except Exception as e:
         return make_response(jsonify(error='Invalid data'), 400)
 
 
+def add_movies_bulk():
+    """
+    Add list of movies sent as JSON array
+    """
+    return bulk_create(Movie, validate_movie)
+
+
 def update_movie():
     data = get_request_data()
     try:
@@ -71,9 +156,6 @@ def update_movie():
 
     data.pop('id')
 
-    if not Movie.query.get(row_id):
-        return make_response(jsonify(error="Movie not found"), 400)
-
     for key in data:
         if key not in ALLOWED_FIELDS:
             return make_response(jsonify(error=f"Invalid field '{key}'"), 400)
@@ -86,8 +168,10 @@ def update_movie():
 
     try:
         upd_record = Movie.update(row_id, **data)
-        upd_movie = {k: v for k, v in upd_record.__dict__.items() if k in MOVIE_FIELDS}
-        return make_response(jsonify(upd_movie), 200)
+        if upd_record is None:
+            return make_response(jsonify(error="Movie not found"), 400)
+        upd_movie = movie_serializer.to_dict(upd_record)
+        return json_response(upd_movie)
     except Exception as e:
         return make_response(jsonify(error="Server error: " + str(e)), 500)
 
@@ -99,11 +183,9 @@ def delete_movie():
     except (KeyError, ValueError):
         return make_response(jsonify(error="Invalid or missing 'id'"), 400)
 
-    if not Movie.query.get(row_id):
-        return make_response(jsonify(error='Movie not found'), 400)
-
     try:
-        Movie.delete(row_id)
+        if not Movie.delete(row_id):
+            return make_response(jsonify(error='Movie not found'), 400)
         return make_response(jsonify(message='Movie successfully deleted'), 200)
     except Exception:
         return make_response(jsonify(error="Could not delete movie"), 500)
@@ -137,9 +219,16 @@ def movie_add_relation():
         err = 'Movie ID error'
         return make_response(jsonify(error=err), 400)
 
-    rel_movie = {k: v for k, v in movie.__dict__.items() if k in MOVIE_FIELDS}
-    rel_movie['cast'] = str(movie.cast)
-    return make_response(jsonify(rel_movie), 200)
+    rel_movie = movie_serializer.to_dict(movie)
+    rel_movie['cast'] = actor_serializer.to_list(movie.cast)
+    return json_response(rel_movie)
+
+
+def movie_add_relations_bulk():
+    """
+    Add list of actors to movie's cast
+    """
+    return bulk_add_relations(Movie)
 
 
 def movie_clear_relations():
@@ -157,12 +246,10 @@ def movie_clear_relations():
         err = 'No id specified'
         return make_response(jsonify(error=err), 400)
 
-    try:
-        movie = Movie.clear_relations(row_id)
-    except:
-        err = 'ID error'
-        return make_response(jsonify(error=err), 400)
+    movie = Movie.clear_relations(row_id)
+    if movie is None:
+        return make_response(jsonify(error='Movie not found'), 400)
 
-    rel_movie = {k: v for k, v in movie.__dict__.items() if k in MOVIE_FIELDS}
-    rel_movie['cast'] = str(movie.cast)
-    return make_response(jsonify(rel_movie), 200)
+    rel_movie = movie_serializer.to_dict(movie)
+    rel_movie['cast'] = []
+    return json_response(rel_movie)
@@ -0,0 +1,93 @@
+import base64
+import binascii
+import json
+
+from settings.constants import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, TEXT_SORT_FIELDS
+
+
+def encode_cursor(order_by, value, row_id):
+    """
+    Build opaque cursor pointing right after the given record
+
+    order_by: name of the sort column
+    value: value of the sort column in the last record of the page
+    row_id: id of the last record of the page
+    """
+    raw = json.dumps([order_by, value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Parse cursor produced by `encode_cursor`
+
+    return: tuple (order_by, value, row_id)
+    raise: ValueError if cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        order_by, value, row_id = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(order_by, str) or not is_int(row_id):
+        raise ValueError('Invalid cursor')
+    if value is not None and not isinstance(value, str) and not is_int(value):
+        raise ValueError('Invalid cursor')
+    return order_by, value, row_id
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def get_page_params(data, sort_fields):
+    """
+    Get pagination parameters from request data
+
+    data: dict with request data (`limit`, `order_by`, `cursor`, `after_id`),
+        `order_by=-column` sorts in descending order
+    sort_fields: list of columns allowed in `order_by`
+    return: tuple (order_by, after, limit), after is None or (value, id)
+    raise: ValueError with message for the client
+    """
+    try:
+        limit = int(data.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('Limit must be integer')
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError('Limit must be between 1 and {}'.format(MAX_PAGE_SIZE))
+
+    order_by = data.get('order_by', 'id')
+    if order_by.lstrip('-') not in sort_fields:
+        raise ValueError('Can not order by {}'.format(order_by))
+
+    after = None
+    if data.get('cursor'):
+        cursor_order, value, row_id = decode_cursor(data['cursor'])
+        if cursor_order != order_by:
+            raise ValueError('Cursor does not match order_by')
+        if value is not None and isinstance(value, str) != (order_by.lstrip('-') in TEXT_SORT_FIELDS):
+            raise ValueError('Invalid cursor')
+        after = (value, row_id)
+    elif data.get('after_id'):
+        if order_by != 'id':
+            raise ValueError('after_id can only be used when ordering by id')
+        try:
+            row_id = int(data['after_id'])
+        except ValueError:
+            raise ValueError('after_id must be integer')
+        after = (row_id, row_id)
+    return order_by, after, limit
+
+
+def next_cursor(records, order_by, limit):
+    """
+    Get cursor for the page following `records`
+
+    records: page fetched with `limit + 1` rows
+    return: str or None if this is the last page
+    """
+    if len(records) <= limit:
+        return None
+    last = records[limit - 1]
+    return encode_cursor(order_by, getattr(last, order_by.lstrip('-')), last.id)
@@ -1,9 +1,53 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from flask import request
 
+# form data of the batch operation being run instead of the request, see `operation_data`
+_operation = ContextVar('operation', default=None)
+
+
+@contextmanager
+def operation_data(data):
+    """
+    Make `get_request_data` return data instead of parameters of the current request
+
+    data: dict with form data of one operation of /api/batch
+    """
+    token = _operation.set(data)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
 
 def get_request_data():
     """
     Get keys & values from request (Note that this method should parse requests with content type "application/x-www-form-urlencoded")
+
+    Query string arguments are merged in as well, form values take precedence.
+    """
+    if _operation.get() is not None:
+        return dict(_operation.get())
+    data = request.args.to_dict()
+    data.update(request.form.to_dict())
+    return data
+
+
+def check_strings(model, data, fields):
+    """
+    Check that values are strings fitting their columns, JSON bodies may have any type
+
+    model: model class
+    data: dict with record parameters
+    fields: names of string columns of model present in data
+    return: error message or None
     """
-    data = request.form.to_dict()
-    return data
\ No newline at end of file
+    for field in fields:
+        value = data[field]
+        if not isinstance(value, str):
+            return '{} must be a string'.format(field.capitalize())
+        length = model.__table__.c[field].type.length
+        if length is not None and len(value) > length:
+            return '{} must be at most {} characters'.format(field.capitalize(), length)
+    return None
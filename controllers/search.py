@@ -0,0 +1,36 @@
+from flask import jsonify, make_response
+
+from models.actor import Actor
+from models.movie import Movie
+from models.search import search_names
+from settings.constants import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from .parse_request import get_request_data
+from .serializers import json_response
+
+SEARCH_TYPES = {'actor': Actor, 'movie': Movie}
+
+
+def search():
+    """
+    Find actors and movies by name prefix or similar name
+    """
+    data = get_request_data()
+    query = data.get('q', '').strip()
+    if not query:
+        return make_response(jsonify(error='No query specified'), 400)
+
+    try:
+        limit = int(data.get('limit', DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        return make_response(jsonify(error='Limit must be integer'), 400)
+    if not 0 < limit <= MAX_SEARCH_LIMIT:
+        err = 'Limit must be between 1 and {}'.format(MAX_SEARCH_LIMIT)
+        return make_response(jsonify(error=err), 400)
+
+    types = data.get('type', ','.join(SEARCH_TYPES)).split(',')
+    if not set(types).issubset(SEARCH_TYPES):
+        return make_response(jsonify(error='Type must be actor or movie'), 400)
+
+    found = search_names(query, [SEARCH_TYPES[t] for t in types], limit)
+    results = [dict(type=kind.lower(), id=row_id, name=name, score=score) for kind, row_id, name, score in found]
+    return json_response(results)
@@ -0,0 +1,125 @@
+import json
+from functools import lru_cache
+from operator import attrgetter
+
+from flask import make_response
+from sqlalchemy import Date
+from sqlalchemy.orm import selectinload
+
+from core.metrics import add_rows
+from models.actor import Actor
+from models.movie import Movie
+from settings.constants import ACTOR_FIELDS, DATE_FORMAT, MOVIE_FIELDS
+
+try:
+    import orjson  # optional, faster encoder
+except ImportError:
+    orjson = None
+
+
+def dumps(data):
+    """
+    Encode data which contains only JSON types
+
+    return: bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+@lru_cache(maxsize=65536)
+def format_date(value):
+    """
+    Format date with DATE_FORMAT, dates repeat a lot so results are memoized
+    """
+    return value.strftime(DATE_FORMAT)
+
+
+def json_response(data, status=200):
+    """
+    Response with data encoded by `dumps`
+    """
+    return make_response(dumps(data), status, {'Content-Type': 'application/json'})
+
+
+class Serializer(object):
+    """
+    Turns records of model into dicts with fixed fields in fixed order
+
+    Built once per model from its mapped columns. Works with ORM objects and
+    with Core rows, dates are formatted with DATE_FORMAT.
+    """
+
+    def __init__(self, model, fields):
+        table = model.__table__
+        self.model = model
+        self.nested = {}
+        self.fields = tuple(fields)
+        self.columns = tuple(table.c[field] for field in self.fields)
+        self._get = attrgetter(*self.fields)
+        self._dates = tuple(i for i, column in enumerate(self.columns) if isinstance(column.type, Date))
+
+    def values(self, obj):
+        """
+        return: sequence of field values
+        """
+        values = self._get(obj)
+        if not self._dates:
+            return values
+        values = list(values)
+        for i in self._dates:
+            if values[i] is not None:
+                values[i] = format_date(values[i])
+        return values
+
+    def include(self, name, serializer):
+        """
+        Allow embedding relationship `name` serialized with serializer
+        """
+        self.nested[name] = serializer
+
+    def parse_include(self, value):
+        """
+        Get relationships requested by comma separated `include` parameter
+
+        raise: ValueError if relationship can not be included
+        """
+        names = [name for name in (value or '').split(',') if name]
+        for name in names:
+            if name not in self.nested:
+                raise ValueError('Can not include {}'.format(name))
+        return tuple(dict.fromkeys(names))
+
+    def load_options(self, include):
+        """
+        Loader options fetching included relationships with one query each
+        """
+        return [selectinload(getattr(self.model, name)) for name in include]
+
+    def to_dict(self, obj, include=()):
+        add_rows(1)
+        return self._to_dict(obj, include)
+
+    def _to_dict(self, obj, include):
+        data = dict(zip(self.fields, self.values(obj)))
+        for name in include:
+            data[name] = self.nested[name].to_list(getattr(obj, name))
+        return data
+
+    def to_list(self, objs, include=()):
+        add_rows(len(objs))
+        if include:
+            return [self._to_dict(obj, include) for obj in objs]
+        fields = self.fields
+        values = self.values
+        return [dict(zip(fields, values(obj))) for obj in objs]
+
+    def to_json(self, obj, include=()):
+        return dumps(self.to_dict(obj, include))
+
+
+actor_serializer = Serializer(Actor, ACTOR_FIELDS)
+movie_serializer = Serializer(Movie, MOVIE_FIELDS)
+actor_serializer.include('movies', movie_serializer)
+movie_serializer.include('cast', actor_serializer)
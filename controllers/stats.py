@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from flask import jsonify, make_response
+from sqlalchemy import select
+
+from core import db
+from models import stats
+from models.actor import Actor
+from settings.constants import STATS_TOP_SIZE
+from .parse_request import get_request_data
+from .serializers import json_response
+
+
+def most_prolific(limit):
+    """
+    Actors with most movies, backward scan of `filmography_size` index
+    """
+    table = Actor.__table__
+    query = (select(table.c.id, table.c.name, table.c.filmography_size)
+             .where(table.c.filmography_size > 0)
+             .order_by(table.c.filmography_size.desc(), table.c.id.desc()).limit(limit))
+    return [dict(id=row_id, name=name, movies=size) for row_id, name, size in db.session.execute(query)]
+
+
+def get_stats():
+    """
+    Catalog statistics from counters kept up to date by every write
+
+    With `check` parameter counters are recomputed from the tables and
+    differences are returned instead.
+    """
+    data = get_request_data()
+    if data.get('check', 'false').lower() not in ('false', '0', ''):
+        found = stats.diff()
+        return make_response(jsonify(consistent=not found, diff=found), 200)
+
+    counters = defaultdict(dict)
+    for (name, key), value in stats.load().items():
+        counters[name][key] = value
+    totals = {name: counters[name].get('', 0) for name in ('actors', 'movies', 'links')}
+    return json_response(dict(
+        totals,
+        movies_by_genre=counters['movies_by_genre'],
+        movies_by_year=counters['movies_by_year'],
+        actors_by_gender=counters['actors_by_gender'],
+        average_cast_size=round(totals['links'] / totals['movies'], 2) if totals['movies'] else 0,
+        most_prolific=most_prolific(STATS_TOP_SIZE),
+    ))
@@ -0,0 +1,49 @@
+from flask import Response, jsonify, make_response
+from sqlalchemy import select
+
+from core import db
+from core.metrics import add_rows
+from settings.constants import STREAM_CHUNK_SIZE
+from .serializers import dumps
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def stream_rows(serializer, fmt):
+    """
+    Stream every record of model ordered by id
+
+    Rows are read as plain tuples through a server side cursor in chunks of
+    STREAM_CHUNK_SIZE, so memory does not depend on the table size.
+
+    serializer: Serializer of model, selects columns to export
+    fmt: 'ndjson' (one object per line) or 'json' (array sent in chunks)
+    """
+    if fmt not in STREAM_FORMATS:
+        err = 'Stream format must be one of: {}'.format(', '.join(STREAM_FORMATS))
+        return make_response(jsonify(error=err), 400)
+
+    # generator runs after the app context is gone, so resolve engine now
+    engine = db.engine
+    table = serializer.columns[0].table
+    query = select(*serializer.columns).order_by(table.c.id)
+
+    def generate():
+        if fmt == 'json':
+            yield b'['
+        with engine.connect() as conn:
+            result = conn.execution_options(yield_per=STREAM_CHUNK_SIZE).execute(query)
+            for i, rows in enumerate(result.partitions()):
+                add_rows(len(rows))
+                objects = [dumps(dict(zip(serializer.fields, serializer.values(row)))) for row in rows]
+                if fmt == 'ndjson':
+                    yield b'\n'.join(objects) + b'\n'
+                else:
+                    yield (b',' if i else b'') + b','.join(objects)
+        if fmt == 'json':
+            yield b']'
+
+    return Response(generate(), status=200, mimetype=STREAM_FORMATS[fmt])
@@ -1,24 +1,67 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.engine import make_url
 
-from settings.constants import DB_URL
+from settings.constants import (CACHE_URL, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE,
+                                DB_URL, LOCAL_CACHE, SCHEMA_CHECK, SERVER_TIMING)
+from .cache import NullCache, RedisCache, entity_cache
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'expire_on_commit': False})  # no reload after every commit
 
 
-def create_app():
-    """Construct the core application."""
+def engine_options(db_url):
+    """
+    Connection pool settings, SQLite keeps the defaults of Flask-SQLAlchemy
+    """
+    if make_url(db_url).get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_pre_ping': DB_POOL_PRE_PING,  # survive database restarts and idle disconnects
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+
+
+def dispose_engines(app, close=True):
+    """
+    Drop pooled connections of the app
+
+    close: False in a forked worker, connections inherited from the parent
+        process stay open for it and the worker opens its own
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def create_app(db_url=DB_URL, schema_check=SCHEMA_CHECK):
+    """
+    Construct the core application
+
+    schema_check: what to do when database schema is older than models,
+        see `core.schema.check_schema`
+    """
     app = Flask(__name__, instance_relative_config=False)
-    app.config['SQLALCHEMY_DATABASE_URI'] = DB_URL
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False  # silence the deprecation warning
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(db_url)
+    app.config['SERVER_TIMING'] = SERVER_TIMING
 
     db.init_app(app)
 
+    if CACHE_URL:
+        import redis  # optional, only needed for the shared cache
+        entity_cache.backend = RedisCache(redis.Redis.from_url(CACHE_URL))
+    elif not LOCAL_CACHE:
+        entity_cache.backend = NullCache()
+
     with app.app_context():
-        # Imports
+        # Imports, controllers are loaded by the first request using them
         from . import routes
+        from .schema import check_schema
 
-        # Create tables for our models
-        db.create_all()
+        # One query when database is up to date, DDL only when it is not
+        check_schema(schema_check)
 
-        return app
\ No newline at end of file
+        return app
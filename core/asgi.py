@@ -0,0 +1,179 @@
+"""
+Asyncio application with the read endpoints, see `asgi.py`
+
+Serves `/api/actors`, `/api/movies`, `/api/actor` and `/api/movie` on
+SQLAlchemy's async engine with the models and serializers of the Flask app,
+so responses are the same. Writes, streaming and everything else stay on the
+WSGI app. The app is a plain ASGI callable, any ASGI server can run it.
+"""
+import asyncio
+from importlib import import_module
+from urllib.parse import parse_qsl
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from settings.constants import CACHE_URL, DB_URL, SCHEMA_CHECK, SCHEMA_VERSION
+from . import engine_options
+from .cache import RedisCache, entity_cache
+
+# database backend -> async driver used for it
+ASYNC_DRIVERS = {'sqlite': 'aiosqlite', 'postgresql': 'asyncpg'}
+
+# path -> name of handler in `controllers.async_reads`
+ROUTES = {
+    '/api/actors': 'get_all_actors',
+    '/api/movies': 'get_all_movies',
+    '/api/actor': 'get_actor_by_id',
+    '/api/movie': 'get_movie_by_id',
+}
+
+
+def async_url(db_url):
+    """
+    Database URL with the async driver of its backend
+
+    raise: ValueError if backend has no async driver
+    """
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError('No async driver for {}'.format(backend))
+    return url.set(drivername='{}+{}'.format(backend, ASYNC_DRIVERS[backend]))
+
+
+def query_data(query_string):
+    """
+    Query string parameters like `request.args.to_dict()`, first value of every key wins
+    """
+    data = {}
+    for key, value in parse_qsl(query_string.decode('latin-1'), keep_blank_values=True):
+        data.setdefault(key, value)
+    return data
+
+
+class AsyncApp(object):
+    """
+    ASGI application serving reads with async engine
+
+    Engine is created on lifespan startup, or by the first request when the
+    server does not send lifespan events. Every request gets its own
+    `AsyncSession` and returns its connection to the pool when done.
+
+    cache: EntityCache shared with the WSGI app, None to read every record
+        from the database; writes are made by the WSGI app in other processes
+        and drop entries of the shared cache only
+    """
+
+    def __init__(self, db_url=DB_URL, schema_check=SCHEMA_CHECK, cache=None):
+        self.url = async_url(db_url)
+        self.options = engine_options(db_url)
+        self.schema_check = schema_check
+        self.cache = cache
+        self.engine = None
+        self.session = None
+        self.handlers = None
+        self.error = None
+        self._lock = asyncio.Lock()
+
+    async def startup(self):
+        async with self._lock:
+            if self.engine is not None:
+                return
+            # imported here, like controllers of the Flask app on first use
+            module = import_module('controllers.async_reads')
+            self.handlers = {path: getattr(module, name) for path, name in ROUTES.items()}
+            self.error = module.error_result
+            engine = create_async_engine(self.url, **self.options)
+            await self.check_schema(engine)
+            self.engine = engine
+            self.session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def shutdown(self):
+        if self.engine is not None:
+            await self.engine.dispose()
+            self.engine = None
+
+    async def check_schema(self, engine):
+        """
+        Refuse to start on database older than models, see `core.schema.check_schema`
+
+        Reads never migrate, outdated database is migrated by the Flask app or
+        `python -m core.migrate`.
+        raise: RuntimeError if database is outdated
+        """
+        if self.schema_check == 'off':
+            return
+        from .schema import schema_version
+
+        try:
+            async with engine.connect() as conn:
+                version = await conn.scalar(select(schema_version.c.version))
+        except DBAPIError:  # no schema_version table
+            version = None
+        if version is None or version < SCHEMA_VERSION:
+            await engine.dispose()
+            raise RuntimeError('Database schema is at version {}, expected {}, run `python -m core.migrate`'.format(
+                version, SCHEMA_VERSION))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            status, body, headers = await self.handle(scope)
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers.items()] + [(b'content-length', b'%d' % len(body))],
+            })
+            await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope):
+        """
+        return: tuple (status, body, headers) of response
+        """
+        if self.engine is None:
+            await self.startup()
+        handler = self.handlers.get(scope['path'])
+        if handler is None:
+            return self.error('Not found', 404)
+        if scope['method'] not in ('GET', 'HEAD'):
+            return self.error('Only reads are served here', 405)
+        data = query_data(scope['query_string'])
+        if 'stream' in data:
+            return self.error('Streaming is not served here')
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        async with self.session() as session:
+            return await handler(session, data, headers, self.cache)
+
+
+def create_asgi_app(db_url=DB_URL, schema_check=SCHEMA_CHECK):
+    """
+    Construct the async application, see `AsyncApp`
+
+    Entity cache is used only when shared with the WSGI app through CACHE_URL,
+    a cache of this process would keep serving records changed by writes.
+    """
+    if not CACHE_URL:
+        return AsyncApp(db_url, schema_check)
+    import redis  # optional, only needed for the shared cache
+    entity_cache.backend = RedisCache(redis.Redis.from_url(CACHE_URL))
+    return AsyncApp(db_url, schema_check, entity_cache)
@@ -0,0 +1,249 @@
+import threading
+import time
+from collections import OrderedDict
+
+from settings.constants import CACHE_MAX_SIZE, CACHE_TTL
+
+# `set_if_floor` in redis: store ARGV[1] for ARGV[3] seconds unless the stored
+# value starts with a floor line above version ARGV[2]
+SET_IF_FLOOR = """
+local value = redis.call('GET', KEYS[1])
+local floor = value and tonumber(string.match(value, '^(%d+)\\n'))
+if floor and floor > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+return 1
+"""
+
+
+def value_floor(value):
+    """
+    Lowest version allowed to replace value, see `EntityCache`
+
+    value: bytes starting with the floor line, or None
+    return: int, 0 for None
+    """
+    return int(value.split(b'\n', 1)[0]) if value is not None else 0
+
+
+class LocalCache(object):
+    """
+    Bounded LRU cache with TTL living in the worker process
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= self.clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._set(key, value)
+
+    def _set(self, key, value):
+        self._data[key] = (value, self.clock() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def set_if_floor(self, key, value, version):
+        """
+        Store value unless the stored one may only be replaced by versions above version
+
+        return: True if stored
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > self.clock() and value_floor(item[0]) > version:
+                return False
+            self._set(key, value)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class NullCache(object):
+    """
+    Cache keeping nothing, every read goes to the database
+    """
+    evictions = 0
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def set_if_floor(self, key, value, version):
+        return False
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class RedisCache(object):
+    """
+    Cache shared by all workers, stored in redis
+
+    client: object with redis `get`, `set(ex=)`, `delete`, `eval` methods
+    """
+
+    def __init__(self, client, ttl=CACHE_TTL, prefix='api:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0  # evicted by redis itself, not visible here
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def set_if_floor(self, key, value, version):
+        """
+        See `LocalCache.set_if_floor`, compared and stored by one script run in redis
+        """
+        return bool(self.client.eval(SET_IF_FLOOR, 1, self.prefix + key, value, version, self.ttl))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class MemoryClient(object):
+    """
+    In-memory stand-in for redis client, for tests and local runs
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.data = {}
+        self._lock = threading.Lock()  # scripts run atomically like in redis
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, None if ex is None else self.clock() + ex)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def eval(self, script, numkeys, *args):
+        """
+        Run script, only `SET_IF_FLOOR` is known
+        """
+        if script != SET_IF_FLOOR:
+            raise NotImplementedError('Unknown script')
+        key, value, version, ttl = args
+        with self._lock:
+            if value_floor(self.get(key)) > version:
+                return 0
+            self.set(key, value, ex=ttl)
+            return 1
+
+
+class EntityCache(object):
+    """
+    Serialized entity responses with their ETag keyed by (model, id)
+
+    Every value starts with the lowest version of record that may replace it:
+    version + 1 for a cached response, the version written for a marker left
+    by `invalidate`. So a reader which loaded the record before a write
+    committed can not put the old response back after the writer dropped it.
+    Backends compare and store in one atomic step, see `set_if_floor`.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LocalCache()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, row_id):
+        return '{}:{}'.format(model, row_id)
+
+    def get(self, model, row_id):
+        """
+        return: tuple (etag, body) or None
+        """
+        value = self.backend.get(self.key(model, row_id))
+        etag, body = self.parse(value)[1:] if value is not None else (None, None)
+        if not etag:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return etag, body
+
+    @staticmethod
+    def parse(value):
+        """
+        return: tuple (lowest version allowed to replace value, etag, body), etag is empty for markers
+        """
+        floor, etag, body = value.split(b'\n', 2)
+        return int(floor), etag.decode(), body
+
+    def set(self, model, row_id, body, etag, version):
+        """
+        Cache response of record at version, unless a newer version is cached or was invalidated
+        """
+        self.backend.set_if_floor(self.key(model, row_id), b'%d\n%s\n%s' % (version + 1, etag.encode(), body),
+                                  version)
+
+    def invalidate(self, model, row_id, version=None):
+        """
+        Drop cached response of record
+
+        version: version of record after the write, older responses will not be
+            cached again; None to only drop the entry
+        """
+        key = self.key(model, row_id)
+        if version is None:
+            self.backend.delete(key)
+        else:
+            self.backend.set_if_floor(key, b'%d\n\n' % version, version)
+
+    def stats(self):
+        return {
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+        }
+
+
+entity_cache = EntityCache()
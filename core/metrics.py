@@ -0,0 +1,300 @@
+"""
+Request metrics in Prometheus text format, see `/metrics`
+
+Every request gets `RequestStats` kept in a context variable: SQL statements
+and their time are added by engine events, serialized rows by `Serializer`.
+When the response is done they go to the histograms and counters of this
+worker process. With several workers every one also writes its series to a
+file in METRICS_DIR and `/metrics` sums up the files of all of them.
+"""
+import os
+import pickle
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from settings.constants import METRICS_DIR, METRICS_FLUSH_INTERVAL, METRICS_LATENCY_BUCKETS, METRICS_QUERY_BUCKETS
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats(object):
+    """
+    What one request did so far
+    """
+    __slots__ = ('start', 'queries', 'db_time', 'rows', 'bytes', 'query_start')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.query_start = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """
+        Value of `Server-Timing` header, durations in ms
+        """
+        return 'db;dur={:.2f};desc="{} queries", app;dur={:.2f}'.format(
+            self.db_time * 1000, self.queries, self.elapsed() * 1000)
+
+
+def start_request():
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def current_request():
+    """
+    return: RequestStats or None outside of instrumented request
+    """
+    return _current.get()
+
+
+def end_request():
+    _current.set(None)
+
+
+def add_rows(count):
+    stats = _current.get()
+    if stats is not None:
+        stats.rows += count
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None:
+        stats.query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is not None and stats.query_start is not None:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - stats.query_start
+        stats.query_start = None
+
+
+def format_labels(names, values):
+    return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                    for name, value in zip(names, values))
+
+
+class Counter(object):
+    """
+    Prometheus counter, one series per tuple of label values
+    """
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}
+
+    def inc(self, values, amount=1):
+        self.series[values] = self.series.get(values, 0) + amount
+
+    @staticmethod
+    def merge(total, series):
+        for values, value in series.items():
+            total[values] = total.get(values, 0) + value
+
+    def render(self, series=None):
+        """
+        series: series to render instead of the ones of this process
+        """
+        series = self.series if series is None else series
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} counter'.format(self.name)]
+        for values, value in sorted(series.items()):
+            lines.append('{}{{{}}} {}'.format(self.name, format_labels(self.labels, values), value))
+        return lines
+
+
+class Histogram(object):
+    """
+    Prometheus histogram with fixed buckets, one series per tuple of label values
+
+    Bucket counts are kept per bucket and summed up only when rendered.
+    """
+
+    def __init__(self, name, help, labels, buckets):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.series = {}
+
+    def observe(self, values, amount):
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [[0] * (len(self.buckets) + 1), 0]
+        series[0][bisect_left(self.buckets, amount)] += 1
+        series[1] += amount
+
+    @staticmethod
+    def merge(total, series):
+        for values, (counts, amount) in series.items():
+            if values not in total:
+                total[values] = [[0] * len(counts), 0]
+            merged = total[values]
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += amount
+
+    def render(self, series=None):
+        """
+        series: series to render instead of the ones of this process
+        """
+        series = self.series if series is None else series
+        lines = ['# HELP {} {}'.format(self.name, self.help), '# TYPE {} histogram'.format(self.name)]
+        for values, (counts, total) in sorted(series.items()):
+            labels = format_labels(self.labels, values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(self.name, labels, bound, cumulative))
+            lines.append('{}_sum{{{}}} {}'.format(self.name, labels, total))
+            lines.append('{}_count{{{}}} {}'.format(self.name, labels, cumulative))
+        return lines
+
+
+class Metrics(object):
+    """
+    Metrics of requests served by this worker process
+
+    directory: where worker processes write their series to be summed up by
+        `render`, None to render the series of this process only. Files of
+        stopped workers are kept, so totals never go down.
+    """
+
+    def __init__(self, directory=METRICS_DIR):
+        self.directory = directory
+        self.path = None  # file of this process in directory
+        self.flushed = 0.0
+        self._timer = None  # writes series recorded since the last write
+        labels = ('route', 'method')
+        self.requests = Counter('api_requests_total', 'Requests served.', labels + ('status',))
+        self.duration = Histogram('api_request_duration_seconds', 'Time to serve request.', labels,
+                                  METRICS_LATENCY_BUCKETS)
+        self.queries = Histogram('api_db_queries', 'SQL statements executed by request.', labels,
+                                 METRICS_QUERY_BUCKETS)
+        self.db_time = Histogram('api_db_duration_seconds', 'Time spent in SQL statements by request.', labels,
+                                 METRICS_LATENCY_BUCKETS)
+        self.rows = Counter('api_rows_serialized_total', 'Records serialized into responses.', labels)
+        self.bytes = Counter('api_response_bytes_total', 'Bytes of response bodies.', labels)
+        self._lock = threading.Lock()
+
+    def all(self):
+        return self.requests, self.duration, self.queries, self.db_time, self.rows, self.bytes
+
+    def reset(self):
+        """
+        Start from zero in a forked worker, what the parent counted is in its own file
+        """
+        self._lock = threading.Lock()
+        self.path = None
+        self.flushed = 0.0
+        self._timer = None
+        for metric in self.all():
+            metric.series = {}
+
+    def flush(self):
+        """
+        Write series of this process to its file in directory
+        """
+        if self.directory is None:
+            return
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self.path is None:
+            self.path = os.path.join(self.directory, '{}-{}.pickle'.format(os.getpid(), uuid.uuid4().hex))
+        # replaced at once, readers never see a half written file
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            pickle.dump([metric.series for metric in self.all()], f)
+        os.replace(temporary, self.path)
+        self.flushed = time.monotonic()
+        self._timer = None
+
+    def record(self, route, method, status, stats):
+        labels = (route, method)
+        elapsed = stats.elapsed()
+        with self._lock:
+            self.requests.inc(labels + (str(status),))
+            self.duration.observe(labels, elapsed)
+            self.queries.observe(labels, stats.queries)
+            self.db_time.observe(labels, stats.db_time)
+            self.rows.inc(labels, stats.rows)
+            self.bytes.inc(labels, stats.bytes)
+            if self.directory is None:
+                return
+            if time.monotonic() - self.flushed >= METRICS_FLUSH_INTERVAL:
+                self._flush()
+            elif self._timer is None:
+                # written a bit later, also when no request comes to this worker meanwhile
+                self._timer = threading.Timer(METRICS_FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def render(self):
+        """
+        Series of this process, or of all worker processes when there is a directory
+
+        return: bytes in Prometheus text format
+        """
+        lines = []
+        with self._lock:
+            if self.directory is None:
+                for metric in self.all():
+                    lines += metric.render()
+                return ('\n'.join(lines) + '\n').encode()
+            self._flush()
+        totals = [{} for _ in self.all()]
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.pickle'):
+                # files of our own workers in a directory made for them
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    for metric, total, series in zip(self.all(), totals, pickle.load(f)):
+                        metric.merge(total, series)
+        for metric, total in zip(self.all(), totals):
+            lines += metric.render(total)
+        return ('\n'.join(lines) + '\n').encode()
+
+
+metrics = Metrics()
+os.register_at_fork(after_in_child=metrics.reset)
+
+
+def observe_stream(chunks, stats, route, method, status):
+    """
+    Pass streamed body through, recording request when it is sent
+
+    Queries and rows of the stream are made while it is sent, after the
+    request itself is over, so stats are made current again for every chunk.
+    """
+    try:
+        _current.set(stats)
+        for chunk in chunks:
+            stats.bytes += len(chunk)
+            yield chunk
+            _current.set(stats)
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+        _current.set(None)
+        metrics.record(route, method, status, stats)
@@ -0,0 +1,22 @@
+"""
+Bring database schema up to date
+
+    python -m core.migrate
+
+Run it on deploy before starting the servers, then start them with
+SCHEMA_CHECK=strict so they only check the schema version stamp.
+"""
+from settings.constants import SCHEMA_VERSION
+from . import create_app
+from .schema import migrate
+
+
+def main():
+    app = create_app(schema_check='off')
+    with app.app_context():
+        migrate()
+    print('Database schema is at version {}'.format(SCHEMA_VERSION))
+
+
+if __name__ == '__main__':
+    main()
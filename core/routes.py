@@ -1,61 +1,138 @@
-from flask import Flask, request
+from flask import Flask, jsonify, make_response, request
 from flask import current_app as app
 
-from controllers.actor import *
-from controllers.movie import *
+from importlib import import_module
 
+from core.cache import entity_cache
+from settings.constants import BATCH_ENDPOINTS, BULK_INSERT_BATCH, MAX_BATCH_SIZE, MAX_BULK_SIZE
+from core.metrics import CONTENT_TYPE, current_request, end_request, metrics, observe_stream, start_request
 
-@app.route('/api/actors', methods=['GET'])
-def actors():
+
+def lazy(module, name):
+    """
+    Controller function imported on its first call, so app startup does not
+    import controllers and models
     """
- Get all actors in db
-	"""
-    return get_all_actors()
+    def call(*args, **kwargs):
+        return getattr(import_module(module), name)(*args, **kwargs)
+    call.__name__ = name
+    return call
+
 
+# endpoint -> {method: max SQL statements one request runs, 'repeats': max runs of one statement}
+QUERY_BUDGETS = {}
 
-@app.route('/api/movies', methods=['GET'])
-def movies():
+
+def query_budget(repeats=1, **budgets):
     """
- Get all movies in db
-	"""
-    return get_all_movies()
+    Declare how many SQL statements the view may run for every method, e.g.
+    `@query_budget(GET=1, POST=2)`. Checked by the test client of the test
+    suite, nothing is enforced while serving.
 
+    repeats: max times one statement may run in a request, more means a query in a loop (N+1)
+    """
+    def decorate(view):
+        QUERY_BUDGETS[view.__name__] = dict(budgets, repeats=repeats)
+        return view
+    return decorate
 
-@app.route('/api/actor', methods=['GET', 'POST', 'PUT', 'DELETE'])
-def actor():
-    if request.method == 'GET':
-        return get_actor_by_id()
-    elif request.method == 'POST':
-        return add_actor()
-    elif request.method == 'PUT':
-        return update_actor()
-    elif request.method == 'DELETE':
-        return delete_actor()
 
+# bulk endpoints run INSERT and the lookup of existing names once per batch
+BULK_BATCHES = -(-MAX_BULK_SIZE // BULK_INSERT_BATCH)
 
-@app.route('/api/movie', methods=['GET', 'POST', 'PUT', 'DELETE'])
-def movie():
-    if request.method == 'GET':
-        return get_movie_by_id()
-    elif request.method == 'POST':
-        return add_movie()
-    elif request.method == 'PUT':
-        return update_movie()
-    elif request.method == 'DELETE':
-        return delete_movie()
+# controller module -> endpoints (rule, method, controller function, max SQL statements, max runs of
+# one statement), see `query_budget`; a function is the endpoint of its rule and method
+CONTROLLERS = {
+    'controllers.actor': [
+        ('/api/actors', 'GET', 'get_all_actors', 2, 1),
+        ('/api/actors/bulk', 'POST', 'add_actors_bulk', 1 + 2 * BULK_BATCHES, BULK_BATCHES),
+        ('/api/actor', 'GET', 'get_actor_by_id', 2, 1),
+        ('/api/actor', 'POST', 'add_actor', 2, 1),
+        ('/api/actor', 'PUT', 'update_actor', 3, 1),
+        ('/api/actor', 'DELETE', 'delete_actor', 4, 1),
+        ('/api/actor-relations', 'PUT', 'actor_add_relation', 7, 1),
+        ('/api/actor-relations', 'DELETE', 'actor_clear_relations', 4, 1),
+        ('/api/actor-relations/bulk', 'PUT', 'actor_add_relations_bulk', 6, 1),
+    ],
+    'controllers.movie': [
+        ('/api/movies', 'GET', 'get_all_movies', 2, 1),
+        ('/api/movies/bulk', 'POST', 'add_movies_bulk', 1 + 2 * BULK_BATCHES, BULK_BATCHES),
+        ('/api/movie', 'GET', 'get_movie_by_id', 2, 1),
+        ('/api/movie', 'POST', 'add_movie', 2, 1),
+        ('/api/movie', 'PUT', 'update_movie', 3, 1),
+        ('/api/movie', 'DELETE', 'delete_movie', 4, 1),
+        ('/api/movie-relations', 'PUT', 'movie_add_relation', 7, 1),
+        ('/api/movie-relations', 'DELETE', 'movie_clear_relations', 4, 1),
+        ('/api/movie-relations/bulk', 'PUT', 'movie_add_relations_bulk', 6, 1),
+    ],
+    'controllers.search': [
+        ('/api/search', 'GET', 'search', 2, 1),
+    ],
+    'controllers.stats': [
+        ('/api/stats', 'GET', 'get_stats', 7, 1),
+    ],
+    'controllers.graph': [
+        ('/api/actor/path', 'GET', 'actor_path', 4, 1),
+        ('/api/actor/costars', 'GET', 'actor_costars', 2, 1),
+        ('/api/actor/similar', 'GET', 'actor_similar', 3, 1),
+        ('/api/movie/similar', 'GET', 'movie_similar', 3, 1),
+    ],
+}
+# every operation of a batch stays within the budget of its own endpoint
+BATCH_QUERIES = max(queries for endpoints in CONTROLLERS.values()
+                    for rule, method, name, queries, repeats in endpoints if name in BATCH_ENDPOINTS)
+CONTROLLERS['controllers.batch'] = [
+    ('/api/batch', 'POST', 'run_batch', MAX_BATCH_SIZE * BATCH_QUERIES, MAX_BATCH_SIZE),
+]
 
+for module, endpoints in CONTROLLERS.items():
+    for rule, method, name, queries, repeats in endpoints:
+        view = query_budget(repeats, **{method: queries})(lazy(module, name))
+        app.add_url_rule(rule, view_func=view, methods=[method])
 
-@app.route('/api/actor-relations', methods=['PUT', 'DELETE'])
-def actor_relation():
-    if request.method == 'PUT':
-        return actor_add_relation()
-    elif request.method == 'DELETE':
-        return actor_clear_relations()
 
+@app.before_request
+def start_metrics():
+    start_request()
 
-@app.route('/api/movie-relations', methods=['PUT', 'DELETE'])
-def movie_relation():
-    if request.method == 'PUT':
-        return movie_add_relation()
-    elif request.method == 'DELETE':
-        return movie_clear_relations()
\ No newline at end of file
+
+@app.after_request
+def record_metrics(response):
+    """
+    Record latency, SQL statements, rows and bytes of request for `/metrics`
+
+    Streamed responses are recorded when the whole body is sent.
+    """
+    stats = current_request()
+    if stats is None:
+        return response
+    # routes are labeled by rule, not by path, to keep the number of series fixed
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = stats.server_timing()
+    # error pages come as iterators too, but with known length
+    if response.is_streamed and response.content_length is None:
+        response.response = observe_stream(response.response, stats, route, request.method, response.status_code)
+    else:
+        stats.bytes = response.content_length or 0
+        metrics.record(route, request.method, response.status_code, stats)
+    end_request()
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+@query_budget(GET=0)
+def metrics_route():
+    """
+    Request metrics of this worker in Prometheus text format
+    """
+    return make_response(metrics.render(), 200, {'Content-Type': CONTENT_TYPE})
+
+
+@app.route('/api/cache-stats', methods=['GET'])
+@query_budget(GET=0)
+def cache_stats():
+    """
+    Hit, miss and eviction counters of the entity cache in this worker
+    """
+    return jsonify(entity_cache.stats())
@@ -0,0 +1,135 @@
+"""
+Schema version check done on startup and migration of the database, see `core.migrate`
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import Column, Integer, Table, delete, func, inspect, insert, select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateColumn
+
+from settings.constants import SCHEMA_VERSION
+from . import db
+
+# Table name -> 'schema_version', one row with version of models the database was migrated to
+schema_version = Table('schema_version', db.metadata, Column('version', Integer, primary_key=True))
+# key of the PostgreSQL advisory lock held while migrating
+MIGRATION_LOCK = 7_406_190
+
+
+def load_models():
+    """
+    Import all models so their tables are in `db.metadata`
+    """
+    from models import actor, movie, stats  # noqa: F401
+
+
+def get_schema_version():
+    """
+    Read version stamp of the database with one query
+
+    return: int or None if database was never migrated
+    """
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(select(schema_version.c.version)).scalar()
+    except DBAPIError:  # no schema_version table
+        return None
+
+
+def ensure_indexes():
+    """
+    Create indexes missing in existing tables, `create_all` adds them only with new tables
+    """
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def ensure_columns():
+    """
+    Add columns missing in existing tables, `create_all` adds them only with new tables
+
+    New columns must be nullable or have server default.
+    return: list of added columns
+    """
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                    conn.exec_driver_sql('ALTER TABLE {} ADD COLUMN {}'.format(table.name, ddl))
+                    added.append(column)
+    return added
+
+
+@contextmanager
+def migration_lock():
+    """
+    Let one process at a time migrate the database, the others wait (PostgreSQL only)
+    """
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+    with db.engine.connect() as conn:
+        conn.execute(select(func.pg_advisory_lock(MIGRATION_LOCK)))
+        conn.commit()
+        try:
+            yield
+        finally:
+            conn.execute(select(func.pg_advisory_unlock(MIGRATION_LOCK)))
+            conn.commit()
+
+
+def migrate():
+    """
+    Create missing tables, columns and indexes, fill derived data and stamp the
+    database with SCHEMA_VERSION. Safe to run on up to date database and from
+    several processes at once.
+    """
+    with migration_lock():
+        _migrate()
+
+
+def _migrate():
+    load_models()
+    from models.base import backfill_sizes
+    from models.stats import ensure_stats
+
+    db.create_all()
+    added = ensure_columns()
+    ensure_indexes()
+
+    # Counters of records created before the columns existed
+    if any(column.name.endswith('_size') for column in added):
+        backfill_sizes()
+    # Counters for /api/stats
+    ensure_stats()
+
+    with db.engine.begin() as conn:
+        version = conn.execute(select(schema_version.c.version)).scalar()
+        if version is None or version < SCHEMA_VERSION:
+            conn.execute(delete(schema_version))
+            conn.execute(insert(schema_version).values(version=SCHEMA_VERSION))
+
+
+def check_schema(mode):
+    """
+    Make sure database schema is not older than models
+
+    mode: 'migrate' to migrate outdated database, 'strict' to refuse to start, 'off' to skip the check
+    raise: RuntimeError if database is outdated in strict mode
+    """
+    if mode == 'off':
+        return
+    version = get_schema_version()
+    # newer version is fine, migrations only add to the schema
+    if version is not None and version >= SCHEMA_VERSION:
+        return
+    if mode == 'strict':
+        raise RuntimeError('Database schema is at version {}, expected {}, run `python -m core.migrate`'.format(
+            version, SCHEMA_VERSION))
+    migrate()
+
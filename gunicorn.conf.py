@@ -0,0 +1,53 @@
+"""
+Production server settings, every one can be changed with environment variable
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# threads of every worker, keep DB_POOL_SIZE + DB_MAX_OVERFLOW not lower
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+# on SIGTERM workers stop accepting and get this long to finish requests in flight
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# restart workers after that many requests, 0 to never
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('WEB_ACCESS_LOG')  # '-' for stdout
+
+# workers of every instance only check the schema stamp, migrate with
+# `python -m core.migrate` on deploy; read by settings when the app is loaded
+os.environ.setdefault('SCHEMA_CHECK', 'strict')
+# writes of one worker do not drop cached entries of the others, share the
+# entity cache through CACHE_URL or do not cache
+if workers > 1 and not os.environ.get('CACHE_URL'):
+    os.environ['LOCAL_CACHE'] = 'false'
+# /metrics sums up series written by all workers, not only the one answering the scrape
+if workers > 1:
+    os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='api-metrics-'))
+
+# app is created once in the master, startup DDL checks run once and workers
+# share its memory; database connections are made after fork, see post_fork
+preload_app = True
+
+
+def post_fork(server, worker):
+    from core import dispose_engines
+    from wsgi import app
+
+    dispose_engines(app, close=False)
+
+
+def worker_exit(server, worker):
+    from core import dispose_engines
+    from core.metrics import metrics
+    from wsgi import app
+
+    metrics.flush()
+    dispose_engines(app)
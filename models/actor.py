@@ -6,10 +6,19 @@ from models.base import Model
 from core import db
 from sqlalchemy import String, Date
 from models.relations import association
+from models.search import trigram_index
 from sqlalchemy.orm import Mapped, mapped_column
 
 class Actor(Model, db.Model):
     __tablename__ = 'actors'
+    __table_args__ = (
+        # `?gender=` and `?born_after=&born_before=` filters
+        db.Index('ix_actors_gender_date_of_birth', 'gender', 'date_of_birth'),
+        # `?order_by=-filmography_size`, busiest actors first
+        db.Index('ix_actors_filmography_size_id', 'filmography_size', 'id'),
+        # name search on PostgreSQL
+        trigram_index('ix_actors_name_trgm'),
+    )
 
     # id -> integer, primary key
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -19,6 +28,10 @@ class Actor(Model, db.Model):
     gender: Mapped[str] = mapped_column(String(11), nullable=False)
     # date_of_birth -> date
     date_of_birth: Mapped[dt.date] = mapped_column(Date, nullable=False)
+    # version -> integer, increased on every update, used for ETag
+    version: Mapped[int] = mapped_column(default=1, server_default='1')
+    # filmography_size -> integer, number of movies, changed together with relations
+    filmography_size: Mapped[int] = mapped_column(default=0, server_default='0')
 
     # Use `db.relationship` method to define the Actor's relationship with Movie.
     # Set `backref` as 'cast', uselist=True
@@ -1,13 +1,207 @@
+from contextlib import contextmanager
+from functools import partial
+
+from sqlalchemy import delete, event, func, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
 from core import db
+from core.cache import entity_cache
+from models.graph import costar_graph
+from models.relations import association
+from models.search import name_index
+from models.stats import GROUPS, link_deltas, merge, record_deltas, stats
+from settings.constants import BULK_INSERT_BATCH
+
+# model related to every model and its column counting related records
+RELATED = {'Actor': 'Movie', 'Movie': 'Actor'}
+SIZE_COLUMNS = {'Actor': 'filmography_size', 'Movie': 'cast_size'}
+# Order in which every write locks rows, so concurrent writes can not wait on
+# each other in a cycle: association links, then actors and movies by
+# ascending id, then stats rows ordered by key with one upsert right before
+# commit (see `flush_stats`). Stats rows are shared by all writers, taking them
+# last also keeps them locked only for the commit.
+LOCK_ORDER = ['Actor', 'Movie']
+
+# dialect specific INSERT supporting ON CONFLICT
+INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
 
 
-def commit(obj):
+def insert(table):
     """
-    Function for convenient commit
+    INSERT statement of the current database dialect
     """
-    db.session.add(obj)
+    return INSERTS[db.engine.dialect.name](table)
+
+
+def relation_columns(cls):
+    """
+    Get association columns pointing to cls and to the related model
+
+    return: tuple (own column, related column)
+    """
+    if cls.__name__ == 'Actor':
+        return association.c.actor_id, association.c.movie_id
+    elif cls.__name__ == 'Movie':
+        return association.c.movie_id, association.c.actor_id
+
+
+def update_stats(deltas):
+    """
+    Collect counter changes of the current transaction, see `flush_stats`
+
+    deltas: list of tuples (name, key, delta)
+    """
+    db.session.info.setdefault('stats_deltas', []).extend(deltas)
+
+
+def flush_stats():
+    """
+    Apply collected counter changes with one upsert, the last statement before commit
+    """
+    merged = merge(db.session.info.pop('stats_deltas', []))
+    if not merged:
+        return
+    stmt = insert(stats).values([dict(name=name, key=key, value=delta) for (name, key), delta in merged.items()])
+    stmt = stmt.on_conflict_do_update(index_elements=['name', 'key'],
+                                      set_={'value': stats.c.value + stmt.excluded.value})
+    db.session.execute(stmt)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def drop_stats(session):
+    """
+    Forget counter changes of rolled back transaction
+    """
+    session.info.pop('stats_deltas', None)
+
+
+def model_class(name):
+    return {model.__name__: model for model in Model.__subclasses__()}[name]
+
+
+def update_sizes(cls, row_id, rel_ids, sign, own=True):
+    """
+    Change cast / filmography sizes after linking (sign=1) or unlinking (sign=-1)
+    record with rel_ids, in the current transaction
+
+    Versions are increased as sizes are part of responses. ORM UPDATE keeps
+    objects already loaded in session in sync without reading them again.
+
+    own: False if record itself is being deleted
+    return: dict (model name, id) -> new version, for `invalidate`
+    """
+    versions = {}
+    if not rel_ids:
+        return versions
+    changes = [(model_class(RELATED[cls.__name__]), sorted(rel_ids), sign)]
+    if own:
+        changes.append((cls, [row_id], sign * len(rel_ids)))
+    for model, ids, delta in sorted(changes, key=lambda change: LOCK_ORDER.index(change[0].__name__)):
+        size = getattr(model, SIZE_COLUMNS[model.__name__])
+        stmt = update(model).where(model.id.in_(ids)).values({size: size + delta, model.version: model.version + 1})
+        for changed_id, version in db.session.execute(stmt.returning(model.id, model.version)):
+            versions[model.__name__, changed_id] = version
+    return versions
+
+
+def expire_loaded(cls, row_id, rel_ids):
+    """
+    Expire record and related records loaded in session, after their links
+    were deleted with Core statements their collections are out of date
+    """
+    for model, ids in ((cls, [row_id]), (model_class(RELATED[cls.__name__]), rel_ids)):
+        for key_id in ids:
+            obj = db.session.identity_map.get(db.session.identity_key(model, key_id))
+            if obj is not None:
+                db.session.expire(obj)
+
+
+def invalidate(cls, row_id, rel_ids=(), versions=None):
+    """
+    Drop cached responses of record and of related records
+
+    versions: dict (model name, id) -> version after the write, see `EntityCache.invalidate`
+    """
+    versions = versions or {}
+    entity_cache.invalidate(cls.__name__, row_id, versions.get((cls.__name__, row_id)))
+    for rel_id in rel_ids:
+        name = RELATED[cls.__name__]
+        entity_cache.invalidate(name, rel_id, versions.get((name, rel_id)))
+
+
+def backfill_sizes():
+    """
+    Count cast / filmography sizes of all records from association, for data
+    created before the counters existed
+    """
+    for model in Model.__subclasses__():
+        table = model.__table__
+        own, _ = relation_columns(model)
+        count = select(func.count()).where(own == table.c.id).scalar_subquery()
+        db.session.execute(update(table).values({SIZE_COLUMNS[model.__name__]: count}))
     db.session.commit()
-    db.session.refresh(obj)
+    entity_cache.backend.clear()
+
+
+def finish(*hooks):
+    """
+    Commit current transaction, then run hooks updating caches and in-memory
+    indexes, so they never see changes that were rolled back
+
+    Within `transaction` changes are only flushed and hooks wait for its commit.
+
+    hooks: functions without arguments
+    """
+    pending = db.session.info.get('pending_hooks')
+    if pending is not None:
+        db.session.flush()
+        pending.extend(hooks)
+        return
+    db.session.flush()
+    flush_stats()
+    db.session.commit()
+    for hook in hooks:
+        hook()
+
+
+@contextmanager
+def transaction():
+    """
+    Run many `Model` changes in one database transaction with one commit at
+    the end, everything is rolled back if the block raises
+
+    Nested use joins the outer transaction.
+    """
+    if 'pending_hooks' in db.session.info:
+        yield
+        return
+    hooks = db.session.info['pending_hooks'] = []
+    try:
+        yield
+        db.session.flush()
+        flush_stats()
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        raise
+    finally:
+        del db.session.info['pending_hooks']
+    for hook in hooks:
+        hook()
+
+
+def commit(obj, *hooks):
+    """
+    Function for convenient commit, see `finish`
+
+    Session does not expire objects on commit, so obj keeps its loaded state
+    and no refresh is needed.
+    """
+    db.session.add(obj)
+    finish(*hooks)
     return obj
 
 
@@ -15,46 +209,164 @@ class Model(object):
     @classmethod
     def create(cls, **kwargs):
         """
-        Create new record
+        Create new record or get existing one with the same name
+
+        Runs as INSERT ... ON CONFLICT (name) DO NOTHING RETURNING, the existing
+        row is selected only when nothing was inserted. If it was deleted in
+        between, the INSERT is run again.
 
         cls: class
         kwargs: dict with object parameters
+        return: row with all columns of the record
+        """
+        table = cls.__table__
+        stmt = insert(table).values(**kwargs).on_conflict_do_nothing(index_elements=['name'])
+        while True:
+            row = db.session.execute(stmt.returning(*table.c)).one_or_none()
+            if row is not None:
+                break
+            finish()
+            existing = db.session.execute(select(*table.c).where(table.c.name == kwargs.get('name'))).one_or_none()
+            if existing is not None:
+                return existing
+        update_stats(record_deltas(cls.__name__, row, 1))
+        finish(partial(name_index.add, cls.__name__, row.id, row.name))
+        return row
+
+    @classmethod
+    def bulk_create(cls, rows):
+        """
+        Create many records in one transaction, records with existing names are skipped
+
+        cls: class
+        rows: list of dicts with object parameters, all with the same keys
+        return: tuple of dicts name -> id (created, existing)
+        """
+        table = cls.__table__
+        created = {}
+        for start in range(0, len(rows), BULK_INSERT_BATCH):
+            stmt = insert(table).values(rows[start:start + BULK_INSERT_BATCH])
+            stmt = stmt.on_conflict_do_nothing(index_elements=['name'])
+            stmt = stmt.returning(table.c.name, table.c.id)
+            created.update(db.session.execute(stmt).all())
+
+        skipped = [row['name'] for row in rows if row['name'] not in created]
+        existing = {}
+        for start in range(0, len(skipped), BULK_INSERT_BATCH):
+            names = skipped[start:start + BULK_INSERT_BATCH]
+            query = select(table.c.name, table.c.id).where(table.c.name.in_(names))
+            existing.update(db.session.execute(query).all())
+        update_stats([delta for row in rows if row['name'] in created
+                      for delta in record_deltas(cls.__name__, row, 1)])
+        finish(*[partial(name_index.add, cls.__name__, row_id, name) for name, row_id in created.items()])
+        return created, existing
+
+    @classmethod
+    def page(cls, order_by='id', after=None, limit=100, options=(), filters=()):
+        """
+        Get records ordered by column using keyset pagination
+
+        cls: class
+        order_by: name of the column to sort by, ties are broken by id,
+            `-name` for descending order
+        after: tuple (value, id) of the last record of the previous page
+        limit: max number of records
+        options: loader options, e.g. to fetch relationships
+        filters: SQL expressions records should match
+        """
+        return db.session.scalars(cls.page_query(order_by, after, limit, options, filters)).all()
+
+    @classmethod
+    def page_query(cls, order_by='id', after=None, limit=100, options=(), filters=()):
+        """
+        Statement selecting records of `page`, shared with the async app
+
+        cls: class
+        return: Select
+        """
+        descending = order_by.startswith('-')
+        column = cls.__table__.c[order_by.lstrip('-')]
+        query = select(cls).options(*options).where(*filters)
+        if after is not None:
+            value, last_id = after
+            key, last = (column, value) if column.primary_key or column.unique else \
+                (tuple_(column, cls.id), tuple_(value, last_id))
+            query = query.where(key < last if descending else key > last)
+        if descending:
+            return query.order_by(column.desc(), cls.id.desc()).limit(limit)
+        return query.order_by(column, cls.id).limit(limit)
+
+    @classmethod
+    def get_version(cls, row_id):
+        """
+        Get version of record without loading it
+
+        cls: class
+        row_id: record id
+        return: int or None if record does not exist
         """
-        existing = db.session.query(cls).filter_by(**kwargs).first()
-        if existing:
-            return existing
-        obj = cls(**kwargs)
-        return commit(obj)
+        table = cls.__table__
+        return db.session.scalar(select(table.c.version).where(table.c.id == row_id))
 
     @classmethod
     def update(cls, row_id, **kwargs):
         """
-        Update record by id
+        Update record by id with single UPDATE ... RETURNING
 
         cls: class
         row_id: record id
         kwargs: dict with object parameters
+        return: row with all columns of the record, None if it does not exist
         """
-        obj = db.session.query(cls).filter_by(id=row_id).first()
-        for key, value in kwargs.items():
-            setattr(obj, key, value)
-        return commit(obj)
+        table = cls.__table__
+        if not kwargs:
+            return db.session.execute(select(*table.c).where(table.c.id == row_id)).one_or_none()
+        old = None
+        grouped = GROUPS[cls.__name__].values()
+        if any(column in kwargs for column in grouped):
+            # counted values before the change, for stats; locked so a concurrent update can not change them first
+            query = select(*[table.c[column] for column in grouped]).where(table.c.id == row_id).with_for_update()
+            old = db.session.execute(query).one_or_none()
+            if old is None:
+                return None
+        stmt = update(table).where(table.c.id == row_id).values(version=table.c.version + 1, **kwargs)
+        row = db.session.execute(stmt.returning(*table.c)).one_or_none()
+        if row is not None and old is not None:
+            update_stats(record_deltas(cls.__name__, old, -1) + record_deltas(cls.__name__, row, 1))
+        hooks = [partial(entity_cache.invalidate, cls.__name__, row_id, row.version if row is not None else None)]
+        if row is not None and 'name' in kwargs:
+            hooks.append(partial(name_index.add, cls.__name__, row_id, row.name))
+        finish(*hooks)
+        return row
 
     @classmethod
     def delete(cls, row_id):
         """
-        Delete record by id
+        Delete record by id together with its relations
 
         cls: class
         row_id: record id
         return: int (1 if deleted else 0)
         """
-        obj = db.session.query(cls).filter_by(id=row_id).first()
-        if not obj:
-            return 0
-        db.session.delete(obj)
-        db.session.commit()
-        return 1
+        table = cls.__table__
+        own, related = relation_columns(cls)
+        rel_ids = db.session.scalars(delete(association).where(own == row_id).returning(related)).all()
+        stmt = delete(table).where(table.c.id == row_id).returning(*table.c)
+        # rows locked in LOCK_ORDER: a deleted actor before movie sizes, actor sizes before a deleted movie
+        if cls.__name__ == LOCK_ORDER[0]:
+            deleted = db.session.execute(stmt).first()
+            versions = update_sizes(cls, row_id, rel_ids, -1, own=False)
+        else:
+            versions = update_sizes(cls, row_id, rel_ids, -1, own=False)
+            deleted = db.session.execute(stmt).first()
+        if deleted:
+            update_stats(record_deltas(cls.__name__, deleted, -1) + link_deltas(-len(rel_ids)))
+            # nothing read before the delete may be cached again
+            versions[cls.__name__, row_id] = deleted.version + 1
+        expire_loaded(cls, row_id, rel_ids)
+        finish(partial(invalidate, cls, row_id, rel_ids, versions), partial(name_index.remove, cls.__name__, row_id),
+               partial(costar_graph.clear, cls.__name__, row_id))
+        return 1 if deleted else 0
 
     @classmethod
     def add_relation(cls, row_id, rel_obj):
@@ -70,7 +382,41 @@ class Model(object):
             obj.filmography.append(rel_obj)
         elif cls.__name__ == 'Movie':
             obj.cast.append(rel_obj)
-        return commit(obj)
+        versions = update_sizes(cls, row_id, [rel_obj.id], 1)
+        update_stats(link_deltas(1))
+        commit(obj, partial(invalidate, cls, row_id, [rel_obj.id], versions),
+               partial(costar_graph.add, cls.__name__, row_id, [rel_obj.id]))
+        return obj
+
+    @classmethod
+    def add_relations(cls, row_id, rel_ids):
+        """
+        Add many relations to object with one INSERT, existing links are kept
+
+        cls: class
+        row_id: record id
+        rel_ids: list of related record ids
+        return: tuple of lists of related ids (added, existing, missing), None if record does not exist
+        """
+        own, related = relation_columns(cls)
+        if db.session.get(cls, row_id) is None:
+            return None
+        rel_table = next(iter(related.foreign_keys)).column.table
+        found = set(db.session.scalars(select(rel_table.c.id).where(rel_table.c.id.in_(rel_ids))))
+
+        added = set()
+        links = [{own.name: row_id, related.name: rel_id} for rel_id in rel_ids if rel_id in found]
+        if links:
+            stmt = insert(association).values(links).on_conflict_do_nothing()
+            added = set(db.session.scalars(stmt.returning(related)))
+        versions = update_sizes(cls, row_id, sorted(added), 1)
+        update_stats(link_deltas(len(added)))
+        finish(partial(invalidate, cls, row_id, added, versions),
+               partial(costar_graph.add, cls.__name__, row_id, sorted(added)))
+
+        existing = found - added
+        missing = [rel_id for rel_id in rel_ids if rel_id not in found]
+        return sorted(added), sorted(existing), missing
 
     @classmethod
     def remove_relation(cls, row_id, rel_obj):
@@ -88,21 +434,42 @@ class Model(object):
             obj.movies.remove(rel_obj)
         elif cls.__name__ == 'Movie':
             obj.cast.remove(rel_obj)
-        return commit(obj)
+        versions = update_sizes(cls, row_id, [rel_obj.id], -1)
+        update_stats(link_deltas(-1))
+        commit(obj, partial(invalidate, cls, row_id, [rel_obj.id], versions),
+               partial(costar_graph.remove, cls.__name__, row_id, rel_obj.id))
+        return obj
 
     @classmethod
     def clear_relations(cls, row_id):
         """
-        Remove all relations by id
+        Remove all relations by id with one DELETE, related records are not loaded
+
+        The UPDATE of record's own size is the existence check.
 
         cls: class
         row_id: record id
+        return: row with all columns of the record, None if it does not exist
         """
-        obj = db.session.query(cls).filter_by(id=row_id).first()
-        if not obj:
+        table = cls.__table__
+        own, related = relation_columns(cls)
+        rel_ids = db.session.scalars(delete(association).where(own == row_id).returning(related)).all()
+        size = table.c[SIZE_COLUMNS[cls.__name__]]
+        version = table.c.version + 1 if rel_ids else table.c.version
+        stmt = update(table).where(table.c.id == row_id).values({size: size - len(rel_ids), table.c.version: version})
+        # rows locked in LOCK_ORDER, like in `delete`
+        if cls.__name__ == LOCK_ORDER[0]:
+            row = db.session.execute(stmt.returning(*table.c)).one_or_none()
+            versions = update_sizes(cls, row_id, rel_ids, -1, own=False)
+        else:
+            versions = update_sizes(cls, row_id, rel_ids, -1, own=False)
+            row = db.session.execute(stmt.returning(*table.c)).one_or_none()
+        if row is None:
+            finish()
             return None
-        if cls.__name__ == 'Actor':
-            obj.movies.clear()
-        elif cls.__name__ == 'Movie':
-            obj.cast.clear()
-        return commit(obj)
\ No newline at end of file
+        update_stats(link_deltas(-len(rel_ids)))
+        expire_loaded(cls, row_id, rel_ids)
+        if rel_ids:
+            versions[cls.__name__, row_id] = row.version
+        finish(partial(invalidate, cls, row_id, rel_ids, versions), partial(costar_graph.clear, cls.__name__, row_id))
+        return row
\ No newline at end of file
@@ -0,0 +1,379 @@
+import threading
+import time
+from itertools import chain
+
+import numpy as np
+from sqlalchemy import select
+
+from core import db
+from models.relations import association
+from models.stats import link_version
+from settings.constants import GRAPH_BUILD_CHUNK, GRAPH_OVERLAY_LIMIT, INDEX_TTL
+
+EMPTY = np.zeros(0, dtype=np.int32)
+
+
+class Adjacency(object):
+    """
+    One direction of the actor-movie graph in CSR form
+
+    Neighbors of node `i` are `idx[ptr[i]:ptr[i + 1]]`. Nodes changed after the
+    arrays were built keep their whole neighbor list in `overlay` and are
+    marked in `dirty`, so lookups never have to merge base and changes.
+    """
+
+    def __init__(self, ptr, idx):
+        self.ptr = ptr
+        self.idx = idx
+        self.size = len(ptr) - 1
+        self.dirty = np.zeros(self.size, dtype=bool)
+        self.overlay = {}
+
+    @classmethod
+    def from_links(cls, src, dst, size):
+        """
+        src, dst: int32 arrays, link i goes from src[i] to dst[i]
+        size: number of source nodes, ids are in range(size)
+        """
+        ptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=size), out=ptr[1:])
+        return cls(ptr, dst[np.argsort(src, kind='stable')].astype(np.int32))
+
+    def neighbors(self, node):
+        if node in self.overlay:
+            return self.overlay[node]
+        if node >= self.size:
+            return EMPTY
+        return self.idx[self.ptr[node]:self.ptr[node + 1]]
+
+    def set(self, node, neighbors):
+        self.overlay[node] = neighbors.astype(np.int32)
+        if node < self.size:
+            self.dirty[node] = True
+
+    def expand(self, nodes):
+        """
+        All links going from nodes
+
+        nodes: int array of node ids
+        return: tuple of int32 arrays (src, dst)
+        """
+        clean = np.zeros(len(nodes), dtype=bool)
+        inside = nodes < self.size
+        clean[inside] = ~self.dirty[nodes[inside]]
+
+        src = nodes[clean]
+        starts = self.ptr[src]
+        counts = self.ptr[src + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        srcs, dsts = [np.repeat(src, counts).astype(np.int32)], [self.idx[offsets]]
+
+        for node in nodes[~clean].tolist():
+            neighbors = self.neighbors(node)
+            srcs.append(np.full(len(neighbors), node, dtype=np.int32))
+            dsts.append(neighbors)
+        return np.concatenate(srcs), np.concatenate(dsts)
+
+    def degrees(self, nodes):
+        """
+        Number of neighbors of every node of nodes
+        """
+        degrees = np.zeros(len(nodes), dtype=np.int64)
+        clean = np.zeros(len(nodes), dtype=bool)
+        inside = nodes < self.size
+        clean[inside] = ~self.dirty[nodes[inside]]
+        degrees[clean] = self.ptr[nodes[clean] + 1] - self.ptr[nodes[clean]]
+        for i in np.flatnonzero(~clean).tolist():
+            degrees[i] = len(self.overlay.get(int(nodes[i]), EMPTY))
+        return degrees
+
+    def links(self):
+        """
+        All current links
+
+        return: tuple of int32 arrays (src, dst)
+        """
+        src = np.repeat(np.arange(self.size, dtype=np.int32), np.diff(self.ptr))
+        keep = ~self.dirty[src]
+        srcs, dsts = [src[keep]], [self.idx[keep]]
+        for node, neighbors in self.overlay.items():
+            srcs.append(np.full(len(neighbors), node, dtype=np.int32))
+            dsts.append(neighbors)
+        return np.concatenate(srcs), np.concatenate(dsts)
+
+
+class CoStarGraph(object):
+    """
+    In-memory actor-movie graph for degrees of separation queries
+
+    Both directions of `association` are kept as `Adjacency`: actor -> movies
+    and movie -> cast. Co-stars of actors are found by going to their movies
+    and back, a whole BFS level at a time with numpy. Like `NameIndex` it is
+    built from the table on first query, then follows relation writes made
+    through `Model`. Every `ttl` seconds the counter of link writes is checked
+    and the graph is rebuilt if it moved, to see writes made by other processes.
+    """
+
+    def __init__(self, ttl=INDEX_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.expires = 0
+        self.ready = False
+        self.pending = None  # changes (method, args) made while the table is read
+        self.filmography = None
+        self.cast = None
+        self.actors = 0  # upper bound of actor ids
+        self.version = None  # `link_version` the table was read at
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def build(self):
+        """
+        Build graph from the table on first query, when it expired and links changed since
+
+        Queries keep using the old graph while it is rebuilt. Relation writes
+        committed while the table is read are buffered and replayed on the
+        new graph, so none of them is lost. Rows are read in chunks of
+        GRAPH_BUILD_CHUNK straight into int32 arrays.
+        """
+        if self.ready and self.clock() < self.expires:
+            return
+        if not self._build_lock.acquire(blocking=not self.ready):
+            return
+        try:
+            if self.ready and self.clock() < self.expires:
+                return  # built by another thread meanwhile
+            expires = self.clock() + self.ttl
+            if self.ready:
+                with db.engine.connect() as connection:
+                    if link_version(connection) == self.version:
+                        self.expires = expires
+                        return
+            with self._lock:
+                self.pending = []
+            try:
+                # own transaction, so the snapshot is taken after buffering started; the
+                # version is read first, a link written in between only causes one more rebuild
+                with db.engine.connect() as connection:
+                    version = link_version(connection)
+                    query = select(association.c.actor_id, association.c.movie_id)
+                    result = connection.execution_options(yield_per=GRAPH_BUILD_CHUNK).execute(query)
+                    chunks = [np.fromiter(chain.from_iterable(rows), dtype=np.int32, count=2 * len(rows))
+                              for rows in result.partitions()]
+                links = np.concatenate(chunks or [EMPTY]).reshape(-1, 2)
+                fresh = CoStarGraph()
+                fresh._load(links[:, 0], links[:, 1])
+            except Exception:
+                with self._lock:
+                    self.pending = None
+                raise
+            with self._lock:
+                self.filmography, self.cast, self.actors = fresh.filmography, fresh.cast, fresh.actors
+                for method, args in self.pending:
+                    method(*args)
+                self.pending = None
+                self.ready = True
+                self.expires, self.version = expires, version
+        finally:
+            self._build_lock.release()
+
+    def load(self, actor_ids, movie_ids):
+        """
+        Build graph from arrays of links instead of the table, it is not rebuilt
+        """
+        with self._lock:
+            self._load(np.asarray(actor_ids, dtype=np.int32), np.asarray(movie_ids, dtype=np.int32))
+            self.ready = True
+            self.expires = float('inf')
+
+    def _load(self, actor_ids, movie_ids):
+        self.actors = int(actor_ids.max()) + 1 if len(actor_ids) else 0
+        movies = int(movie_ids.max()) + 1 if len(movie_ids) else 0
+        self.filmography = Adjacency.from_links(actor_ids, movie_ids, self.actors)
+        self.cast = Adjacency.from_links(movie_ids, actor_ids, movies)
+
+    def _sides(self, kind):
+        """
+        return: tuple (adjacency of kind, adjacency of related kind)
+        """
+        if kind == 'Actor':
+            return self.filmography, self.cast
+        elif kind == 'Movie':
+            return self.cast, self.filmography
+
+    def _compact(self):
+        if len(self.filmography.overlay) + len(self.cast.overlay) > GRAPH_OVERLAY_LIMIT:
+            self._load(*self.filmography.links())
+
+    def _change(self, method, *args):
+        """
+        Apply relation write to the graph, no-op until it is built
+
+        While the table is read for a new graph the write is kept to be replayed on it too.
+        """
+        with self._lock:
+            if self.ready:
+                method(*args)
+            if self.pending is not None:
+                self.pending.append((method, args))
+
+    def add(self, kind, row_id, rel_ids):
+        """
+        Add links of record to related records
+
+        kind: model name, 'Actor' or 'Movie'
+        """
+        if len(rel_ids):
+            self._change(self._add, kind, row_id, rel_ids)
+
+    def remove(self, kind, row_id, rel_id):
+        self._change(self._remove, kind, row_id, rel_id)
+
+    def clear(self, kind, row_id):
+        self._change(self._clear, kind, row_id)
+
+    def _add(self, kind, row_id, rel_ids):
+        own, other = self._sides(kind)
+        own.set(row_id, np.union1d(own.neighbors(row_id), rel_ids))
+        for rel_id in rel_ids:
+            other.set(rel_id, np.union1d(other.neighbors(rel_id), [row_id]))
+        self.actors = max(self.actors, (row_id if kind == 'Actor' else max(rel_ids)) + 1)
+        self._compact()
+
+    def _remove(self, kind, row_id, rel_id):
+        own, other = self._sides(kind)
+        own.set(row_id, np.setdiff1d(own.neighbors(row_id), [rel_id]))
+        other.set(rel_id, np.setdiff1d(other.neighbors(rel_id), [row_id]))
+        self._compact()
+
+    def _clear(self, kind, row_id):
+        own, other = self._sides(kind)
+        for rel_id in own.neighbors(row_id).tolist():
+            other.set(rel_id, np.setdiff1d(other.neighbors(rel_id), [row_id]))
+        own.set(row_id, EMPTY)
+        self._compact()
+
+    def _costars(self, actors):
+        """
+        Co-stars of actors
+
+        return: tuple of int32 arrays (actor, movie, co-star), one row per link
+        """
+        actor, movie = self.filmography.expand(actors)
+        movies, first = np.unique(movie, return_index=True)
+        movie, costar = self.cast.expand(movies)
+        actor = actor[first][np.searchsorted(movies, movie)]
+        return actor, movie, costar
+
+    def shortest_path(self, source, target):
+        with self._lock:
+            return self._shortest_path(source, target)
+
+    def neighborhood(self, source, hops):
+        with self._lock:
+            return self._neighborhood(source, hops)
+
+    def similar(self, kind, row_id, limit, metric='jaccard'):
+        with self._lock:
+            return self._similar(kind, row_id, limit, metric)
+
+    def _shortest_path(self, source, target):
+        """
+        Shortest chain of co-starring between two actors, bidirectional BFS
+
+        return: list of tuples (kind, id) from source to target alternating
+            actors and movies, empty if actors are not connected
+        """
+        if source == target:
+            return [('Actor', source)]
+        size = max(self.actors, source + 1, target + 1)
+        sides = []
+        for start in (source, target):
+            dist = np.full(size, -1, dtype=np.int32)
+            parent = np.full(size, -1, dtype=np.int32)
+            via = np.full(size, -1, dtype=np.int32)
+            dist[start] = 0
+            sides.append([np.array([start], dtype=np.int32), dist, parent, via])
+
+        while len(sides[0][0]) and len(sides[1][0]):
+            side, other = sorted(sides, key=lambda s: len(s[0]))
+            frontier, dist, parent, via = side
+            actor, movie, costar = self._costars(frontier)
+            new = dist[costar] < 0
+            costar, first = np.unique(costar[new], return_index=True)
+            dist[costar] = dist[frontier[0]] + 1
+            parent[costar] = actor[new][first]
+            via[costar] = movie[new][first]
+            side[0] = costar
+
+            met = costar[other[1][costar] >= 0]
+            if len(met):
+                meet = int(met[np.argmin(other[1][met])])
+                head = self._walk(meet, *sides[0][2:])
+                tail = self._walk(meet, *sides[1][2:])
+                return head[::-1] + tail[1:]
+        return []
+
+    @staticmethod
+    def _walk(actor, parent, via):
+        path = [('Actor', actor)]
+        while parent[actor] >= 0:
+            path += [('Movie', int(via[actor])), ('Actor', int(parent[actor]))]
+            actor = int(parent[actor])
+        return path
+
+    def _neighborhood(self, source, hops):
+        """
+        Actors within `hops` co-starring steps of source
+
+        return: tuple of int32 arrays (actor ids, distances) ordered by distance, id
+        """
+        seen = np.zeros(max(self.actors, source + 1), dtype=bool)
+        seen[source] = True
+        frontier = np.array([source], dtype=np.int32)
+        found, distances = [], []
+        for hop in range(1, hops + 1):
+            _, _, costar = self._costars(frontier)
+            frontier = np.unique(costar[~seen[costar]])
+            if not len(frontier):
+                break
+            seen[frontier] = True
+            found.append(frontier)
+            distances.append(np.full(len(frontier), hop, dtype=np.int32))
+        if not found:
+            return EMPTY, EMPTY
+        return np.concatenate(found), np.concatenate(distances)
+
+    def _similar(self, kind, row_id, limit, metric):
+        """
+        Records of kind sharing most related records with record row_id
+
+        Rows of the incidence matrix are compared with the one of row_id, only
+        rows having a common column are touched: the record's related records
+        are expanded back into kind and shared counts taken with bincount.
+
+        metric: 'jaccard' or 'cosine'
+        return: tuple of arrays (ids, scores, shared counts) best first
+        """
+        own, other = self._sides(kind)
+        related = own.neighbors(row_id)
+        _, candidates = other.expand(related)
+        candidates, shared = np.unique(candidates, return_counts=True)
+        others = candidates != row_id
+        candidates, shared = candidates[others], shared[others]
+        degrees = own.degrees(candidates)
+        if metric == 'cosine':
+            scores = shared / np.sqrt(len(related) * degrees)
+        else:
+            scores = shared / (len(related) + degrees - shared)
+        if len(candidates) > limit:
+            # best `limit` without sorting all, ties at the cut go to lower ids
+            cut = -np.partition(-scores, limit - 1)[limit - 1]
+            above = np.flatnonzero(scores > cut)
+            top = np.concatenate([above, np.flatnonzero(scores == cut)[:limit - len(above)]])
+            candidates, scores, shared = candidates[top], scores[top], shared[top]
+        order = np.lexsort((candidates, -scores))
+        return candidates[order], scores[order], shared[order]
+
+
+costar_graph = CoStarGraph()
@@ -4,12 +4,23 @@ from models.base import Model
 
 from core import db
 from models.relations import association
+from models.search import trigram_index
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy import String
 
 
 class Movie(Model, db.Model):
     __tablename__ = 'movies'
+    __table_args__ = (
+        # keyset pagination over (year, id) for `?order_by=year`
+        db.Index('ix_movies_year_id', 'year', 'id'),
+        # `?year=`, `?year_from=&year_to=` and `?genre=` filters
+        db.Index('ix_movies_year_genre', 'year', 'genre'),
+        # `?order_by=-cast_size`, biggest casts first
+        db.Index('ix_movies_cast_size_id', 'cast_size', 'id'),
+        # name search on PostgreSQL
+        trigram_index('ix_movies_name_trgm'),
+    )
 
     # id -> integer, primary key
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -19,6 +30,10 @@ class Movie(Model, db.Model):
     year: Mapped[int] = mapped_column()
     # genre -> string, size 20
     genre: Mapped[str] = mapped_column(String(20))
+    # version -> integer, increased on every update, used for ETag
+    version: Mapped[int] = mapped_column(default=1, server_default='1')
+    # cast_size -> integer, number of actors, changed together with relations
+    cast_size: Mapped[int] = mapped_column(default=0, server_default='0')
 
     # Use `db.relationship` method to define the Movie's relationship with Actor.
     # Set `backref` as 'filmography', uselist=True
@@ -1,5 +1,5 @@
 from core import db
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Integer, ForeignKey, Index
 
 # Table name -> 'association'
 # Columns: 'actor_id' -> db.Integer, db.ForeignKey -> 'actors.id', primary_key = True
@@ -8,6 +8,8 @@ association = Table(
     'association',
     db.metadata,
     Column('actor_id', Integer, ForeignKey('actors.id'), primary_key=True),
-    Column('movie_id', Integer, ForeignKey('movies.id'), primary_key=True)
-
+    Column('movie_id', Integer, ForeignKey('movies.id'), primary_key=True),
+    # primary key serves lookups by actor_id, this one serves movie -> cast
+    # lookups and deletes by movie_id, actor_id makes it covering
+    Index('ix_association_movie_id_actor_id', 'movie_id', 'actor_id')
 )
\ No newline at end of file
@@ -0,0 +1,197 @@
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import DDL, case, event, func, literal, or_, select, union_all
+
+from core import db
+from settings.constants import INDEX_TTL
+
+# minimal trigram similarity of a match, same as pg_trgm default
+SIMILARITY_THRESHOLD = 0.3
+
+
+def trigrams(text):
+    """
+    Trigrams of every word padded like pg_trgm does, so word prefixes match too
+    """
+    grams = set()
+    for word in text.lower().split():
+        padded = '  ' + word + ' '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def is_prefix(query, name):
+    """
+    Check if query starts the name or one of its words
+    """
+    name = name.lower()
+    return name.startswith(query) or (' ' + query) in name
+
+
+class NameIndex(object):
+    """
+    In-process trigram index over names of records for prefix and fuzzy search
+
+    Used when database has no trigram support (SQLite, local runs). Names of a
+    model are loaded from its table on first search in it and then kept up to
+    date by writes through `Model`. Writes made by other processes are seen
+    after the names are reloaded, `ttl` seconds after the last load.
+    """
+
+    def __init__(self, ttl=INDEX_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.expires = 0
+        self.models = {}  # model name -> model class of loaded names
+        self.loading = set()  # names of models being loaded
+        self.pending = []  # changes (kind, id, name) made while they are loaded
+        self.names = {}
+        self.grams = {}
+        self.postings = defaultdict(set)
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def build(self, models):
+        """
+        Load names of models not in the index yet, reload all names when they expired
+
+        Names being reloaded are still searched. Writes committed while the
+        tables are read are buffered by `add` and `remove` and replayed after
+        it, so none of them is lost.
+        """
+        loaded = all(model.__name__ in self.models for model in models)
+        if loaded and self.clock() < self.expires:
+            return
+        if not self._build_lock.acquire(blocking=not loaded):
+            return
+        try:
+            if all(model.__name__ in self.models for model in models) and self.clock() < self.expires:
+                return  # loaded by another thread meanwhile
+            with self._lock:
+                models = dict(self.models, **{model.__name__: model for model in models})
+                self.loading = set(models)
+            expires = self.clock() + self.ttl
+            try:
+                # own transaction, so the snapshot is taken after buffering started
+                fresh = NameIndex()
+                with db.engine.connect() as connection:
+                    for kind, model in models.items():
+                        table = model.__table__
+                        for row_id, name in connection.execute(select(table.c.id, table.c.name)):
+                            fresh._add(kind, row_id, name)
+            except Exception:
+                with self._lock:
+                    self.loading, self.pending = set(), []
+                raise
+            with self._lock:
+                for kind, row_id, name in self.pending:
+                    fresh._add(kind, row_id, name)
+                self.names, self.grams, self.postings = fresh.names, fresh.grams, fresh.postings
+                self.models, self.expires = models, expires
+                self.loading, self.pending = set(), []
+        finally:
+            self._build_lock.release()
+
+    def _add(self, kind, row_id, name):
+        key = (kind, row_id)
+        self._remove(key)
+        if not name:
+            return
+        grams = trigrams(name)
+        self.names[key] = name
+        self.grams[key] = len(grams)
+        for gram in grams:
+            self.postings[gram].add(key)
+
+    def _remove(self, key):
+        name = self.names.pop(key, None)
+        if name is None:
+            return
+        self.grams.pop(key)
+        for gram in trigrams(name):
+            self.postings[gram].discard(key)
+
+    def add(self, kind, row_id, name):
+        """
+        Add or rename record, no-op until names of kind are loaded
+
+        name: None to remove record
+        """
+        with self._lock:
+            if kind in self.models:
+                self._add(kind, row_id, name)
+            if kind in self.loading:
+                self.pending.append((kind, row_id, name))
+
+    def remove(self, kind, row_id):
+        self.add(kind, row_id, None)
+
+    def search(self, query, kinds, limit):
+        """
+        Find records by name prefix or similarity
+
+        return: list of tuples (kind, id, name, score), prefix matches first
+        """
+        query = query.lower().strip()
+        grams = trigrams(query)
+        shared = defaultdict(int)
+        with self._lock:
+            for gram in grams:
+                for key in self.postings.get(gram, ()):
+                    if key[0] in kinds:
+                        shared[key] += 1
+            found = []
+            for key, count in shared.items():
+                name = self.names[key]
+                score = count / (len(grams) + self.grams[key] - count)
+                prefix = is_prefix(query, name)
+                if prefix or score >= SIMILARITY_THRESHOLD:
+                    found.append((not prefix, -score, name, key))
+        found.sort()
+        return [(key[0], key[1], name, round(-score, 3)) for _, score, name, key in found[:limit]]
+
+
+name_index = NameIndex()
+
+# pg_trgm provides `%` operator and `similarity()` used by `search_names`
+create_trigram_extension = DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql')
+event.listen(db.metadata, 'before_create', create_trigram_extension)
+
+
+def trigram_index(name):
+    """
+    GIN trigram index on name column, created on PostgreSQL only
+    """
+    index = db.Index(name, 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    return index.ddl_if(dialect='postgresql')
+
+
+def search_names(query, models, limit):
+    """
+    Find records by name prefix or similarity
+
+    models: model classes to search in
+    return: list of tuples (kind, id, name, score), prefix matches first
+    """
+    if db.engine.dialect.name != 'postgresql':
+        name_index.build(models)
+        return name_index.search(query, {model.__name__ for model in models}, limit)
+
+    query = query.strip()
+    pattern = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    selects = []
+    for model in models:
+        name = model.__table__.c.name
+        prefix = or_(name.ilike(pattern), name.ilike('% ' + pattern))
+        selects.append(
+            select(literal(model.__name__).label('kind'), model.__table__.c.id, name,
+                   func.similarity(name, query).label('score'),
+                   case((prefix, 0), else_=1).label('rank'))
+            .where(or_(name.op('%')(query), prefix))
+        )
+    found = union_all(*selects).subquery()
+    stmt = select(found.c.kind, found.c.id, found.c.name, found.c.score).order_by(
+        found.c.rank, found.c.score.desc(), found.c.name).limit(limit)
+    return [(kind, row_id, name, round(score, 3)) for kind, row_id, name, score in db.session.execute(stmt)]
@@ -0,0 +1,150 @@
+from collections import defaultdict
+
+from sqlalchemy import Column, Integer, String, Table, delete, func, insert, literal, select
+
+from core import db
+from models.relations import association
+
+# Table name -> 'stats', one counter per row
+# Columns: 'name' -> counter group, e.g. 'movies_by_genre'
+#          'key' -> value counted inside the group, '' for totals
+#          'value' -> current count
+stats = Table(
+    'stats',
+    db.metadata,
+    Column('name', String(30), primary_key=True),
+    Column('key', String(50), primary_key=True),
+    Column('value', Integer, nullable=False),
+)
+
+# groups counted for records of every model: group name -> column
+GROUPS = {
+    'Actor': {'actors_by_gender': 'gender'},
+    'Movie': {'movies_by_genre': 'genre', 'movies_by_year': 'year'},
+}
+TOTALS = {'Actor': 'actors', 'Movie': 'movies'}
+# links added and removed so far, only grows; not a statistic, `CoStarGraph` reads it
+# to skip rebuilds when the table did not change
+LINK_CHANGES = 'link_changes'
+
+
+def stat_key(value):
+    return '' if value is None else str(value)
+
+
+def record_deltas(kind, record, sign):
+    """
+    Counter changes caused by adding (sign=1) or removing (sign=-1) record
+
+    record: row or dict with record columns
+    return: list of tuples (name, key, delta)
+    """
+    get = record.get if isinstance(record, dict) else record._mapping.get
+    deltas = [(TOTALS[kind], '', sign)]
+    for name, column in GROUPS[kind].items():
+        deltas.append((name, stat_key(get(column)), sign))
+    return deltas
+
+
+def link_deltas(count):
+    """
+    Counter changes caused by adding (count > 0) or removing (count < 0) links
+    """
+    return [('links', '', count), (LINK_CHANGES, '', abs(count))]
+
+
+def link_version(connection):
+    """
+    Current value of `LINK_CHANGES` counter
+    """
+    query = select(stats.c.value).where(stats.c.name == LINK_CHANGES, stats.c.key == '')
+    return connection.scalar(query) or 0
+
+
+def merge(deltas):
+    """
+    Sum deltas of the same counter, dropping the ones which cancel out
+
+    Counters are ordered, the upsert locks stats rows in the same order in
+    every transaction, see `models.base.LOCK_ORDER`.
+
+    return: dict (name, key) -> delta
+    """
+    merged = defaultdict(int)
+    for name, key, delta in deltas:
+        merged[name, key] += delta
+    return {counter: merged[counter] for counter in sorted(merged) if merged[counter]}
+
+
+def compute():
+    """
+    Count everything from scratch with GROUP BY over the tables
+
+    return: dict (name, key) -> value
+    """
+    from models.actor import Actor
+    from models.movie import Movie
+
+    values = {}
+    queries = [('links', select(literal(''), func.count()).select_from(association))]
+    for model in (Actor, Movie):
+        table = model.__table__
+        kind = model.__name__
+        queries.append((TOTALS[kind], select(literal(''), func.count()).select_from(table)))
+        for name, column in GROUPS[kind].items():
+            queries.append((name, select(table.c[column], func.count()).group_by(table.c[column])))
+    for name, query in queries:
+        for key, value in db.session.execute(query):
+            if value:
+                values[name, stat_key(key)] = value
+    return values
+
+
+def load():
+    """
+    return: dict (name, key) -> value of maintained counters
+    """
+    rows = db.session.execute(select(stats.c.name, stats.c.key, stats.c.value).where(stats.c.value != 0))
+    return {(name, key): value for name, key, value in rows}
+
+
+def diff():
+    """
+    Compare maintained counters with recomputed ones
+
+    return: dict name -> key -> {'maintained': int, 'actual': int} for counters that differ
+    """
+    maintained, actual = load(), compute()
+    found = defaultdict(dict)
+    for counter in set(maintained) | set(actual):
+        if counter[0] == LINK_CHANGES:
+            continue
+        if maintained.get(counter, 0) != actual.get(counter, 0):
+            name, key = counter
+            found[name][key] = {'maintained': maintained.get(counter, 0), 'actual': actual.get(counter, 0)}
+    return dict(found)
+
+
+def rebuild():
+    """
+    Replace maintained counters with recomputed ones, `LINK_CHANGES` is kept
+    """
+    values = compute()
+    db.session.execute(delete(stats).where(stats.c.name != LINK_CHANGES))
+    if values:
+        db.session.execute(insert(stats), [dict(name=name, key=key, value=value)
+                                           for (name, key), value in values.items()])
+    db.session.commit()
+
+
+def ensure_stats():
+    """
+    Fill counters of existing data when stats table is new
+    """
+    if db.session.scalar(select(func.count()).select_from(stats)) == 0:
+        rebuild()
+    else:
+        # groups which are not counted here any more
+        names = set(TOTALS.values()) | {name for groups in GROUPS.values() for name in groups} | {'links', LINK_CHANGES}
+        db.session.execute(delete(stats).where(stats.c.name.not_in(names)))
+        db.session.commit()
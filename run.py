@@ -3,4 +3,6 @@ from core import create_app
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=8000)
\ No newline at end of file
+    # development server with reloader and debugger, for local use only;
+    # production runs `gunicorn -c gunicorn.conf.py wsgi:app`
+    app.run(debug=True, host='0.0.0.0', port=8000)
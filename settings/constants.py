@@ -2,8 +2,70 @@ import os
 # db connection URL (In order to submit your project do NOT change this value!!!)
 DB_URL = os.environ['DB_URL']
 # entities properties
-ACTOR_FIELDS = ['id', 'name', 'gender', 'date_of_birth']
-MOVIE_FIELDS = ['id', 'name', 'year', 'genre']
+ACTOR_FIELDS = ['id', 'name', 'gender', 'date_of_birth', 'filmography_size']
+MOVIE_FIELDS = ['id', 'name', 'year', 'genre', 'cast_size']
 
 # date of birth format
 DATE_FORMAT = '%d.%m.%Y'
+
+# list endpoints pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# columns the list endpoints can be ordered by (ties are broken by id), `-column` for descending order
+ACTOR_SORT_FIELDS = ['id', 'name', 'filmography_size']
+MOVIE_SORT_FIELDS = ['id', 'name', 'year', 'cast_size']
+# sort columns holding text, the others hold integers; cursor values must match
+TEXT_SORT_FIELDS = ['name']
+# rows fetched from the server side cursor at once in streaming mode
+STREAM_CHUNK_SIZE = 1000
+# max records accepted by the bulk create endpoints
+MAX_BULK_SIZE = 10000
+# records inserted by one multi-row INSERT statement
+BULK_INSERT_BATCH = 200
+# max operations of /api/batch and endpoints (controller functions) they may call, GET is not allowed
+MAX_BATCH_SIZE = 100
+BATCH_ENDPOINTS = ['add_actor', 'update_actor', 'delete_actor', 'actor_add_relation', 'actor_clear_relations',
+                   'add_movie', 'update_movie', 'delete_movie', 'movie_add_relation', 'movie_clear_relations']
+# entity read cache: max entries and time to live in seconds of the in-process cache,
+# redis url to share the cache between workers instead
+CACHE_MAX_SIZE = 10000
+CACHE_TTL = 60
+CACHE_URL = os.environ.get('CACHE_URL')
+# in-process entity cache when CACHE_URL is not set, turned off by gunicorn.conf.py with
+# several workers: a worker would keep serving records changed through the others
+LOCAL_CACHE = os.environ.get('LOCAL_CACHE', 'true').lower() in ('1', 'true', 'yes')
+# seconds before the in-process name index (no pg_trgm) and co-star graph are reloaded
+# from the database, so writes made by other workers show up
+INDEX_TTL = int(os.environ.get('INDEX_TTL', 60))
+# name search results
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# co-star graph: changed nodes kept aside before the arrays are rebuilt, links read from
+# the table at once while building, max hops of neighborhood
+GRAPH_OVERLAY_LIMIT = 10000
+GRAPH_BUILD_CHUNK = 10000
+GRAPH_MAX_HOPS = 3
+# similar actors / movies
+DEFAULT_SIMILAR_LIMIT = 10
+MAX_SIMILAR_LIMIT = 100
+SIMILARITY_METRICS = ['jaccard', 'cosine']
+# most prolific actors in /api/stats
+STATS_TOP_SIZE = 10
+# connection pool of every worker process, not used with SQLite
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+# bucket bounds of request and SQL time histograms in seconds and of SQL statements per request in /metrics
+METRICS_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# directory where every worker process writes its metrics for `/metrics` to sum them up, set by
+# gunicorn.conf.py with several workers; seconds between writes of one worker
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1
+# add `Server-Timing` header with SQL and total time to every response
+SERVER_TIMING = os.environ.get('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+# version of models, increase with every change of tables, columns or indexes
+SCHEMA_VERSION = 1
+# on startup with database older than SCHEMA_VERSION: 'migrate' it, 'strict' to refuse to start, 'off' to not check
+SCHEMA_CHECK = os.environ.get('SCHEMA_CHECK', 'migrate')
@@ -1,13 +1,28 @@
 import pytest
-import requests
 
-ACTOR_LIST_ROUTE = 'http://127.0.0.1:8000/api/actors'
-ACTOR_ID_ROUTE = 'http://127.0.0.1:8000/api/actor'
+ACTOR_LIST_ROUTE = '/api/actors'
+ACTOR_ID_ROUTE = '/api/actor'
+ACTOR_BULK_ROUTE = '/api/actors/bulk'
 
 
 @pytest.mark.parametrize(('body', 'expected_response'), [(dict([]), 200)])
-def test_get_all_actors(body, expected_response):
-    response = requests.get(ACTOR_LIST_ROUTE, data=body)
+def test_get_all_actors(client, body, expected_response):
+    response = client.get(ACTOR_LIST_ROUTE, data=body)
+    assert response.status_code == expected_response
+
+
+@pytest.mark.parametrize(
+    ('params', 'expected_response'),
+    [
+        (dict(limit=2), 200),
+        (dict(limit=2, order_by='name'), 200),
+        (dict(limit=10**6), 400), # limit should not exceed MAX_PAGE_SIZE
+        (dict(order_by='date_of_birth'), 400), # only indexed columns can be used for ordering
+        (dict(after_id='one'), 400) # after_id should be integer
+    ]
+)
+def test_get_actors_page(client, params, expected_response):
+    response = client.get(ACTOR_LIST_ROUTE, query_string=params)
     assert response.status_code == expected_response
 
 
@@ -21,8 +36,48 @@ def test_get_all_actors(body, expected_response):
         (dict(name='Tom Holland', gender='male', date_of_birth='06/02/1996'), 400) # date of birth should be in format DATE_FORMAT
     ]
 )
-def test_add_actor(body, expected_response):
-    response = requests.post(ACTOR_ID_ROUTE, data=body)
+def test_add_actor(client, body, expected_response):
+    response = client.post(ACTOR_ID_ROUTE, data=body)
+    assert response.status_code == expected_response
+
+
+def test_add_actors_bulk(client):
+    body = [
+        dict(name='Florence Pugh', gender='female', date_of_birth='03.01.1996'),
+        dict(name='Paul Mescal', gender='male', date_of_birth='02.02.1996'),
+        dict(name='Florence Pugh', gender='female', date_of_birth='03.01.1996'), # repeated in the same request
+        dict(name='Austin Butler', date_of_birth='17.08.1991'), # all required fields should be specified
+        dict(name='Barry Keoghan', gender='male', date_of_birth='1992-10-18') # date of birth should be in format DATE_FORMAT
+    ]
+    response = client.post(ACTOR_BULK_ROUTE, json=body)
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['created', 'created', 'duplicate', 'invalid', 'invalid']
+
+    response = client.post(ACTOR_BULK_ROUTE, json=body[:2])
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['exists', 'exists']
+
+
+def test_add_actors_bulk_types(client):
+    body = [
+        dict(name=['Emma Stone'], gender='female', date_of_birth='06.11.1988'), # name should be a string
+        dict(name={'first': 'Emma'}, gender='female', date_of_birth='06.11.1988'),
+        dict(name=None, gender='female', date_of_birth='06.11.1988'),
+        dict(name='Ryan Gosling', gender=['male'], date_of_birth='12.11.1980'),
+        dict(name='Emma Stone' * 10, gender='female', date_of_birth='06.11.1988'), # name should fit the column
+        dict(name='Emma Stone', gender='female', date_of_birth=19881106),
+        dict(name='Emma Stone', gender='female', date_of_birth='06.11.1988'),
+    ]
+    response = client.post(ACTOR_BULK_ROUTE, json=body)
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['invalid'] * 6 + ['created']
+    assert response.json['results'][0]['error'] == 'Name must be a string'
+    assert response.json['results'][4]['error'] == 'Name must be at most 50 characters'
+
+
+@pytest.mark.parametrize(('body', 'expected_response'), [(dict(name='Emma Stone'), 400), ([], 200), (['Emma Stone'], 200)])
+def test_add_actors_bulk_body(client, body, expected_response):
+    response = client.post(ACTOR_BULK_ROUTE, json=body)
     assert response.status_code == expected_response
 
 
@@ -35,12 +90,12 @@ def test_add_actor(body, expected_response):
         (dict(id=7**10), 400) # such actor id record should exist
     ]
 )
-def test_get_actor_by_id(body, expected_response):
+def test_get_actor_by_id(client, body, expected_response):
     if expected_response == 200:
-        post_response = requests.post(ACTOR_ID_ROUTE, data=body)
-        body = dict(id=post_response.json()['id']) # get the actor id that was just created
+        post_response = client.post(ACTOR_ID_ROUTE, data=body)
+        body = dict(id=post_response.json['id']) # get the actor id that was just created
 
-    response = requests.get(ACTOR_ID_ROUTE, data=body)
+    response = client.get(ACTOR_ID_ROUTE, data=body)
     assert response.status_code == expected_response
 
 
@@ -67,11 +122,11 @@ def test_get_actor_by_id(body, expected_response):
             dict(date_of_birth='11/06/1969'), 400) # date of birth should be in format DATE_FORMAT
     ]
 )
-def test_update_actor(body_create, body_update, expected_response):
-    post_response = requests.post(ACTOR_ID_ROUTE, data=body_create)
-    actor_id = dict(id=post_response.json()['id'])  # get the actor id that was just created
+def test_update_actor(client, body_create, body_update, expected_response):
+    post_response = client.post(ACTOR_ID_ROUTE, data=body_create)
+    actor_id = dict(id=post_response.json['id'])  # get the actor id that was just created
 
-    response = requests.put(ACTOR_ID_ROUTE, data={**actor_id, **body_update})
+    response = client.put(ACTOR_ID_ROUTE, data={**actor_id, **body_update})
     assert response.status_code == expected_response
 
 
@@ -83,10 +138,10 @@ def test_update_actor(body_create, body_update, expected_response):
         (dict(id=7**10), 400) # such actor id record should exist
     ]
 )
-def test_delete_actor(body, expected_response):
+def test_delete_actor(client, body, expected_response):
     if expected_response == 200:
-        post_response = requests.post(ACTOR_ID_ROUTE, data=body)
-        body = dict(id=post_response.json()['id'])  # get the actor id that was just created
+        post_response = client.post(ACTOR_ID_ROUTE, data=body)
+        body = dict(id=post_response.json['id'])  # get the actor id that was just created
 
-    response = requests.delete(ACTOR_ID_ROUTE, data=body)
+    response = client.delete(ACTOR_ID_ROUTE, data=body)
     assert response.status_code == expected_response
\ No newline at end of file
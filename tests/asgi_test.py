@@ -0,0 +1,253 @@
+import asyncio
+import datetime
+import json
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+
+import pytest
+from sqlalchemy import create_engine, insert
+
+# ids far from the ones of other tests, entity cache is keyed by model and id only
+FIRST_ID = 1000000
+
+
+@pytest.fixture(scope='module')
+def db_url(app, tmp_path_factory):
+    """
+    SQLite file with a few actors and movies, migrated by the Flask app
+    """
+    from core import create_app
+    from models.actor import Actor
+    from models.movie import Movie
+    from models.relations import association
+
+    db_url = 'sqlite:///{}'.format(tmp_path_factory.mktemp('asgi') / 'app.db')
+    create_app(db_url, schema_check='migrate')
+    with create_engine(db_url).begin() as conn:
+        conn.execute(insert(Actor), [dict(id=FIRST_ID + i, name='Async Actor {}'.format(i), gender='female',
+                                          date_of_birth=datetime.date(1980, 1, i + 1)) for i in range(5)])
+        conn.execute(insert(Movie), [dict(id=FIRST_ID + i, name='Async Movie {}'.format(i), year=2000 + i,
+                                          genre='drama') for i in range(3)])
+        conn.execute(insert(association), [dict(actor_id=FIRST_ID, movie_id=FIRST_ID + i) for i in range(3)])
+    return db_url
+
+
+@pytest.fixture(scope='module')
+def flask_app(db_url):
+    from core import create_app
+    return create_app(db_url, schema_check='off')
+
+
+@asynccontextmanager
+async def serve(app):
+    """
+    Run app with lifespan events like an ASGI server
+    """
+    events = asyncio.Queue()
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await events.put({'type': 'lifespan.startup'})
+    task = asyncio.create_task(app({'type': 'lifespan'}, events.get, send))
+    while not sent and not task.done():
+        await asyncio.sleep(0)
+    assert sent[-1]['type'] == 'lifespan.startup.complete', sent[-1].get('message')
+    yield app
+    await events.put({'type': 'lifespan.shutdown'})
+    await task
+
+
+async def get(app, path, query='', headers=(), method='GET'):
+    """
+    return: tuple (status, headers dict, body)
+    """
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+             'headers': [(name.lower().encode(), value.encode()) for name, value in headers]}
+    await app(scope, None, send)
+    start, body = sent
+    return start['status'], {name.decode(): value.decode() for name, value in start['headers']}, body['body']
+
+
+def sync_get(flask_app, handler, query='', headers=None):
+    with flask_app.test_request_context('/?' + query, headers=headers):
+        response = handler()
+        return response.status_code, response.headers, response.get_data()
+
+
+def test_async_url():
+    from core.asgi import async_url
+
+    assert str(async_url('sqlite:///app.db')) == 'sqlite+aiosqlite:///app.db'
+    assert async_url('postgresql+psycopg2://u:p@host/db').drivername == 'postgresql+asyncpg'
+    with pytest.raises(ValueError):
+        async_url('mysql://host/db')
+
+
+@pytest.mark.parametrize('query', ['limit=2', 'limit=2&order_by=-name', 'gender=female&born_after=01.01.1980',
+                                   'include=movies&limit=3', 'order_by=nope'])
+def test_actor_pages_match_sync_app(db_url, flask_app, query):
+    from controllers.actor import get_all_actors
+    from core.asgi import create_asgi_app
+
+    async def run():
+        async with serve(create_asgi_app(db_url)) as app:
+            return await get(app, '/api/actors', query)
+
+    status, headers, body = asyncio.run(run())
+    sync_status, sync_headers, sync_body = sync_get(flask_app, get_all_actors, query)
+    assert (status, body) == (sync_status, sync_body.strip())
+    for name in ('ETag', 'X-Next-Cursor'):
+        assert headers.get(name.lower()) == sync_headers.get(name)
+
+
+def test_pages_follow_cursor_and_etag(db_url):
+    from core.asgi import create_asgi_app
+
+    async def run():
+        async with serve(create_asgi_app(db_url)) as app:
+            ids = []
+            query = 'limit=2&year_from=2000'
+            while True:
+                status, headers, body = await get(app, '/api/movies', query)
+                assert status == 200
+                ids += [movie['id'] for movie in json.loads(body)]
+                if 'x-next-cursor' not in headers:
+                    break
+                query = 'limit=2&year_from=2000&cursor=' + quote(headers['x-next-cursor'])
+            status, _, body = await get(app, '/api/movies', query, [('If-None-Match', headers['etag'])])
+            return ids, status, body
+
+    ids, status, body = asyncio.run(run())
+    assert ids == [FIRST_ID, FIRST_ID + 1, FIRST_ID + 2]
+    assert (status, body) == (304, b'')
+
+
+def test_entity_matches_sync_app(db_url, flask_app):
+    from controllers.movie import get_movie_by_id
+    from core.asgi import create_asgi_app
+    from core.cache import entity_cache
+
+    query = 'id={}'.format(FIRST_ID + 1)
+
+    async def run():
+        async with serve(create_asgi_app(db_url)) as app:
+            first = await get(app, '/api/movie', query)
+            cached = await get(app, '/api/movie', query)
+            tagged = await get(app, '/api/movie', query, [('If-None-Match', first[1]['etag'])])
+            included = await get(app, '/api/movie', query + '&include=cast')
+            return first, cached, tagged, included
+
+    entity_cache.invalidate('Movie', FIRST_ID + 1)
+    first, cached, tagged, included = asyncio.run(run())
+    entity_cache.invalidate('Movie', FIRST_ID + 1)
+    sync_status, sync_headers, sync_body = sync_get(flask_app, get_movie_by_id, query)
+    entity_cache.invalidate('Movie', FIRST_ID + 1)
+
+    assert (first[0], first[2], first[1]['etag']) == (sync_status, sync_body, sync_headers['ETag'])
+    assert cached == first
+    assert tagged[0] == 304
+    assert included[0] == 200 and b'"cast":[' in included[2]
+
+
+@pytest.mark.parametrize('path, handler', [('/api/actor', 'actor.get_actor_by_id'),
+                                           ('/api/movie', 'movie.get_movie_by_id')])
+def test_missing_entity_matches_sync_app(db_url, flask_app, path, handler):
+    from importlib import import_module
+
+    from core.asgi import create_asgi_app
+
+    module, name = handler.split('.')
+    query = 'id={}'.format(FIRST_ID - 1)
+
+    async def run():
+        async with serve(create_asgi_app(db_url)) as app:
+            return await get(app, path, query)
+
+    status, _, body = asyncio.run(run())
+    sync_status, _, sync_body = sync_get(flask_app, getattr(import_module('controllers.' + module), name), query)
+    assert (status, json.loads(body)) == (sync_status, json.loads(sync_body))
+
+
+def test_entity_cache_only_when_shared(db_url):
+    from core.asgi import AsyncApp
+    from core.cache import entity_cache
+
+    query = 'id={}'.format(FIRST_ID + 2)
+
+    async def run(cache):
+        async with serve(AsyncApp(db_url, cache=cache)) as app:
+            return await get(app, '/api/movie', query)
+
+    # entry of this process, writes of the WSGI app in other processes would not drop it
+    entity_cache.set('Movie', FIRST_ID + 2, b'{"stale":true}', 'Movie-stale', 10 ** 6)
+    try:
+        assert json.loads(asyncio.run(run(None))[2])['name'] == 'Async Movie 2'
+        assert asyncio.run(run(entity_cache))[2] == b'{"stale":true}'
+    finally:
+        entity_cache.invalidate('Movie', FIRST_ID + 2)
+
+
+def test_cache_calls_do_not_block_loop(db_url):
+    import threading
+
+    from core.asgi import AsyncApp
+    from core.cache import EntityCache
+
+    threads = []
+
+    class RecordingCache(EntityCache):
+        def get(self, *args):
+            threads.append(threading.get_ident())
+            return super().get(*args)
+
+        def set(self, *args):
+            threads.append(threading.get_ident())
+            return super().set(*args)
+
+    async def run():
+        async with serve(AsyncApp(db_url, cache=RecordingCache())) as app:
+            status = (await get(app, '/api/movie', 'id={}'.format(FIRST_ID)))[0]
+            return status, threading.get_ident()
+
+    status, loop_thread = asyncio.run(run())
+    assert status == 200
+    assert len(threads) == 2 and loop_thread not in threads
+
+
+@pytest.mark.parametrize('path, query, method, status', [
+    ('/api/actor', '', 'GET', 400),
+    ('/api/actor', 'id=x', 'GET', 400),
+    ('/api/actor', 'id=1', 'GET', 400),
+    ('/api/actor', 'id={}&include=nope'.format(FIRST_ID), 'GET', 400),
+    ('/api/actor', 'id={}'.format(FIRST_ID), 'DELETE', 405),
+    ('/api/actors', 'stream=ndjson', 'GET', 400),
+    ('/api/stats', '', 'GET', 404),
+])
+def test_errors(db_url, path, query, method, status):
+    from core.asgi import create_asgi_app
+
+    async def run():
+        # no lifespan events, first request starts the app
+        return await get(create_asgi_app(db_url), path, query, method=method)
+
+    result = asyncio.run(run())
+    assert result[0] == status
+    assert b'"error"' in result[2]
+
+
+def test_outdated_database_is_refused(tmp_path):
+    from core.asgi import create_asgi_app
+
+    async def run():
+        async with serve(create_asgi_app('sqlite:///{}'.format(tmp_path / 'new.db'))):
+            pass
+
+    with pytest.raises(AssertionError, match='python -m core.migrate'):
+        asyncio.run(run())
@@ -0,0 +1,143 @@
+import pytest
+from sqlalchemy import event
+
+
+def create_actor(name):
+    return dict(method='POST', path='/api/actor', data=dict(name=name, gender='female', date_of_birth='01.01.1980'))
+
+
+def create_movie(name):
+    return dict(method='POST', path='/api/movie', data=dict(name=name, genre='comedy', year=1990))
+
+
+@pytest.fixture
+def commits(app):
+    """
+    List with one item for every committed transaction while the test runs
+    """
+    from core import db
+
+    committed = []
+
+    def record(conn):
+        committed.append(conn)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'commit', record)
+    yield committed
+    event.remove(engine, 'commit', record)
+
+
+def test_batch_with_references(client, commits):
+    movie_id = client.post('/api/movie', data=dict(name='Batch old movie', genre='drama', year='1980')).json['id']
+    assert client.get('/api/movie', query_string=dict(id=movie_id)).json['year'] == 1980  # cached
+    before = client.get('/api/stats').json
+    commits.clear()
+
+    response = client.post('/api/batch', json=[
+        create_actor('Batch actor'),
+        create_movie('Batch movie'),
+        dict(method='PUT', path='/api/actor-relations', data=dict(id='$0.id', relation_id='$1.id')),
+        dict(method='PUT', path='/api/movie-relations', data=dict(id=movie_id, relation_id='$0.id')),
+        dict(method='PUT', path='/api/movie', data=dict(id=movie_id, year=1981)),
+    ])
+    assert response.status_code == 200
+    assert len(commits) == 1
+    results = response.json['results']
+    assert [result['status'] for result in results] == [200] * 5
+    actor_id, new_movie_id = results[0]['body']['id'], results[1]['body']['id']
+    assert [movie['id'] for movie in results[2]['body']['filmography']] == [new_movie_id]
+
+    # caches, name index and stats are updated after the commit
+    actor = client.get('/api/actor', query_string=dict(id=actor_id, include='movies')).json
+    assert actor['filmography_size'] == 2
+    assert sorted(movie['id'] for movie in actor['movies']) == [movie_id, new_movie_id]
+    assert client.get('/api/movie', query_string=dict(id=movie_id)).json['year'] == 1981
+    assert client.get('/api/search', query_string=dict(q='Batch actor')).json[0]['id'] == actor_id
+    after = client.get('/api/stats').json
+    assert (after['actors'] - before['actors'], after['movies'] - before['movies'],
+            after['links'] - before['links']) == (1, 1, 2)
+
+
+def test_failed_operation_rolls_back_batch(client):
+    before = client.get('/api/stats').json
+    response = client.post('/api/batch', json=[
+        create_actor('Rolled back actor'),
+        create_movie('Rolled back movie'),
+        dict(method='PUT', path='/api/actor', data=dict(id='$0.id', height=180)),
+        create_actor('Never created actor'),
+    ])
+    assert response.status_code == 400
+    assert response.json['index'] == 2
+    assert [result['status'] for result in response.json['results']] == [200, 200, 400]
+
+    actor_id = response.json['results'][0]['body']['id']
+    assert client.get('/api/actor', query_string=dict(id=actor_id)).status_code == 400
+    assert client.get('/api/search', query_string=dict(q='Rolled back')).json == []
+    assert client.get('/api/stats').json == before
+
+
+@pytest.mark.parametrize('body, error', [
+    (dict(method='POST'), 'Body must be a non-empty JSON array'),
+    ([], 'Body must be a non-empty JSON array'),
+    ([create_actor('Too many {}'.format(i)) for i in range(101)], 'Too many operations, max 100'),
+])
+def test_invalid_batch(client, body, error):
+    response = client.post('/api/batch', json=body)
+    assert response.status_code == 400
+    assert response.json == dict(error=error)
+
+
+@pytest.mark.parametrize('operation, error', [
+    ('POST /api/actor', 'Operation must be an object'),
+    (dict(method='GET', path='/api/actor', data=dict(id=1)), 'Method must be one of POST, PUT, DELETE'),
+    (dict(method='POST', path='api/actor'), 'Path must be a string starting with /'),
+    (dict(method='POST', path='/api/actors/bulk'), 'POST /api/actors/bulk is not allowed in batch'),
+    (dict(method='POST', path='/api/actor-relations'), 'POST /api/actor-relations is not allowed in batch'),
+    (dict(method='PUT', path='/api/actor', data=[1]), 'Data must be an object'),
+    (dict(method='PUT', path='/api/actor', data=dict(id=True)), 'Values must be strings or numbers'),
+    (dict(method='PUT', path='/api/actor', data=dict(id='$1.id')), '$1.id refers to a later operation'),
+    (dict(method='PUT', path='/api/actor', data=dict(id='$0.height')), '$0.height refers to a missing field'),
+])
+def test_invalid_operation(client, operation, error):
+    response = client.post('/api/batch', json=[create_actor('Invalid operation actor'), operation])
+    assert response.status_code == 400
+    assert response.json['results'][1] == dict(status=400, body=dict(error=error))
+
+
+def test_clear_relations_within_batch(client):
+    response = client.post('/api/batch', json=[
+        create_actor('Batch cleared actor'),
+        create_movie('Batch cleared movie'),
+        create_movie('Batch kept movie'),
+        dict(method='PUT', path='/api/actor-relations', data=dict(id='$0.id', relation_id='$1.id')),
+        dict(method='DELETE', path='/api/actor-relations', data=dict(id='$0.id')),
+        dict(method='PUT', path='/api/actor-relations', data=dict(id='$0.id', relation_id='$2.id')),
+    ])
+    assert response.status_code == 200
+    results = response.json['results']
+    # link deleted in the middle of the batch is not in the result
+    assert [movie['id'] for movie in results[5]['body']['filmography']] == [results[2]['body']['id']]
+    assert results[5]['body']['filmography_size'] == 1
+
+
+def test_operations_count_for_batch_request(client, queries):
+    from metrics_test import delta, scrape
+
+    labels = 'route="/api/batch",method="POST"'
+    before = scrape(client)
+    queries.clear()
+    response = client.post('/api/batch', json=[
+        create_actor('Batch metrics actor'),
+        dict(method='PUT', path='/api/actor?gender=female', data=dict(id='$0.id')),
+    ])
+    statements = len(queries)
+    after = scrape(client)
+
+    assert response.status_code == 200
+    assert response.json['results'][1]['body']['gender'] == 'female'
+    # operations run inside the batch request, not as requests of their own
+    assert delta(before, after, 'api_requests_total{%s,status="200"}' % labels) == 1
+    assert delta(before, after, 'api_db_queries_sum{%s}' % labels) == statements
+    assert not any(delta(before, after, series) for series in after if 'route="/api/actor"' in series)
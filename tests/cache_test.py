@@ -0,0 +1,108 @@
+import pytest
+
+from core.cache import EntityCache, LocalCache, MemoryClient, RedisCache, entity_cache
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(max_size=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+@pytest.mark.parametrize('backend', ['local', 'redis'])
+def test_cache_entries_expire(backend):
+    clock = Clock()
+    if backend == 'local':
+        cache = EntityCache(LocalCache(ttl=10, clock=clock))
+    else:
+        cache = EntityCache(RedisCache(MemoryClient(clock=clock), ttl=10))
+
+    cache.set('Movie', 1, b'{}', 'Movie-1-1', 1)
+    assert cache.get('Movie', 1) == ('Movie-1-1', b'{}')
+    clock.now = 11
+    assert cache.get('Movie', 1) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_get_by_id_is_cached_until_write(client, queries):
+    movie_id = client.post('/api/movie', data=dict(name='Parasite', genre='thriller', year='2019')).json['id']
+    entity_cache.backend.clear()
+
+    assert client.get('/api/movie', data=dict(id=movie_id)).json['genre'] == 'thriller'
+    queries.clear()
+    assert client.get('/api/movie', data=dict(id=movie_id)).json['genre'] == 'thriller'
+    assert queries == []  # served from cache
+
+    client.put('/api/movie', data=dict(id=movie_id, genre='drama'))
+    assert client.get('/api/movie', data=dict(id=movie_id)).json['genre'] == 'drama'
+
+
+def test_relation_write_invalidates_entry(client):
+    actor_id = client.post('/api/actor', data=dict(name='Choi Woo-shik', gender='male', date_of_birth='26.03.1990')).json['id']
+    client.get('/api/actor', data=dict(id=actor_id))
+    assert entity_cache.backend.get(EntityCache.key('Actor', actor_id)) is not None
+
+    client.delete('/api/actor-relations', data=dict(id=actor_id))
+    assert entity_cache.backend.get(EntityCache.key('Actor', actor_id)) is None
+
+
+@pytest.mark.parametrize('backend', ['local', 'redis'])
+def test_old_version_is_not_cached_after_invalidate(backend):
+    cache = EntityCache(LocalCache() if backend == 'local' else RedisCache(MemoryClient()))
+    cache.set('Movie', 1, b'{"v": 1}', 'Movie-1-1', 1)
+
+    # reader loaded version 1, writer committed version 2 and invalidated before the reader stores it
+    cache.invalidate('Movie', 1, 2)
+    cache.set('Movie', 1, b'{"v": 1}', 'Movie-1-1', 1)
+    assert cache.get('Movie', 1) is None
+
+    cache.set('Movie', 1, b'{"v": 2}', 'Movie-1-2', 2)
+    cache.invalidate('Movie', 1, 2)  # late invalidate of the version already cached
+    cache.set('Movie', 1, b'{"v": 1}', 'Movie-1-1', 1)
+    assert cache.get('Movie', 1) == ('Movie-1-2', b'{"v": 2}')
+
+    cache.invalidate('Movie', 1, 3)
+    cache.invalidate('Movie', 1, 2)  # invalidates of concurrent writes run out of order
+    cache.set('Movie', 1, b'{"v": 2}', 'Movie-1-2', 2)
+    assert cache.get('Movie', 1) is None
+
+
+@pytest.mark.parametrize('backend', ['local', 'redis'])
+def test_concurrent_writers_keep_newest_version(backend):
+    import random
+    import threading
+
+    from core.cache import value_floor
+
+    cache = EntityCache(LocalCache() if backend == 'local' else RedisCache(MemoryClient()))
+    versions = list(range(1, 201))
+    random.Random(3).shuffle(versions)
+
+    def write(part):
+        for version in part:
+            cache.set('Movie', 1, b'{}', 'Movie-1-{}'.format(version), version)
+            cache.invalidate('Movie', 1, version)
+
+    threads = [threading.Thread(target=write, args=(versions[i::8],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # response of the newest version, which later invalidates of older ones did not replace
+    assert value_floor(cache.backend.get(EntityCache.key('Movie', 1))) == 201
@@ -0,0 +1,103 @@
+import os
+import threading
+from collections import Counter
+
+import pytest
+from flask.testing import FlaskClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.exceptions import HTTPException
+
+# settings.constants requires DB_URL, in-process tests use their own database
+os.environ.setdefault('DB_URL', 'sqlite://')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def check_query_budget(app, method, path, statements):
+    """
+    Compare SQL statements run by request with budget of its route, see `core.routes.query_budget`
+
+    raise: QueryBudgetExceeded if there are more statements than the budget
+        or one statement runs more times than allowed
+    """
+    from core.routes import QUERY_BUDGETS
+
+    method = 'GET' if method == 'HEAD' else method
+    try:
+        endpoint, _ = app.url_map.bind('localhost').match(path, method)
+    except HTTPException:
+        return
+    budget = QUERY_BUDGETS.get(endpoint, {})
+    limit = budget.get(method)
+    if limit is not None and len(statements) > limit:
+        raise QueryBudgetExceeded('{} {} ran {} SQL statements, budget is {}:\n{}'.format(
+            method, path, len(statements), limit, '\n'.join(statements)))
+    repeats = budget.get('repeats', 1)
+    for statement, count in Counter(statements).items():
+        if count > repeats:
+            raise QueryBudgetExceeded('{} {} ran the same statement {} times (N+1?):\n{}'.format(
+                method, path, count, statement))
+
+
+class BudgetClient(FlaskClient):
+    """
+    Test client recording SQL statements of every request, fails requests over their query budget
+
+    Statements of the body are counted too, so streamed responses are read
+    before returning. Only statements of the calling thread are recorded.
+    """
+
+    def open(self, *args, **kwargs):
+        statements = []
+        thread = threading.get_ident()
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if threading.get_ident() == thread:
+                statements.append(statement)
+
+        event.listen(Engine, 'before_cursor_execute', record)
+        try:
+            response = super().open(*args, **kwargs)
+            response.get_data()
+        finally:
+            event.remove(Engine, 'before_cursor_execute', record)
+        check_query_budget(self.application, response.request.method, response.request.path, statements)
+        return response
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """
+    App on a SQLite file shared by all tests, a file so concurrent requests see the same data
+    """
+    from core import create_app
+    app = create_app('sqlite:///{}'.format(tmp_path_factory.mktemp('db') / 'test.db'))
+    app.test_client_class = BudgetClient
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """
+    List of SQL statements executed while the test runs
+    """
+    from core import db
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
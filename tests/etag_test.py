@@ -0,0 +1,42 @@
+from core.cache import entity_cache
+
+
+def test_entity_not_modified(client, queries):
+    movie_id = client.post('/api/movie', data=dict(name='Roma', genre='drama', year='2018')).json['id']
+    response = client.get('/api/movie', data=dict(id=movie_id))
+    etag = response.headers['ETag']
+
+    entity_cache.backend.clear()
+    queries.clear()
+    response = client.get('/api/movie', data=dict(id=movie_id), headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert len(queries) == 1 and 'version' in queries[0]  # row body is not read
+
+    client.put('/api/movie', data=dict(id=movie_id, year='2019'))
+    response = client.get('/api/movie', data=dict(id=movie_id), headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_cached_entity_not_modified(client, queries):
+    actor_id = client.post('/api/actor', data=dict(name='Yalitza Aparicio', gender='female', date_of_birth='11.12.1993')).json['id']
+    etag = client.get('/api/actor', data=dict(id=actor_id)).headers['ETag']
+
+    queries.clear()
+    response = client.get('/api/actor', data=dict(id=actor_id), headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert queries == []
+
+
+def test_list_not_modified(client):
+    client.post('/api/movie', data=dict(name='Gravity Falls', genre='animation', year='2012'))
+    response = client.get('/api/movies', query_string=dict(order_by='year'))
+    etag = response.headers['ETag']
+
+    response = client.get('/api/movies', query_string=dict(order_by='year'), headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    client.post('/api/movie', data=dict(name='Primer', genre='sci-fi', year='2004'))
+    response = client.get('/api/movies', query_string=dict(order_by='year'), headers={'If-None-Match': etag})
+    assert response.status_code == 200
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event
+
+from core import db
+
+
+def query_plan(app, client, route, params, number=0):
+    """
+    Run request and get EXPLAIN QUERY PLAN of the SELECT it issued
+
+    number: which SELECT of the request to explain
+    """
+    selects = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith('SELECT'):
+            selects.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = client.get(route, query_string=params)
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        assert response.status_code == 200
+
+        statement, parameters = selects[number]
+        with engine.connect() as conn:
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    return response, ' | '.join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    ('params', 'index'),
+    [
+        (dict(year=2019, genre='thriller'), 'ix_movies_year_genre'),
+        (dict(year_from=2010, year_to=2019, genre='thriller'), 'ix_movies_year_'),
+        (dict(year_from=2010, year_to=2019, order_by='year'), 'ix_movies_year_'),
+    ]
+)
+def test_movie_filters_use_index(app, client, params, index):
+    for name, genre, year in [('Knives Out', 'thriller', '2019'), ('Us', 'horror', '2019'), ('Prisoners', 'thriller', '2013')]:
+        client.post('/api/movie', data=dict(name=name, genre=genre, year=year))
+
+    response, plan = query_plan(app, client, '/api/movies', params)
+    assert index in plan
+    assert 'SCAN movies' not in plan
+    movies = response.json
+    assert movies and all(2010 <= movie['year'] <= 2019 for movie in movies)
+
+
+def test_actor_filters_use_index(app, client):
+    for name, gender, born in [('Toni Collette', 'female', '01.11.1972'), ('Essie Davis', 'female', '19.01.1970'), ('Alex Wolff', 'male', '01.11.1997')]:
+        client.post('/api/actor', data=dict(name=name, gender=gender, date_of_birth=born))
+
+    params = dict(gender='female', born_after='01.01.1971', born_before='01.01.1980')
+    response, plan = query_plan(app, client, '/api/actors', params)
+    assert 'ix_actors_gender_date_of_birth' in plan
+    assert 'SCAN actors' not in plan
+    assert 'Toni Collette' in [actor['name'] for actor in response.json]
+    assert 'Essie Davis' not in [actor['name'] for actor in response.json]
+
+
+@pytest.mark.parametrize(
+    ('route', 'params'),
+    [('/api/movies', dict(year='twenty')), ('/api/movies', dict(year_from='')), ('/api/actors', dict(born_after='1990-01-01'))]
+)
+def test_invalid_filters(client, route, params):
+    assert client.get(route, query_string=params).status_code == 400
+
+
+def test_cast_lookup_uses_reverse_index(app, client):
+    movie_id = client.post('/api/movie', data=dict(name='Hereditary', genre='horror', year='2018')).json['id']
+
+    response, plan = query_plan(app, client, '/api/movie', dict(id=movie_id, include='cast'), number=1)
+    assert 'ix_association_movie_id_actor_id' in plan
+    assert 'SCAN association' not in plan
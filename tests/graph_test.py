@@ -0,0 +1,238 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from models.graph import CoStarGraph
+
+
+def naive_distances(links, source):
+    """
+    Co-star distances from source by plain BFS over sets
+    """
+    movies, cast = defaultdict(set), defaultdict(set)
+    for actor_id, movie_id in links:
+        movies[actor_id].add(movie_id)
+        cast[movie_id].add(actor_id)
+    dist = {source: 0}
+    frontier = [source]
+    while frontier:
+        nxt = []
+        for actor_id in frontier:
+            for movie_id in movies[actor_id]:
+                for costar in cast[movie_id]:
+                    if costar not in dist:
+                        dist[costar] = dist[actor_id] + 1
+                        nxt.append(costar)
+        frontier = nxt
+    return dist
+
+
+def check_path(graph, links, source, target):
+    path = graph.shortest_path(source, target)
+    expected = naive_distances(links, source).get(target)
+    if expected is None:
+        assert path == []
+        return
+    assert len(path) == 2 * expected + 1
+    assert path[0] == ('Actor', source) and path[-1] == ('Actor', target)
+    for i in range(1, len(path), 2):
+        assert (path[i - 1][1], path[i][1]) in links
+        assert (path[i + 1][1], path[i][1]) in links
+
+
+@pytest.fixture
+def random_links():
+    rnd = random.Random(7)
+    return {(rnd.randrange(300), rnd.randrange(200)) for _ in range(500)}
+
+
+def test_paths_and_neighborhood(random_links):
+    graph = CoStarGraph()
+    graph.load(*zip(*random_links))
+    for source, target in [(0, 1), (5, 250), (17, 17), (42, 299), (299, 3)]:
+        check_path(graph, random_links, source, target)
+
+    expected = naive_distances(random_links, 5)
+    ids, hops = graph.neighborhood(5, 2)
+    assert dict(zip(ids.tolist(), hops.tolist())) == {k: v for k, v in expected.items() if 0 < v <= 2}
+
+
+def test_incremental_updates(random_links, monkeypatch):
+    monkeypatch.setattr('models.graph.GRAPH_OVERLAY_LIMIT', 50)  # exercise rebuilds too
+    graph = CoStarGraph()
+    graph.load(*zip(*random_links))
+    rnd = random.Random(11)
+    for step in range(100):
+        actor_id, movie_id = rnd.randrange(320), rnd.randrange(220)
+        if step % 3 == 0:
+            graph.add('Movie', movie_id, [actor_id, actor_id + 1])
+            random_links |= {(actor_id, movie_id), (actor_id + 1, movie_id)}
+        elif step % 3 == 1:
+            graph.clear('Actor', actor_id)
+            random_links = {link for link in random_links if link[0] != actor_id}
+        else:
+            graph.add('Actor', actor_id, [movie_id])
+            graph.remove('Movie', movie_id, actor_id)
+            random_links.discard((actor_id, movie_id))
+        if step % 10 == 0:
+            check_path(graph, random_links, rnd.randrange(320), rnd.randrange(320))
+    for source in range(0, 320, 40):
+        check_path(graph, random_links, source, 319 - source)
+
+
+def test_path_endpoint(client):
+    actor = lambda name: client.post('/api/actor', data=dict(name=name, gender='male', date_of_birth='01.01.1970')).json['id']
+    movie = lambda name: client.post('/api/movie', data=dict(name=name, genre='drama', year='1990')).json['id']
+    bacon, penn, hanks, loner = actor('Kevin B'), actor('Sean P'), actor('Tom H'), actor('Lone Actor')
+    mystic, apollo = movie('Mystic River 2'), movie('Apollo 14')
+    client.get('/api/actor/path', query_string={'from': bacon, 'to': hanks})  # graph built before links
+
+    client.put('/api/movie-relations/bulk', json=dict(id=mystic, relation_ids=[bacon, penn]))
+    client.put('/api/actor-relations', data=dict(id=hanks, relation_id=apollo))
+    client.put('/api/actor-relations', data=dict(id=penn, relation_id=apollo))
+
+    response = client.get('/api/actor/path', query_string={'from': bacon, 'to': hanks})
+    assert [(step['type'], step['name']) for step in response.json] == [
+        ('actor', 'Kevin B'), ('movie', 'Mystic River 2'), ('actor', 'Sean P'), ('movie', 'Apollo 14'), ('actor', 'Tom H')]
+
+    response = client.get('/api/actor/costars', query_string=dict(id=bacon, hops=2))
+    assert response.json == [dict(id=penn, hops=1), dict(id=hanks, hops=2)]
+
+    client.delete('/api/actor-relations', data=dict(id=penn))
+    assert client.get('/api/actor/path', query_string={'from': bacon, 'to': hanks}).json == []
+    assert client.get('/api/actor/path', query_string={'from': bacon, 'to': loner}).json == []
+
+
+def test_bad_params(client):
+    assert client.get('/api/actor/path', query_string={'from': 1}).status_code == 400
+    assert client.get('/api/actor/path', query_string={'from': 1, 'to': 10 ** 9}).status_code == 400
+    assert client.get('/api/actor/costars', query_string=dict(id='x')).status_code == 400
+    assert client.get('/api/actor/costars', query_string=dict(id=1, limit=0)).status_code == 400
+    assert client.get('/api/actor/costars', query_string=dict(id=1, cursor='x')).status_code == 400
+
+
+def test_costars_pages(client):
+    actor = lambda name: client.post('/api/actor', data=dict(name=name, gender='male', date_of_birth='01.01.1970')).json['id']
+    movie = lambda name: client.post('/api/movie', data=dict(name=name, genre='drama', year='1990')).json['id']
+    star, cast = actor('Page star'), [actor('Page cast {}'.format(i)) for i in range(4)]
+    first, second = movie('Page movie 1'), movie('Page movie 2')
+    client.put('/api/movie-relations/bulk', json=dict(id=first, relation_ids=[star] + cast[:3]))
+    client.put('/api/movie-relations/bulk', json=dict(id=second, relation_ids=cast[2:]))
+
+    found, cursor = [], None
+    while True:
+        response = client.get('/api/actor/costars', query_string=dict(id=star, hops=2, limit=2, cursor=cursor))
+        assert len(response.json) <= 2
+        found += response.json
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert found == [dict(id=row_id, hops=1) for row_id in cast[:3]] + [dict(id=cast[3], hops=2)]
+
+
+def naive_similar(links, kind, row_id, metric):
+    """
+    Similarity of all records of kind to row_id from sets of related ids
+    """
+    related = defaultdict(set)
+    for actor_id, movie_id in links:
+        if kind == 'Actor':
+            related[actor_id].add(movie_id)
+        else:
+            related[movie_id].add(actor_id)
+    mine = related[row_id]
+    scores = {}
+    for other, theirs in related.items():
+        shared = len(mine & theirs)
+        if other != row_id and shared:
+            if metric == 'cosine':
+                scores[other] = shared / (len(mine) * len(theirs)) ** 0.5
+            else:
+                scores[other] = shared / len(mine | theirs)
+    return scores
+
+
+@pytest.mark.parametrize('kind', ['Actor', 'Movie'])
+@pytest.mark.parametrize('metric', ['jaccard', 'cosine'])
+def test_similar(random_links, kind, metric):
+    graph = CoStarGraph()
+    graph.load(*zip(*random_links))
+    graph.clear(kind, 3)
+    graph.add(kind, 3, [1, 2, 5, 8])
+    random_links = {link for link in random_links if link[kind == 'Movie'] != 3}
+    random_links |= {(3, i) if kind == 'Actor' else (i, 3) for i in [1, 2, 5, 8]}
+
+    for row_id in [3, 10, 150]:
+        expected = naive_similar(random_links, kind, row_id, metric)
+        best = sorted(expected, key=lambda other: (-expected[other], other))[:5]
+        ids, scores, _ = graph.similar(kind, row_id, 5, metric)
+        assert ids.tolist() == best
+        assert scores.tolist() == pytest.approx([expected[other] for other in best])
+
+
+def test_similar_endpoint(client):
+    movie = lambda name: client.post('/api/movie', data=dict(name=name, genre='drama', year='1990')).json['id']
+    alien, aliens, heat = movie('Alien 9'), movie('Aliens 9'), movie('Heat 9')
+    cast = [dict(name='Similar {}'.format(i), gender='female', date_of_birth='01.01.1980') for i in range(4)]
+    actor_ids = [r['id'] for r in client.post('/api/actors/bulk', json=cast).json['results']]
+    client.put('/api/movie-relations/bulk', json=dict(id=alien, relation_ids=actor_ids[:3]))
+    client.put('/api/movie-relations/bulk', json=dict(id=aliens, relation_ids=actor_ids[:2]))
+    client.put('/api/movie-relations/bulk', json=dict(id=heat, relation_ids=actor_ids[2:]))
+
+    response = client.get('/api/movie/similar', query_string=dict(id=alien))
+    assert response.json == [dict(id=aliens, name='Aliens 9', score=0.6667, shared=2),
+                             dict(id=heat, name='Heat 9', score=0.25, shared=1)]
+    response = client.get('/api/actor/similar', query_string=dict(id=actor_ids[2], metric='cosine', limit=1))
+    assert response.json == [dict(id=actor_ids[3], name='Similar 3', score=0.7071, shared=1)]
+
+    assert client.get('/api/movie/similar', query_string=dict(id=alien, metric='euclid')).status_code == 400
+    assert client.get('/api/actor/similar', query_string=dict(id=actor_ids[0], limit=0)).status_code == 400
+
+
+def test_rebuilt_after_ttl_when_links_changed(app, client):
+    from core import db
+    from models.relations import association
+
+    actor = lambda name: client.post('/api/actor', data=dict(name=name, gender='male', date_of_birth='01.01.1970')).json['id']
+    first, second, third = actor('Ttl first'), actor('Ttl second'), actor('Ttl third')
+    movie_id = client.post('/api/movie', data=dict(name='Ttl movie', genre='drama', year='1990')).json['id']
+    client.put('/api/actor-relations', data=dict(id=first, relation_id=movie_id))
+    now = [0]
+    graph = CoStarGraph(ttl=10, clock=lambda: now[0])
+    with app.app_context():
+        graph.build()
+        # link saved by another worker
+        client.put('/api/actor-relations', data=dict(id=second, relation_id=movie_id))
+        graph.build()
+        assert graph.shortest_path(first, second) == []
+        now[0] = 11
+        graph.build()
+        assert graph.shortest_path(first, second) == [('Actor', first), ('Movie', movie_id), ('Actor', second)]
+
+        # not rebuilt while the counter of link writes stays the same
+        db.session.execute(association.insert().values(actor_id=third, movie_id=movie_id))
+        db.session.commit()
+        now[0] = 22
+        graph.build()
+        assert graph.shortest_path(first, third) == []
+        # keep maintained stats of the shared database right
+        db.session.execute(association.delete().where(association.c.actor_id == third))
+        db.session.commit()
+
+
+def test_writes_during_build_are_kept(app):
+    from sqlalchemy import event
+
+    from core import db
+
+    graph = CoStarGraph()
+
+    def commit_during_read(*args):
+        # hooks of relation writes committed while the table is being read
+        graph.add('Movie', 10 ** 6, [10 ** 6, 10 ** 6 + 1])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', commit_during_read, once=True)
+        graph.build()
+    assert len(graph.shortest_path(10 ** 6, 10 ** 6 + 1)) == 3
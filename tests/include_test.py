@@ -0,0 +1,48 @@
+import pytest
+
+
+def create_movie_with_cast(client, name, cast_size):
+    movie_id = client.post('/api/movie', data=dict(name=name, genre='drama', year='2000')).json['id']
+    cast = [dict(name='{} actor {}'.format(name, i), gender='female', date_of_birth='01.01.1980') for i in range(cast_size)]
+    actor_ids = [r['id'] for r in client.post('/api/actors/bulk', json=cast).json['results']]
+    client.put('/api/movie-relations/bulk', json=dict(id=movie_id, relation_ids=actor_ids))
+    return movie_id, actor_ids
+
+
+@pytest.mark.parametrize('cast_size', [1, 10, 100])
+def test_movie_with_cast_query_count(client, queries, cast_size):
+    movie_id, actor_ids = create_movie_with_cast(client, 'Cast of {}'.format(cast_size), cast_size)
+    queries.clear()
+
+    response = client.get('/api/movie', query_string=dict(id=movie_id, include='cast'))
+    assert response.status_code == 200
+    assert sorted(actor['id'] for actor in response.json['cast']) == sorted(actor_ids)
+    assert response.json['cast'][0]['date_of_birth'] == '01.01.1980'
+    assert len(queries) == 2  # movie, then its cast with one IN query
+
+
+def test_actor_with_movies(client, queries):
+    movie_id, actor_ids = create_movie_with_cast(client, 'Ensemble', 2)
+    queries.clear()
+
+    response = client.get('/api/actor', query_string=dict(id=actor_ids[0], include='movies'))
+    assert [movie['id'] for movie in response.json['movies']] == [movie_id]
+    assert len(queries) == 2
+
+
+@pytest.mark.parametrize('limit', [5, 50])
+def test_list_with_cast_query_count(client, queries, limit):
+    for i in range(3):
+        create_movie_with_cast(client, 'Listed {} {}'.format(limit, i), 3)
+    queries.clear()
+
+    response = client.get('/api/movies', query_string=dict(include='cast', limit=limit))
+    assert response.status_code == 200
+    assert all('cast' in movie for movie in response.json)
+    assert len(queries) == 2  # page of movies, casts of the whole page
+
+
+@pytest.mark.parametrize(('route', 'include'), [('/api/movie', 'movies'), ('/api/actors', 'cast')])
+def test_include_unknown_relation(client, route, include):
+    response = client.get(route, query_string=dict(id=1, include=include))
+    assert response.status_code == 400
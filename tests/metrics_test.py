@@ -0,0 +1,117 @@
+import re
+
+import pytest
+
+
+def scrape(client):
+    """
+    return: dict series -> value, series is the sample line without the value
+    """
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    samples = {}
+    for line in response.get_data(as_text=True).splitlines():
+        if not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+def delta(before, after, series):
+    return after.get(series, 0) - before.get(series, 0)
+
+
+@pytest.fixture
+def actor_ids(client):
+    return [client.post('/api/actor', data=dict(name='Metrics actor {}'.format(i), gender='male',
+                                                date_of_birth='01.01.1960')).json['id'] for i in range(3)]
+
+
+def test_histogram_render():
+    from core.metrics import Histogram
+
+    histogram = Histogram('latency', 'Help.', ('route',), (0.1, 1))
+    for amount in (0.05, 0.1, 0.5, 2):
+        histogram.observe(('/a"b',), amount)
+    assert histogram.render() == [
+        '# HELP latency Help.',
+        '# TYPE latency histogram',
+        'latency_bucket{route="/a\\"b",le="0.1"} 2',
+        'latency_bucket{route="/a\\"b",le="1"} 3',
+        'latency_bucket{route="/a\\"b",le="+Inf"} 4',
+        'latency_sum{route="/a\\"b"} 2.65',
+        'latency_count{route="/a\\"b"} 4',
+    ]
+
+
+def test_request_is_recorded(client, actor_ids, queries):
+    labels = 'route="/api/actors",method="GET"'
+    before = scrape(client)
+    queries.clear()
+    response = client.get('/api/actors', query_string=dict(limit=2, after_id=actor_ids[0] - 1))
+    statements = len(queries)
+    after = scrape(client)
+
+    assert response.status_code == 200
+    assert delta(before, after, 'api_requests_total{%s,status="200"}' % labels) == 1
+    assert delta(before, after, 'api_request_duration_seconds_count{%s}' % labels) == 1
+    assert delta(before, after, 'api_db_queries_sum{%s}' % labels) == statements
+    assert delta(before, after, 'api_rows_serialized_total{%s}' % labels) == 2
+    assert delta(before, after, 'api_response_bytes_total{%s}' % labels) == len(response.data)
+
+
+def test_stream_is_recorded_when_sent(client, actor_ids):
+    labels = 'route="/api/actors",method="GET"'
+    before = scrape(client)
+    response = client.get('/api/actors', query_string=dict(stream='ndjson'))
+    lines = response.data.count(b'\n')
+    after = scrape(client)
+
+    assert delta(before, after, 'api_rows_serialized_total{%s}' % labels) == lines
+    assert delta(before, after, 'api_response_bytes_total{%s}' % labels) == len(response.data)
+    assert delta(before, after, 'api_db_queries_sum{%s}' % labels) >= 1
+
+
+def test_unknown_paths_share_one_series(client):
+    before = scrape(client)
+    client.get('/no/such/path')
+    client.get('/no/such/other/path')
+    after = scrape(client)
+    assert delta(before, after, 'api_requests_total{route="unmatched",method="GET",status="404"}') == 2
+
+
+def test_server_timing_toggle(app, client, actor_ids):
+    assert 'Server-Timing' not in client.get('/api/actor', query_string=dict(id=actor_ids[0])).headers
+
+    app.config['SERVER_TIMING'] = True
+    try:
+        header = client.get('/api/actor', query_string=dict(id=actor_ids[0])).headers['Server-Timing']
+    finally:
+        app.config['SERVER_TIMING'] = False
+    assert re.fullmatch(r'db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+', header)
+
+
+def test_workers_are_summed_up(tmp_path):
+    from core.metrics import Metrics, RequestStats
+
+    workers = [Metrics(str(tmp_path)), Metrics(str(tmp_path))]
+    stats = RequestStats()
+    stats.rows = 2
+    for worker in workers:
+        worker.record('/api/actors', 'GET', 200, stats)
+        worker.flush()
+    workers[0].record('/api/actors', 'GET', 200, stats)  # within a second of its last write
+
+    samples = {}
+    for line in workers[1].render().decode().splitlines():
+        if not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    labels = 'route="/api/actors",method="GET"'
+    assert samples['api_requests_total{%s,status="200"}' % labels] == 2
+    assert samples['api_rows_serialized_total{%s}' % labels] == 4
+    assert samples['api_request_duration_seconds_count{%s}' % labels] == 2
+    # shows up with the next write of that worker
+    workers[0].flush()
+    assert b'api_requests_total{%s,status="200"} 3' % labels.encode() in workers[1].render()
@@ -1,16 +1,87 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-import requests
 
-MOVIE_LIST_ROUTE = 'http://127.0.0.1:8000/api/movies'
-MOVIE_ID_ROUTE = 'http://127.0.0.1:8000/api/movie'
+MOVIE_LIST_ROUTE = '/api/movies'
+MOVIE_ID_ROUTE = '/api/movie'
+MOVIE_BULK_ROUTE = '/api/movies/bulk'
 
 
 @pytest.mark.parametrize(('body', 'expected_response'), [(dict([]), 200)])
-def test_get_all_movies(body, expected_response):
-    response = requests.get(MOVIE_LIST_ROUTE, data=body)
+def test_get_all_movies(client, body, expected_response):
+    response = client.get(MOVIE_LIST_ROUTE, data=body)
     assert response.status_code == expected_response
 
 
+@pytest.mark.parametrize(
+    ('params', 'expected_response'),
+    [
+        (dict(limit=2), 200),
+        (dict(limit=2, order_by='year'), 200),
+        (dict(after_id=1), 200),
+        (dict(limit='two'), 400), # limit should be integer
+        (dict(limit=0), 400), # limit should be positive
+        (dict(order_by='genre'), 400), # only indexed columns can be used for ordering
+        (dict(cursor='not-a-cursor'), 400), # cursor should be produced by the api
+        (dict(order_by='name', after_id=1), 400) # after_id works only with ordering by id
+    ]
+)
+def test_get_movies_page(client, params, expected_response):
+    response = client.get(MOVIE_LIST_ROUTE, query_string=params)
+    assert response.status_code == expected_response
+
+
+@pytest.mark.parametrize('cursor', [
+    ['name', {'a': 1}, 1],
+    ['name', [1], 1],
+    ['name', 5, 1],
+    ['year', '1999', 1],
+    ['id', True, 1],
+    ['id', 1, 'one'],
+])
+def test_crafted_cursor(client, cursor):
+    from controllers.pagination import encode_cursor
+
+    response = client.get(MOVIE_LIST_ROUTE, query_string=dict(order_by=cursor[0], cursor=encode_cursor(*cursor)))
+    assert response.status_code == 400
+    assert response.json == dict(error='Invalid cursor')
+
+
+@pytest.mark.parametrize('order_by', ['id', 'name', 'year'])
+def test_movies_cursor_walk(client, order_by):
+    for name, year in [('Blade Runner', '2021'), ('Alien', '1979'), ('Heat', '1995'), ('Fargo', '1996')]:
+        client.post(MOVIE_ID_ROUTE, data=dict(name=name, genre='drama', year=year))
+
+    seen = []
+    params = dict(limit=2, order_by=order_by)
+    while True:
+        response = client.get(MOVIE_LIST_ROUTE, query_string=params)
+        assert response.status_code == 200
+        seen.extend(movie['id'] for movie in response.json)
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+
+    all_movies = client.get(MOVIE_LIST_ROUTE, query_string=dict(limit=1000)).json
+    assert sorted(seen) == sorted(movie['id'] for movie in all_movies)
+
+
+@pytest.mark.parametrize(('stream', 'expected_response'), [('ndjson', 200), ('json', 200), ('xml', 400)])
+def test_stream_movies(client, stream, expected_response):
+    client.post(MOVIE_ID_ROUTE, data=dict(name='Gravity', genre='sci-fi', year='2013'))
+
+    response = client.get(MOVIE_LIST_ROUTE, query_string=dict(stream=stream))
+    assert response.status_code == expected_response
+    if stream == 'ndjson':
+        movies = [json.loads(line) for line in response.text.splitlines()]
+    elif stream == 'json':
+        movies = response.json
+    else:
+        return
+    assert 'Gravity' in [movie['name'] for movie in movies]
+
+
 @pytest.mark.parametrize(
     ('body', 'expected_response'),
     [
@@ -21,11 +92,79 @@ def test_get_all_movies(body, expected_response):
         (dict(name='Interstellar', genre='sci-fi', year='2zero14'), 400) # year should be integer
     ]
 )
-def test_add_movie(body, expected_response):
-    response = requests.post(MOVIE_ID_ROUTE, data=body)
+def test_add_movie(client, body, expected_response):
+    response = client.post(MOVIE_ID_ROUTE, data=body)
     assert response.status_code == expected_response
 
 
+def test_add_movie_same_name(client):
+    body = dict(name='Whiplash', genre='drama', year='2014')
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(lambda _: client.post(MOVIE_ID_ROUTE, data=body), range(16)))
+
+    # concurrent posts of the same name get the same record instead of a unique violation
+    assert [r.status_code for r in responses] == [200] * 16
+    assert len({r.json['id'] for r in responses}) == 1
+
+
+def test_add_movie_deleted_meanwhile(app):
+    from sqlalchemy import event, select
+
+    from core import db
+    from models.movie import Movie
+
+    table = Movie.__table__
+    lookups = []
+
+    def delete_before_lookup(conn, cursor, statement, *args):
+        # record of the same name is removed by another worker after the INSERT found it
+        if statement.startswith('SELECT') and not lookups:
+            lookups.append(statement)
+            with db.engine.begin() as other:
+                other.execute(table.delete().where(table.c.name == 'Gone Girl'))
+
+    with app.app_context():
+        # saved without counting it in stats, so they stay right after it is gone
+        with db.engine.begin() as other:
+            other.execute(table.insert().values(name='Gone Girl', genre='drama', year=2014))
+        event.listen(db.engine, 'before_cursor_execute', delete_before_lookup)
+        try:
+            row = Movie.create(name='Gone Girl', genre='thriller', year=2014)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', delete_before_lookup)
+        assert lookups
+        assert row.genre == 'thriller'
+        assert db.session.execute(select(table.c.genre).where(table.c.id == row.id)).scalar() == 'thriller'
+
+
+def test_add_movies_bulk(client):
+    body = [dict(name='Bulk Movie {}'.format(i), genre='drama', year=str(1950 + i)) for i in range(500)]
+    body.append(dict(name='Bulk Movie X', genre='drama', year='last')) # year should be integer
+
+    response = client.post(MOVIE_BULK_ROUTE, json=body)
+    assert response.status_code == 200
+    assert response.json['created'] == 500
+    assert response.json['invalid'] == 1
+
+    response = client.post(MOVIE_BULK_ROUTE, json=body[:10])
+    assert response.json['exists'] == 10
+
+
+def test_add_movies_bulk_types(client):
+    body = [
+        dict(name='Bulk Typed Movie', genre='drama', year=1.7), # year should be a whole number
+        dict(name='Bulk Typed Movie', genre='drama', year=True),
+        dict(name='Bulk Typed Movie', genre='drama', year=None),
+        dict(name=['Bulk Typed Movie'], genre='drama', year=2000),
+        dict(name='Bulk Typed Movie', genre='drama' * 5, year=2000), # genre should fit the column
+        dict(name='Bulk Typed Movie', genre='drama', year=2000),
+    ]
+    response = client.post(MOVIE_BULK_ROUTE, json=body)
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['invalid'] * 5 + ['created']
+    assert response.json['results'][0]['error'] == 'Year must be an integer'
+
+
 @pytest.mark.parametrize(
     ('body', 'expected_response'),
     [
@@ -35,12 +174,12 @@ def test_add_movie(body, expected_response):
         (dict(id=7**10), 400) # such movie id record should exist
     ]
 )
-def test_get_movie_by_id(body, expected_response):
+def test_get_movie_by_id(client, body, expected_response):
     if expected_response == 200:
-        post_response = requests.post(MOVIE_ID_ROUTE, data=body)
-        body = dict(id=post_response.json()['id']) # get the movie id that was just created
+        post_response = client.post(MOVIE_ID_ROUTE, data=body)
+        body = dict(id=post_response.json['id']) # get the movie id that was just created
 
-    response = requests.get(MOVIE_ID_ROUTE, data=body)
+    response = client.get(MOVIE_ID_ROUTE, data=body)
     assert response.status_code == expected_response
 
 
@@ -67,11 +206,11 @@ def test_get_movie_by_id(body, expected_response):
             dict(year='twozerotwoone'), 400) # year should be integer
     ]
 )
-def test_update_movie(body_create, body_update, expected_response):
-    post_response = requests.post(MOVIE_ID_ROUTE, data=body_create)
-    movie_id = dict(id=post_response.json()['id'])  # get the movie id that was just created
+def test_update_movie(client, body_create, body_update, expected_response):
+    post_response = client.post(MOVIE_ID_ROUTE, data=body_create)
+    movie_id = dict(id=post_response.json['id'])  # get the movie id that was just created
 
-    response = requests.put(MOVIE_ID_ROUTE, data={**movie_id, **body_update})
+    response = client.put(MOVIE_ID_ROUTE, data={**movie_id, **body_update})
     assert response.status_code == expected_response
 
 
@@ -84,10 +223,10 @@ def test_update_movie(body_create, body_update, expected_response):
         (dict(id=7**10), 400) # such movie id record should exist
     ]
 )
-def test_delete_movie(body, expected_response):
+def test_delete_movie(client, body, expected_response):
     if expected_response == 200:
-        post_response = requests.post(MOVIE_ID_ROUTE, data=body)
-        body = dict(id=post_response.json()['id'])  # get the movie id that was just created
+        post_response = client.post(MOVIE_ID_ROUTE, data=body)
+        body = dict(id=post_response.json['id'])  # get the movie id that was just created
 
-    response = requests.delete(MOVIE_ID_ROUTE, data=body)
+    response = client.delete(MOVIE_ID_ROUTE, data=body)
     assert response.status_code == expected_response
\ No newline at end of file
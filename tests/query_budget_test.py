@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import event
+
+from conftest import QueryBudgetExceeded, check_query_budget
+
+
+def test_every_route_has_budget(app):
+    from core.routes import QUERY_BUDGETS
+
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            if method not in QUERY_BUDGETS.get(rule.endpoint, {}):
+                missing.append('{} {}'.format(method, rule.rule))
+    assert missing == []
+
+
+def test_budget_and_repeats(app):
+    check_query_budget(app, 'GET', '/api/actors', ['SELECT a', 'SELECT b'])
+    check_query_budget(app, 'GET', '/no/such/path', ['SELECT a'] * 10)
+    with pytest.raises(QueryBudgetExceeded, match='budget is 2'):
+        check_query_budget(app, 'GET', '/api/actors', ['SELECT a', 'SELECT b', 'SELECT c'])
+    with pytest.raises(QueryBudgetExceeded, match='N\\+1'):
+        check_query_budget(app, 'HEAD', '/api/actors', ['SELECT a', 'SELECT a'])
+    # bulk inserts run once per batch
+    check_query_budget(app, 'POST', '/api/movies/bulk', ['INSERT a'] * 3 + ['SELECT b'] * 3 + ['INSERT c'])
+
+
+def test_lazy_loads_in_loop_are_caught(app, client):
+    from core import db
+    from models.movie import Movie
+
+    actor_id = client.post('/api/actor', data=dict(name='Budget actor', gender='male',
+                                                   date_of_birth='01.01.1960')).json['id']
+    for i in range(2):
+        movie_id = client.post('/api/movie', data=dict(name='Budget movie {}'.format(i), genre='drama',
+                                                       year='2000')).json['id']
+        client.put('/api/movie-relations', data=dict(id=movie_id, relation_id=actor_id))
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        movies = Movie.page(after=(movie_id - 2, movie_id - 2), limit=2)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        [movie.cast for movie in movies]  # what `include=cast` without selectinload would do
+        event.remove(db.engine, 'before_cursor_execute', record)
+    with pytest.raises(QueryBudgetExceeded, match='N\\+1'):
+        check_query_budget(app, 'GET', '/api/movies', statements)
+
+
+def test_client_fails_request_over_budget(client, monkeypatch):
+    from core.routes import QUERY_BUDGETS
+
+    monkeypatch.setitem(QUERY_BUDGETS, 'get_all_actors', dict(GET=0))
+    with pytest.raises(QueryBudgetExceeded, match='GET /api/actors ran 1 SQL statements'):
+        client.get('/api/actors', query_string=dict(limit=1))
+    client.get('/api/actors', query_string=dict(stream='bad'))  # 400 before any query
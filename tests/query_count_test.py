@@ -0,0 +1,131 @@
+ACTOR = dict(name='Tilda Swinton', gender='female', date_of_birth='05.11.1960')
+MOVIE = dict(name='Snowpiercer', genre='sci-fi', year='2013')
+
+
+def test_create_runs_two_statements(client, queries):
+    response = client.post('/api/actor', data=ACTOR)
+    assert response.status_code == 200
+    assert len(queries) == 2  # INSERT ... ON CONFLICT ... RETURNING, stats upsert
+
+
+def test_update_runs_three_statements(client, queries):
+    movie_id = client.post('/api/movie', data=MOVIE).json['id']
+    queries.clear()
+
+    response = client.put('/api/movie', data=dict(id=movie_id, genre='thriller'))
+    assert response.status_code == 200
+    assert response.json['genre'] == 'thriller'
+    # counted columns before the change, UPDATE ... RETURNING, stats upsert; no refresh
+    assert len(queries) == 3
+
+
+def test_update_of_name_runs_one_statement(client, queries):
+    movie_id = client.post('/api/movie', data=dict(MOVIE, name='Mother')).json['id']
+    queries.clear()
+
+    response = client.put('/api/movie', data=dict(id=movie_id, name='Madeo'))
+    assert response.status_code == 200
+    assert len(queries) == 1  # UPDATE ... RETURNING, no existence check and no refresh
+
+
+def test_update_missing_record(client, queries):
+    response = client.put('/api/movie', data=dict(id=7**10, genre='thriller'))
+    assert response.status_code == 400
+    assert len(queries) == 1
+
+
+def test_delete_runs_without_select(client, queries):
+    actor_id = client.post('/api/actor', data=dict(ACTOR, name='Ed Harris')).json['id']
+    queries.clear()
+
+    response = client.delete('/api/actor', data=dict(id=actor_id))
+    assert response.status_code == 200
+    assert len(queries) == 3  # DELETE from association, DELETE ... RETURNING, stats upsert
+    assert not any(q.lstrip().upper().startswith('SELECT') for q in queries)
+
+
+def test_clear_relations_runs_without_loading(client, queries):
+    actor_id = client.post('/api/actor', data=dict(ACTOR, name='Choi Woo-shik')).json['id']
+    movie_ids = [client.post('/api/movie', data=dict(MOVIE, name='Parasite {}'.format(i))).json['id']
+                 for i in range(3)]
+    client.put('/api/actor-relations/bulk', json=dict(id=actor_id, relation_ids=movie_ids))
+    queries.clear()
+
+    response = client.delete('/api/actor-relations', data=dict(id=actor_id))
+    assert response.status_code == 200
+    assert response.json['filmography_size'] == 0
+    # DELETE from association ... RETURNING, UPDATE of movie sizes, UPDATE of actor ... RETURNING, stats upsert
+    assert len(queries) == 4
+    assert not any(q.lstrip().upper().startswith('SELECT') for q in queries)
+
+    queries.clear()
+    response = client.delete('/api/movie-relations', data=dict(id=7**10))
+    assert response.status_code == 400
+    assert len(queries) == 2
+
+
+def test_clear_relations_expires_loaded_records(app, client):
+    from models.actor import Actor
+    from models.movie import Movie
+
+    actor_id = client.post('/api/actor', data=dict(ACTOR, name='Lee Sun-kyun')).json['id']
+    movie_id = client.post('/api/movie', data=dict(MOVIE, name='Burning')).json['id']
+    client.put('/api/actor-relations', data=dict(id=actor_id, relation_id=movie_id))
+
+    with app.app_context():
+        actor = Actor.query.get(actor_id)
+        movie = Movie.query.get(movie_id)
+        assert [m.id for m in actor.filmography] == [movie_id] and movie.cast_size == 1
+        Movie.clear_relations(movie_id)
+        assert actor.filmography == [] and actor.filmography_size == 0 and movie.cast_size == 0
+
+
+def test_add_relation_skips_refresh(client, queries):
+    actor_id = client.post('/api/actor', data=dict(ACTOR, name='Song Kang-ho')).json['id']
+    movie_id = client.post('/api/movie', data=dict(MOVIE, name='The Host')).json['id']
+    queries.clear()
+
+    response = client.put('/api/actor-relations', data=dict(id=actor_id, relation_id=movie_id))
+    assert response.status_code == 200
+    # movie, actor, actor's filmography, INSERT into association, UPDATE of
+    # actor and movie sizes, stats upsert; nothing is re-read after commit
+    assert len(queries) == 7
+    assert response.json['filmography_size'] == 1
+    assert response.json['filmography'][0]['cast_size'] == 1
+
+
+def writes(queries):
+    """
+    Tables changed by statements in order, e.g. ['association', 'actors', 'stats']
+    """
+    tables = []
+    for query in queries:
+        words = query.split()
+        verb = words[0].upper()
+        if verb in ('INSERT', 'UPDATE', 'DELETE'):
+            tables.append(words[2 if verb != 'UPDATE' else 1].strip('"'))
+    return tables
+
+
+def test_writes_lock_rows_in_one_order(client, queries):
+    actor_id = client.post('/api/actor', data=dict(ACTOR, name='Park So-dam')).json['id']
+    movie_ids = [client.post('/api/movie', data=dict(MOVIE, name='Parasite {}'.format(i + 3))).json['id']
+                 for i in range(2)]
+    requests = [
+        ('put', '/api/actor-relations', dict(id=actor_id, relation_id=movie_ids[0])),
+        ('put', '/api/movie-relations', dict(id=movie_ids[1], relation_id=actor_id)),
+        ('delete', '/api/movie-relations', dict(id=movie_ids[1], relation_id=actor_id)),
+        ('delete', '/api/movie-relations', dict(id=movie_ids[0])),
+        ('put', '/api/actor-relations', dict(id=actor_id, relation_id=movie_ids[1])),
+        ('delete', '/api/actor-relations', dict(id=actor_id)),
+        ('put', '/api/movie-relations', dict(id=movie_ids[0], relation_id=actor_id)),
+        ('delete', '/api/movie', dict(id=movie_ids[0])),
+        ('delete', '/api/actor', dict(id=actor_id)),
+    ]
+    order = ['association', 'actors', 'movies', 'stats']
+    for method, path, data in requests:
+        queries.clear()
+        assert getattr(client, method)(path, data=data).status_code == 200
+        tables = writes(queries)
+        # see `models.base.LOCK_ORDER`, stats upsert is the last statement
+        assert tables == sorted(tables, key=order.index) and tables[-1] == 'stats', (method, path, tables)
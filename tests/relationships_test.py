@@ -1,11 +1,12 @@
 import pytest
-import requests
 
-ACTOR_ID_ROUTE = 'http://127.0.0.1:8000/api/actor'
-ACTOR_REL_ROUTE = 'http://127.0.0.1:8000/api/actor-relations'
+ACTOR_ID_ROUTE = '/api/actor'
+ACTOR_REL_ROUTE = '/api/actor-relations'
+ACTOR_REL_BULK_ROUTE = '/api/actor-relations/bulk'
 
-MOVIE_ID_ROUTE = 'http://127.0.0.1:8000/api/movie'
-MOVIE_REL_ROUTE = 'http://127.0.0.1:8000/api/movie-relations'
+MOVIE_ID_ROUTE = '/api/movie'
+MOVIE_REL_ROUTE = '/api/movie-relations'
+MOVIE_REL_BULK_ROUTE = '/api/movie-relations/bulk'
 
 
 @pytest.mark.parametrize(
@@ -27,13 +28,13 @@ MOVIE_REL_ROUTE = 'http://127.0.0.1:8000/api/movie-relations'
             dict(name='The Outpost', genre='history', year='2019'),{'relation_id':7**10}, 400)
     ]
 )
-def test_actor_add_relation(body_add_actor, actor_id_corrected, movie_id_corrected, body_add_movie, expected_response):
-    actor_id = requests.post(ACTOR_ID_ROUTE, data=body_add_actor).json()['id']
-    movie_id = requests.post(MOVIE_ID_ROUTE, data=body_add_movie).json()['id']
+def test_actor_add_relation(client, body_add_actor, actor_id_corrected, movie_id_corrected, body_add_movie, expected_response):
+    actor_id = client.post(ACTOR_ID_ROUTE, data=body_add_actor).json['id']
+    movie_id = client.post(MOVIE_ID_ROUTE, data=body_add_movie).json['id']
 
     # add relation to actor
     body_add_rel = dict(id=actor_id, relation_id=movie_id)
-    resp_add_rel = requests.put(ACTOR_REL_ROUTE, data={**body_add_rel, **actor_id_corrected, **movie_id_corrected})
+    resp_add_rel = client.put(ACTOR_REL_ROUTE, data={**body_add_rel, **actor_id_corrected, **movie_id_corrected})
 
     assert resp_add_rel.status_code == expected_response
 
@@ -51,17 +52,17 @@ def test_actor_add_relation(body_add_actor, actor_id_corrected, movie_id_correct
             dict(name='The Green Mile', genre='drama', year='1999'), 400)
     ]
 )
-def test_delete_actor_relation(body_add_actor, actor_id_corrected, body_add_movie, expected_response):
-    actor_id = requests.post(ACTOR_ID_ROUTE, data=body_add_actor).json()['id']
-    movie_id = requests.post(MOVIE_ID_ROUTE, data=body_add_movie).json()['id']
+def test_delete_actor_relation(client, body_add_actor, actor_id_corrected, body_add_movie, expected_response):
+    actor_id = client.post(ACTOR_ID_ROUTE, data=body_add_actor).json['id']
+    movie_id = client.post(MOVIE_ID_ROUTE, data=body_add_movie).json['id']
 
     # add relation to actor
     body_add_rel = dict(id=actor_id, relation_id=movie_id)
-    requests.put(ACTOR_REL_ROUTE, data=body_add_rel)
+    client.put(ACTOR_REL_ROUTE, data=body_add_rel)
 
     # clear relation
     body_clear_rels = dict(id=actor_id)
-    resp_clear_rels = requests.delete(ACTOR_REL_ROUTE, data={**body_clear_rels, **actor_id_corrected})
+    resp_clear_rels = client.delete(ACTOR_REL_ROUTE, data={**body_clear_rels, **actor_id_corrected})
 
     assert resp_clear_rels.status_code == expected_response
 
@@ -85,13 +86,13 @@ def test_delete_actor_relation(body_add_actor, actor_id_corrected, body_add_movi
             dict(name='Millicent Simmonds', gender='female', date_of_birth='03.06.2003'),{'relation_id':7**10}, 400)
     ]
 )
-def test_movie_add_relation(body_add_movie, movie_id_corrected, body_add_actor, actor_id_corrected,  expected_response):
-    movie_id = requests.post(MOVIE_ID_ROUTE, data=body_add_movie).json()['id']
-    actor_id = requests.post(ACTOR_ID_ROUTE, data=body_add_actor).json()['id']
+def test_movie_add_relation(client, body_add_movie, movie_id_corrected, body_add_actor, actor_id_corrected,  expected_response):
+    movie_id = client.post(MOVIE_ID_ROUTE, data=body_add_movie).json['id']
+    actor_id = client.post(ACTOR_ID_ROUTE, data=body_add_actor).json['id']
 
     # add relation to movie
     body_add_rel = dict(id=movie_id, relation_id=actor_id)
-    resp_add_rel = requests.put(MOVIE_REL_ROUTE, data={**body_add_rel, **movie_id_corrected,  **actor_id_corrected})
+    resp_add_rel = client.put(MOVIE_REL_ROUTE, data={**body_add_rel, **movie_id_corrected,  **actor_id_corrected})
 
     assert resp_add_rel.status_code == expected_response
 
@@ -109,16 +110,52 @@ def test_movie_add_relation(body_add_movie, movie_id_corrected, body_add_actor,
             dict(name='Rebecca Hall', gender='female', date_of_birth='03.03.1982'), 400)
     ]
 )
-def test_delete_movie_relation(body_add_movie, movie_id_corrected, body_add_actor, expected_response):
-    movie_id = requests.post(MOVIE_ID_ROUTE, data=body_add_movie).json()['id']
-    actor_id = requests.post(ACTOR_ID_ROUTE, data=body_add_actor).json()['id']
+def test_delete_movie_relation(client, body_add_movie, movie_id_corrected, body_add_actor, expected_response):
+    movie_id = client.post(MOVIE_ID_ROUTE, data=body_add_movie).json['id']
+    actor_id = client.post(ACTOR_ID_ROUTE, data=body_add_actor).json['id']
 
     # add relation to movie
     body_add_rel = dict(id=movie_id, relation_id=actor_id)
-    requests.put(MOVIE_REL_ROUTE, data=body_add_rel)
+    client.put(MOVIE_REL_ROUTE, data=body_add_rel)
 
     # clear relation
     body_clear_rels = dict(id=movie_id)
-    resp_clear_rels = requests.delete(MOVIE_REL_ROUTE, data={**body_clear_rels, **movie_id_corrected})
+    resp_clear_rels = client.delete(MOVIE_REL_ROUTE, data={**body_clear_rels, **movie_id_corrected})
 
-    assert resp_clear_rels.status_code == expected_response
\ No newline at end of file
+    assert resp_clear_rels.status_code == expected_response
+
+
+def test_movie_add_relations_bulk(client):
+    movie_id = client.post(MOVIE_ID_ROUTE, data=dict(name='Oppenheimer', genre='drama', year='2023')).json['id']
+    cast = [
+        dict(name='Cillian Murphy', gender='male', date_of_birth='25.05.1976'),
+        dict(name='Emily Blunt', gender='female', date_of_birth='23.02.1983'),
+        dict(name='Robert Downey Jr.', gender='male', date_of_birth='04.04.1965')
+    ]
+    actor_ids = [client.post(ACTOR_ID_ROUTE, data=actor).json['id'] for actor in cast]
+
+    resp = client.put(MOVIE_REL_BULK_ROUTE, json=dict(id=movie_id, relation_ids=actor_ids[:2]))
+    assert resp.status_code == 200
+    assert resp.json['added'] == sorted(actor_ids[:2])
+
+    # form encoded list, one link already exists and one actor is unknown
+    relation_ids = ','.join(str(i) for i in actor_ids[1:] + [7**10])
+    resp = client.put(MOVIE_REL_BULK_ROUTE, data=dict(id=movie_id, relation_ids=relation_ids))
+    assert resp.status_code == 200
+    assert resp.json['added'] == [actor_ids[2]]
+    assert resp.json['existing'] == [actor_ids[1]]
+    assert resp.json['missing'] == [7**10]
+
+
+@pytest.mark.parametrize(
+    ('body', 'expected_response'),
+    [
+        (dict(relation_ids=[1, 2]), 400), # id should be specified
+        (dict(id=1), 400), # relation ids should be specified
+        (dict(id=1, relation_ids=['one']), 400), # relation ids should be integer
+        (dict(id=7**10, relation_ids=[1]), 400) # such actor id record should exist
+    ]
+)
+def test_actor_add_relations_bulk(client, body, expected_response):
+    resp = client.put(ACTOR_REL_BULK_ROUTE, json=body)
+    assert resp.status_code == expected_response
@@ -0,0 +1,51 @@
+import hashlib
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from settings.constants import SCHEMA_VERSION
+
+# fingerprint of tables, columns and indexes of every SCHEMA_VERSION
+FINGERPRINTS = {
+    1: '1f157a420737',
+}
+
+
+def fingerprint(metadata):
+    parts = []
+    for table in sorted(metadata.sorted_tables, key=lambda table: table.name):
+        for column in table.columns:
+            parts.append('{}.{} {} {} {}'.format(table.name, column.name, column.type, column.nullable,
+                                                 column.server_default is not None))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            parts.append('{} {}'.format(index.name, [column.name for column in index.columns]))
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()[:12]
+
+
+def test_schema_version_is_increased_with_models(app):
+    from core import db
+
+    assert FINGERPRINTS.get(SCHEMA_VERSION) == fingerprint(db.metadata), \
+        'models changed: increase SCHEMA_VERSION and add fingerprint of the new version'
+
+
+def test_startup_checks_stamp_only(tmp_path):
+    from core import create_app
+
+    db_url = 'sqlite:///{}'.format(tmp_path / 'app.db')
+    with pytest.raises(RuntimeError, match='python -m core.migrate'):
+        create_app(db_url, schema_check='strict')
+
+    create_app(db_url, schema_check='migrate')
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        create_app(db_url, schema_check='strict')
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+    assert statements == ['SELECT schema_version.version \nFROM schema_version']
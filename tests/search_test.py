@@ -0,0 +1,112 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+
+def search(client, **params):
+    response = client.get('/api/search', query_string=params)
+    assert response.status_code == 200
+    return [(item['type'], item['name']) for item in response.json]
+
+
+def test_prefix_and_typo(client):
+    client.post('/api/actor', data=dict(name='Keanu Reeves', gender='male', date_of_birth='02.09.1964'))
+    client.post('/api/movie', data=dict(name='The Matrix Reloaded', genre='action', year='2003'))
+
+    assert ('actor', 'Keanu Reeves') in search(client, q='kean')
+    assert ('actor', 'Keanu Reeves') in search(client, q='reev')
+    assert ('actor', 'Keanu Reeves') in search(client, q='Keanu Reves')
+    assert search(client, q='matrix relaoded', type='movie')[0] == ('movie', 'The Matrix Reloaded')
+    assert search(client, q='kean', type='movie') == []
+
+
+def test_prefix_matches_first(client):
+    client.post('/api/movie', data=dict(name='Solaris', genre='drama', year='1972'))
+    client.post('/api/movie', data=dict(name='Solar Storm', genre='action', year='2010'))
+
+    names = [name for _, name in search(client, q='solari', type='movie')]
+    assert names[0] == 'Solaris'
+
+
+def test_index_follows_writes(client):
+    search(client, q='warm up')  # build index before writes
+    movie_id = client.post('/api/movie', data=dict(name='Stalker', genre='drama', year='1979')).json['id']
+    assert search(client, q='stalk') == [('movie', 'Stalker')]
+
+    client.put('/api/movie', data=dict(id=movie_id, name='Mirror'))
+    assert search(client, q='stalk') == []
+    assert search(client, q='mirr') == [('movie', 'Mirror')]
+
+    client.delete('/api/movie', data=dict(id=movie_id))
+    assert search(client, q='mirr') == []
+
+
+def test_bad_params(client):
+    assert client.get('/api/search').status_code == 400
+    assert client.get('/api/search', query_string=dict(q='a', limit=100)).status_code == 400
+    assert client.get('/api/search', query_string=dict(q='a', type='genre')).status_code == 400
+
+
+def test_trigram_index_only_on_postgresql(app):
+    from core import db
+    from models.movie import Movie
+
+    index = next(index for index in Movie.__table__.indexes if index.name == 'ix_movies_name_trgm')
+    assert 'gin_trgm_ops' in str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    with app.app_context():
+        created = [index['name'] for index in inspect(db.engine).get_indexes('movies')]
+    assert 'ix_movies_name_trgm' not in created
+
+
+def test_index_loads_every_searched_type(app, client):
+    from models.actor import Actor
+    from models.movie import Movie
+    from models.search import NameIndex
+
+    client.post('/api/movie', data=dict(name='Nostalghia', genre='drama', year='1983'))
+    index = NameIndex()
+    with app.app_context():
+        index.build([Actor])  # first search was type=actor
+        assert index.search('nostal', {'Movie'}, 10) == []
+        index.build([Actor, Movie])
+    assert [name for _, _, name, _ in index.search('nostal', {'Movie'}, 10)] == ['Nostalghia']
+
+
+def test_writes_during_build_are_kept(app, client):
+    from core import db
+    from models.movie import Movie
+    from models.search import NameIndex
+
+    removed_id = client.post('/api/movie', data=dict(name='Sacrifice', genre='drama', year='1986')).json['id']
+    index = NameIndex()
+
+    def commit_during_read(*args):
+        # hooks of writes committed while the table is being read
+        index.add('Movie', 10 ** 6, 'Andrei Rublev')
+        index.remove('Movie', removed_id)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', commit_during_read, once=True)
+        index.build([Movie])
+    assert [name for _, _, name, _ in index.search('rublev', {'Movie'}, 10)] == ['Andrei Rublev']
+    assert index.search('sacrif', {'Movie'}, 10) == []
+
+
+def test_index_reloaded_after_ttl(app, client):
+    from core import db
+    from models.movie import Movie
+    from models.search import NameIndex
+
+    movie_id = client.post('/api/movie', data=dict(name='Ivan\'s Childhood', genre='drama', year='1962')).json['id']
+    now = [0]
+    index = NameIndex(ttl=10, clock=lambda: now[0])
+    with app.app_context():
+        index.build([Movie])
+        # rename by another worker
+        db.session.execute(Movie.__table__.update().where(Movie.id == movie_id).values(name='Solaris 1972'))
+        db.session.commit()
+        index.build([Movie])
+        assert index.search('ivan', {'Movie'}, 10) != []
+        now[0] = 11
+        index.build([Movie])
+    assert index.search('ivan', {'Movie'}, 10) == []
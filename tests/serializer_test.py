@@ -0,0 +1,21 @@
+from datetime import date
+
+
+def test_serializer_formats_dates_in_field_order(app):
+    from controllers.actor import actor_serializer
+    from models.actor import Actor
+
+    actor = Actor(id=1, name='Liv Ullmann', gender='female', date_of_birth=date(1938, 12, 16), filmography_size=3)
+    assert list(actor_serializer.to_dict(actor).items()) == [
+        ('id', 1), ('name', 'Liv Ullmann'), ('gender', 'female'), ('date_of_birth', '16.12.1938'),
+        ('filmography_size', 3)
+    ]
+
+
+def test_responses_use_date_format(client):
+    body = dict(name='Max von Sydow', gender='male', date_of_birth='10.04.1929')
+    response = client.post('/api/actor', data=body)
+    assert response.json['date_of_birth'] == '10.04.1929'
+
+    response = client.get('/api/actors', query_string=dict(stream='ndjson'))
+    assert b'"date_of_birth":"10.04.1929"' in response.data
@@ -0,0 +1,58 @@
+import os
+import runpy
+
+import pytest
+
+
+def test_pool_options():
+    from core import engine_options
+
+    assert engine_options('sqlite:////tmp/app.db') == {}
+    options = engine_options('postgresql://user:secret@db/movies')
+    assert options['pool_pre_ping'] is True
+    assert options['pool_size'] == 5 and options['max_overflow'] == 10
+
+
+def test_gunicorn_settings_from_environment(monkeypatch):
+    monkeypatch.setenv('WEB_WORKERS', '3')
+    monkeypatch.setenv('WEB_THREADS', '8')
+    monkeypatch.delenv('SCHEMA_CHECK', raising=False)  # restored after the test
+    monkeypatch.delenv('METRICS_DIR', raising=False)
+    settings = runpy.run_path('gunicorn.conf.py')
+    assert (settings['workers'], settings['threads'], settings['worker_class']) == (3, 8, 'gthread')
+    assert settings['preload_app'] is True
+    assert callable(settings['post_fork'])
+    assert os.environ['SCHEMA_CHECK'] == 'strict'
+    assert os.path.isdir(os.environ['METRICS_DIR'])
+
+
+@pytest.mark.parametrize('workers, cache_url, local_cache', [('3', None, 'false'), ('1', None, None),
+                                                             ('3', 'redis://cache:6379/0', None)])
+def test_local_cache_off_with_many_workers(monkeypatch, workers, cache_url, local_cache):
+    monkeypatch.setenv('WEB_WORKERS', workers)
+    monkeypatch.delenv('LOCAL_CACHE', raising=False)  # restored after the test
+    monkeypatch.delenv('METRICS_DIR', raising=False)
+    if cache_url:
+        monkeypatch.setenv('CACHE_URL', cache_url)
+    else:
+        monkeypatch.delenv('CACHE_URL', raising=False)
+    runpy.run_path('gunicorn.conf.py')
+    assert os.environ.get('LOCAL_CACHE') == local_cache
+
+
+def test_app_without_local_cache(monkeypatch, tmp_path, client):
+    import core
+    from core.cache import NullCache, entity_cache
+
+    monkeypatch.setattr(core, 'LOCAL_CACHE', False)
+    monkeypatch.setattr(entity_cache, 'backend', entity_cache.backend)  # restored after the test
+    core.create_app('sqlite:///{}'.format(tmp_path / 'app.db'))
+    assert isinstance(entity_cache.backend, NullCache)
+
+    movie_id = client.post('/api/movie', data=dict(name='Uncached', genre='drama', year='2000')).json['id']
+    first = client.get('/api/movie', query_string=dict(id=movie_id))
+    client.put('/api/movie', data=dict(id=movie_id, year='2001'))
+    # a write through another worker could not drop an entry, every read sees the database
+    assert client.get('/api/movie', query_string=dict(id=movie_id)).json['year'] == 2001
+    assert client.get('/api/movie', query_string=dict(id=movie_id),
+                      headers={'If-None-Match': first.headers['ETag']}).status_code == 200
@@ -0,0 +1,80 @@
+def new_actor(client, name):
+    return client.post('/api/actor', data=dict(name=name, gender='male', date_of_birth='01.01.1960')).json['id']
+
+
+def new_movie(client, name):
+    return client.post('/api/movie', data=dict(name=name, genre='drama', year='1999')).json['id']
+
+
+def sizes(client, actor_ids, movie_ids):
+    actors = [client.get('/api/actor', query_string=dict(id=i)).json['filmography_size'] for i in actor_ids]
+    movies = [client.get('/api/movie', query_string=dict(id=i)).json['cast_size'] for i in movie_ids]
+    return actors, movies
+
+
+def test_sizes_follow_relations(client):
+    actor_ids = [new_actor(client, 'Size actor {}'.format(i)) for i in range(3)]
+    movie_ids = [new_movie(client, 'Size movie {}'.format(i)) for i in range(2)]
+    assert sizes(client, actor_ids, movie_ids) == ([0, 0, 0], [0, 0])  # cached with old sizes
+
+    client.put('/api/movie-relations/bulk', json=dict(id=movie_ids[0], relation_ids=actor_ids))
+    client.put('/api/actor-relations', data=dict(id=actor_ids[0], relation_id=movie_ids[1]))
+    assert sizes(client, actor_ids, movie_ids) == ([2, 1, 1], [3, 1])
+
+    client.delete('/api/movie-relations', data=dict(id=movie_ids[1]))
+    assert sizes(client, actor_ids, movie_ids) == ([1, 1, 1], [3, 0])
+
+    client.delete('/api/actor', data=dict(id=actor_ids[2]))
+    assert sizes(client, actor_ids[:2], movie_ids) == ([1, 1], [2, 0])
+
+    client.delete('/api/actor-relations', data=dict(id=actor_ids[0]))
+    assert sizes(client, actor_ids[:2], movie_ids) == ([0, 1], [1, 0])
+
+
+def test_sizes_can_not_be_set(client):
+    actor_id = new_actor(client, 'Size read only')
+    response = client.put('/api/actor', data=dict(id=actor_id, filmography_size=100))
+    assert response.status_code == 400
+
+
+def test_busiest_actors_page(client):
+    movie_ids = [new_movie(client, 'Busy movie {}'.format(i)) for i in range(5)]
+    actor_ids = [new_actor(client, 'Busy actor {}'.format(i)) for i in range(4)]
+    for count, actor_id in enumerate(actor_ids):
+        client.put('/api/actor-relations/bulk', json=dict(id=actor_id, relation_ids=movie_ids[:count + 1]))
+
+    seen, params = [], dict(order_by='-filmography_size', limit=2)
+    while True:
+        response = client.get('/api/actors', query_string=params)
+        seen.extend(response.json)
+        if 'X-Next-Cursor' not in response.headers:
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+    sizes = [actor['filmography_size'] for actor in seen]
+    assert sizes == sorted(sizes, reverse=True)
+    assert [actor['id'] for actor in seen if actor['id'] in actor_ids] == actor_ids[::-1]
+
+    biggest = client.get('/api/movies', query_string=dict(order_by='-cast_size', limit=1)).json[0]
+    assert biggest['cast_size'] >= client.get('/api/movie', query_string=dict(id=movie_ids[0])).json['cast_size'] == 4
+
+
+def test_backfill(app, client):
+    from core import db
+    from models.base import backfill_sizes
+
+    actor_id = new_actor(client, 'Backfilled')
+    client.put('/api/actor-relations/bulk', json=dict(id=actor_id, relation_ids=[new_movie(client, 'Backfilled movie')]))
+    with app.app_context():
+        db.session.execute(db.text('UPDATE actors SET filmography_size = 0'))
+        db.session.execute(db.text('UPDATE movies SET cast_size = 0'))
+        db.session.commit()
+        backfill_sizes()
+    assert client.get('/api/actor', query_string=dict(id=actor_id)).json['filmography_size'] == 1
+
+
+def test_busiest_actors_use_index(app, client):
+    from filter_test import query_plan
+
+    _, plan = query_plan(app, client, '/api/actors', dict(order_by='-filmography_size', limit=50))
+    assert 'ix_actors_filmography_size_id' in plan
+    assert 'TEMP B-TREE' not in plan  # no sort
@@ -0,0 +1,76 @@
+def get_stats(client):
+    response = client.get('/api/stats')
+    assert response.status_code == 200
+    return response.json
+
+
+def assert_consistent(client):
+    response = client.get('/api/stats', query_string=dict(check='true'))
+    assert response.json == dict(consistent=True, diff={})
+
+
+def test_counters_follow_writes(client):
+    before = get_stats(client)
+    genre_before = before['movies_by_genre'].get('western', 0)
+
+    movie_id = client.post('/api/movie', data=dict(name='Stats Western', genre='western', year='1966')).json['id']
+    client.post('/api/movie', data=dict(name='Stats Western', genre='western', year='1966'))  # existing
+    records = [dict(name='Stats actor {}'.format(i), gender='female', date_of_birth='01.01.1990') for i in range(3)]
+    actor_ids = [r['id'] for r in client.post('/api/actors/bulk', json=records).json['results']]
+    client.put('/api/movie-relations/bulk', json=dict(id=movie_id, relation_ids=actor_ids))
+    client.put('/api/actor-relations', data=dict(id=actor_ids[0], relation_id=client.post(
+        '/api/movie', data=dict(name='Stats Drama', genre='drama', year='1966')).json['id']))
+
+    after = get_stats(client)
+    assert after['movies'] == before['movies'] + 2
+    assert after['actors'] == before['actors'] + 3
+    assert after['links'] == before['links'] + 4
+    assert after['movies_by_genre']['western'] == genre_before + 1
+    assert after['actors_by_gender']['female'] == before['actors_by_gender'].get('female', 0) + 3
+    assert after['average_cast_size'] == round(after['links'] / after['movies'], 2)
+    assert_consistent(client)
+
+    client.put('/api/movie', data=dict(id=movie_id, genre='drama', year='1967'))
+    client.delete('/api/actor-relations', data=dict(id=actor_ids[1]))
+    client.delete('/api/actor', data=dict(id=actor_ids[2]))
+    after = get_stats(client)
+    assert after['movies_by_genre'].get('western', 0) == genre_before
+    assert after['links'] == before['links'] + 2
+    assert after['actors'] == before['actors'] + 2
+    assert_consistent(client)
+
+
+def test_most_prolific(client):
+    actor_id = client.post('/api/actor', data=dict(name='Stats Busy', gender='male', date_of_birth='01.01.1950')).json['id']
+    records = [dict(name='Stats film {}'.format(i), genre='drama', year=2000 + i) for i in range(20)]
+    movie_ids = [r['id'] for r in client.post('/api/movies/bulk', json=records).json['results']]
+    client.put('/api/actor-relations/bulk', json=dict(id=actor_id, relation_ids=movie_ids))
+
+    top = get_stats(client)['most_prolific'][0]
+    assert top == dict(id=actor_id, name='Stats Busy', movies=20)
+
+
+def test_check_finds_drift(app, client):
+    from core import db
+    from models.stats import rebuild, stats
+
+    with app.app_context():
+        db.session.execute(stats.update().where(stats.c.name == 'movies').values(value=stats.c.value + 5))
+        db.session.commit()
+    response = client.get('/api/stats', query_string=dict(check='1'))
+    assert response.json['consistent'] is False
+    diff = response.json['diff']['movies']['']
+    assert diff['maintained'] == diff['actual'] + 5
+
+    with app.app_context():
+        rebuild()
+    assert_consistent(client)
+
+
+def test_merged_counters_are_ordered():
+    from models.stats import merge
+
+    deltas = [('movies_by_genre', 'drama', 1), ('movies', '', 1), ('movies_by_genre', 'comedy', -1),
+              ('links', '', 2), ('movies_by_genre', 'drama', -1)]
+    # same row order in every transaction, so upserts of concurrent writes can not deadlock
+    assert list(merge(deltas).items()) == [(('links', ''), 2), (('movies', ''), 1), (('movies_by_genre', 'comedy'), -1)]
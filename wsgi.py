@@ -0,0 +1,8 @@
+"""
+Application for WSGI servers, see `gunicorn.conf.py`
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from core import create_app
+
+app = create_app()